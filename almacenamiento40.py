@@ -0,0 +1,451 @@
+"""Almacenamiento de archivos intercambiable (SFTP, sistema de archivos local, SQLite)
+
+Todas las implementaciones ofrecen las mismas primitivas que
+paramiko.SFTPClient usadas en el sistema (file, stat, listdir, mkdir,
+rmdir, remove, rename, posix_rename, utime, close), con la misma semántica:
+rename falla si el destino existe, posix_rename lo reemplaza, mkdir falla
+si el directorio existe (los candados dependen de ello) y los archivos
+inexistentes lanzan FileNotFoundError. Encima de ellas, la clase base
+define las operaciones de alto nivel (leer, escribir, anexar, listar,
+info, renombrar, candado).
+
+El almacenamiento se elige en secrets.toml:
+
+    storage_backend = "sftp"      # remote_host, remote_port, remote_user, remote_password
+    storage_backend = "local"     # storage_root (las rutas remotas cuelgan de ahí)
+    storage_backend = "sqlite"    # storage_db (archivo de base de datos)
+"""
+
+import os
+import posixpath
+import sqlite3
+import stat
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from types import SimpleNamespace
+
+from secuencias40 import soltar_candado, tomar_candado
+
+TIPOS_ALMACENAMIENTO = ['sftp', 'local', 'sqlite']
+
+
+class Almacenamiento:
+    """Operaciones de alto nivel comunes a todas las implementaciones"""
+
+    def leer(self, ruta):
+        """Contenido de un archivo en bytes (None si no existe)"""
+        try:
+            with self.file(ruta, 'rb') as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            return None
+
+    def escribir(self, ruta, contenido):
+        """Escribir un archivo completo mediante temporal y reemplazo"""
+        if isinstance(contenido, str):
+            contenido = contenido.encode('utf-8')
+        with self.file(ruta + '.tmp', 'wb') as archivo:
+            archivo.write(contenido)
+        self.posix_rename(ruta + '.tmp', ruta)
+
+    def anexar(self, ruta, contenido):
+        """Agregar contenido al final de un archivo (lo crea si no existe)"""
+        with self.file(ruta, 'ab') as archivo:
+            archivo.write(contenido)
+
+    def listar(self, directorio):
+        """Nombres dentro de un directorio (lista vacía si no existe)"""
+        try:
+            return self.listdir(directorio)
+        except FileNotFoundError:
+            return []
+
+    def info(self, ruta):
+        """Atributos de un archivo (st_size, st_mtime, st_mode) o None si no existe"""
+        try:
+            return self.stat(ruta)
+        except FileNotFoundError:
+            return None
+
+    def renombrar(self, origen, destino, reemplazar=False):
+        """Renombrar; sin reemplazar falla si el destino existe"""
+        if reemplazar:
+            self.posix_rename(origen, destino)
+        else:
+            self.rename(origen, destino)
+
+    def crear_directorios(self, ruta):
+        """Crear un directorio y sus padres si no existen"""
+        if self.info(ruta) is not None:
+            return
+        actual = ''
+        for parte in ruta.strip('/').split('/'):
+            actual += '/' + parte
+            try:
+                self.stat(actual)
+            except FileNotFoundError:
+                try:
+                    self.mkdir(actual)
+                except IOError:
+                    pass
+
+    @contextmanager
+    def candado(self, ruta_candado, espera_maxima=15, caducado=120):
+        """Candado exclusivo entre procesos (mkdir atómico) durante un bloque with"""
+        latido = tomar_candado(self, ruta_candado, espera_maxima, caducado)
+        try:
+            yield
+        finally:
+            soltar_candado(self, ruta_candado, latido)
+
+    def abrir_canal(self):
+        """Canal adicional para operar en paralelo (se cierra con close())"""
+        return self
+
+
+# =============================================================================
+# SFTP (PARAMIKO)
+# =============================================================================
+
+class AlmacenamientoSFTP(Almacenamiento):
+    def __init__(self, host, puerto, usuario, contrasena, timeout=30):
+        import paramiko
+
+        self.ssh = paramiko.SSHClient()
+        self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.ssh.connect(hostname=host, port=puerto, username=usuario, password=contrasena, timeout=timeout)
+        self.cliente = self.ssh.open_sftp()
+
+    def file(self, ruta, modo='r'):
+        return self.cliente.file(ruta, modo)
+
+    def stat(self, ruta):
+        return self.cliente.stat(ruta)
+
+    def listdir(self, ruta):
+        return self.cliente.listdir(ruta)
+
+    def mkdir(self, ruta):
+        self.cliente.mkdir(ruta)
+
+    def rmdir(self, ruta):
+        self.cliente.rmdir(ruta)
+
+    def remove(self, ruta):
+        self.cliente.remove(ruta)
+
+    def rename(self, origen, destino):
+        self.cliente.rename(origen, destino)
+
+    def utime(self, ruta, tiempos):
+        self.cliente.utime(ruta, tiempos)
+
+    def posix_rename(self, origen, destino):
+        try:
+            self.cliente.posix_rename(origen, destino)
+        except FileNotFoundError:
+            raise
+        except IOError:
+            # Servidores sin la extensión posix-rename
+            try:
+                self.cliente.remove(destino)
+            except FileNotFoundError:
+                pass
+            self.cliente.rename(origen, destino)
+
+    def abrir_canal(self):
+        """Otro canal SFTP sobre la misma conexión SSH"""
+        return self.ssh.open_sftp()
+
+    def close(self):
+        try:
+            self.cliente.close()
+        finally:
+            self.ssh.close()
+
+
+# =============================================================================
+# SISTEMA DE ARCHIVOS LOCAL
+# =============================================================================
+
+class ArchivoLocal:
+    """Archivo binario que también acepta texto al escribir (como SFTPFile)"""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+
+    def write(self, datos):
+        if isinstance(datos, str):
+            datos = datos.encode('utf-8')
+        return self.archivo.write(datos)
+
+    def __getattr__(self, atributo):
+        return getattr(self.archivo, atributo)
+
+    def __iter__(self):
+        return iter(self.archivo)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.archivo.close()
+
+
+class AlmacenamientoLocal(Almacenamiento):
+    def __init__(self, raiz='/'):
+        """raiz: directorio local del que cuelgan las rutas remotas ('/' las usa tal cual)"""
+        self.raiz = raiz
+
+    def ruta_local(self, ruta):
+        return os.path.join(self.raiz, ruta.lstrip('/'))
+
+    def file(self, ruta, modo='r'):
+        modo_binario = modo if 'b' in modo else modo + 'b'
+        return ArchivoLocal(open(self.ruta_local(ruta), modo_binario))
+
+    def stat(self, ruta):
+        return os.stat(self.ruta_local(ruta))
+
+    def listdir(self, ruta):
+        return sorted(os.listdir(self.ruta_local(ruta)))
+
+    def mkdir(self, ruta):
+        os.mkdir(self.ruta_local(ruta))
+
+    def rmdir(self, ruta):
+        os.rmdir(self.ruta_local(ruta))
+
+    def remove(self, ruta):
+        os.remove(self.ruta_local(ruta))
+
+    def rename(self, origen, destino):
+        """Renombrar sin reemplazar (como SFTP): falla si el destino existe"""
+        origen, destino = self.ruta_local(origen), self.ruta_local(destino)
+        if os.path.isdir(origen):
+            if os.path.exists(destino):
+                raise FileExistsError(destino)
+            os.rename(origen, destino)
+            return
+        # link() falla de forma atómica si el destino existe
+        os.link(origen, destino)
+        os.remove(origen)
+
+    def posix_rename(self, origen, destino):
+        os.replace(self.ruta_local(origen), self.ruta_local(destino))
+
+    def utime(self, ruta, tiempos):
+        os.utime(self.ruta_local(ruta), tiempos)
+
+    def close(self):
+        pass
+
+
+# =============================================================================
+# BASE DE DATOS EMBEBIDA (SQLITE)
+# =============================================================================
+
+class ArchivoSQLite(BytesIO):
+    """Archivo en memoria que se guarda en la base de datos al cerrarse"""
+
+    def __init__(self, almacenamiento, ruta, modo):
+        super().__init__()
+        self.almacenamiento = almacenamiento
+        self.ruta = ruta
+        self.modo = modo
+
+    def write(self, datos):
+        if isinstance(datos, str):
+            datos = datos.encode('utf-8')
+        return super().write(datos)
+
+    def close(self):
+        if not self.closed:
+            self.almacenamiento.guardar_archivo(self.ruta, self.getvalue(), anexar='a' in self.modo)
+        super().close()
+
+
+class AlmacenamientoSQLite(Almacenamiento):
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS archivos (
+            ruta TEXT PRIMARY KEY,
+            directorio TEXT NOT NULL,
+            contenido BLOB NOT NULL,
+            modificado REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS archivos_por_directorio ON archivos (directorio);
+        CREATE TABLE IF NOT EXISTS directorios (
+            ruta TEXT PRIMARY KEY,
+            directorio TEXT NOT NULL,
+            modificado REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS directorios_por_directorio ON directorios (directorio);
+    """
+
+    def __init__(self, ruta_db, timeout=30):
+        self.ruta_db = ruta_db
+        self.timeout = timeout
+        self.conexion = sqlite3.connect(ruta_db, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript(self.ESQUEMA)
+
+    @staticmethod
+    def normalizar(ruta):
+        return posixpath.normpath('/' + ruta.lstrip('/'))
+
+    def ejecutar(self, sql, parametros=()):
+        return self.conexion.execute(sql, parametros)
+
+    def es_directorio(self, ruta):
+        if ruta == '/':
+            return True
+        if self.ejecutar("SELECT 1 FROM directorios WHERE ruta = ?", (ruta,)).fetchone():
+            return True
+        # Directorios implícitos: los padres de archivos guardados sin mkdir
+        return self.ejecutar("SELECT 1 FROM archivos WHERE ruta LIKE ? ESCAPE '\\' LIMIT 1",
+                             (self.prefijo(ruta),)).fetchone() is not None
+
+    @staticmethod
+    def prefijo(ruta):
+        escapada = ruta.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return escapada.rstrip('/') + '/%'
+
+    def guardar_archivo(self, ruta, contenido, anexar=False):
+        ruta = self.normalizar(ruta)
+        if anexar:
+            self.ejecutar(
+                "INSERT INTO archivos (ruta, directorio, contenido, modificado) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (ruta) DO UPDATE SET contenido = contenido || excluded.contenido, modificado = excluded.modificado",
+                (ruta, posixpath.dirname(ruta), contenido, time.time())
+            )
+        else:
+            self.ejecutar(
+                "INSERT OR REPLACE INTO archivos (ruta, directorio, contenido, modificado) VALUES (?, ?, ?, ?)",
+                (ruta, posixpath.dirname(ruta), contenido, time.time())
+            )
+
+    def file(self, ruta, modo='r'):
+        if 'r' in modo:
+            fila = self.ejecutar("SELECT contenido FROM archivos WHERE ruta = ?", (self.normalizar(ruta),)).fetchone()
+            if fila is None:
+                raise FileNotFoundError(ruta)
+            return BytesIO(fila[0])
+        return ArchivoSQLite(self, ruta, modo)
+
+    def stat(self, ruta):
+        ruta = self.normalizar(ruta)
+        fila = self.ejecutar("SELECT length(contenido), modificado FROM archivos WHERE ruta = ?", (ruta,)).fetchone()
+        if fila:
+            return SimpleNamespace(st_size=fila[0], st_mtime=fila[1], st_mode=stat.S_IFREG | 0o644)
+        fila = self.ejecutar("SELECT modificado FROM directorios WHERE ruta = ?", (ruta,)).fetchone()
+        if fila or self.es_directorio(ruta):
+            return SimpleNamespace(st_size=0, st_mtime=fila[0] if fila else 0, st_mode=stat.S_IFDIR | 0o755)
+        raise FileNotFoundError(ruta)
+
+    def listdir(self, ruta):
+        ruta = self.normalizar(ruta)
+        if not self.es_directorio(ruta):
+            raise FileNotFoundError(ruta)
+        nombres = {posixpath.basename(fila[0]) for fila in
+                   self.ejecutar("SELECT ruta FROM archivos WHERE directorio = ?", (ruta,))}
+        nombres |= {posixpath.basename(fila[0]) for fila in
+                    self.ejecutar("SELECT ruta FROM directorios WHERE directorio = ?", (ruta,))}
+        # Subdirectorios implícitos de archivos más profundos
+        for (ruta_archivo,) in self.ejecutar("SELECT ruta FROM archivos WHERE ruta LIKE ? ESCAPE '\\'",
+                                             (self.prefijo(ruta),)):
+            nombres.add(ruta_archivo[len(ruta.rstrip('/')) + 1:].split('/')[0])
+        return sorted(nombres)
+
+    def mkdir(self, ruta):
+        ruta = self.normalizar(ruta)
+        if self.ejecutar("SELECT 1 FROM archivos WHERE ruta = ?", (ruta,)).fetchone():
+            raise FileExistsError(ruta)
+        try:
+            self.ejecutar("INSERT INTO directorios (ruta, directorio, modificado) VALUES (?, ?, ?)",
+                          (ruta, posixpath.dirname(ruta), time.time()))
+        except sqlite3.IntegrityError:
+            raise FileExistsError(ruta)
+
+    def rmdir(self, ruta):
+        ruta = self.normalizar(ruta)
+        if self.listdir(ruta):
+            raise OSError(f"Directorio no vacío: {ruta}")
+        self.ejecutar("DELETE FROM directorios WHERE ruta = ?", (ruta,))
+
+    def remove(self, ruta):
+        if self.ejecutar("DELETE FROM archivos WHERE ruta = ?", (self.normalizar(ruta),)).rowcount == 0:
+            raise FileNotFoundError(ruta)
+
+    def mover(self, origen, destino, reemplazar):
+        origen, destino = self.normalizar(origen), self.normalizar(destino)
+        self.ejecutar("BEGIN IMMEDIATE")
+        try:
+            existe = self.ejecutar("SELECT 1 FROM archivos WHERE ruta = ? UNION SELECT 1 FROM directorios WHERE ruta = ?",
+                                   (destino, destino)).fetchone()
+            if existe and not reemplazar:
+                raise FileExistsError(destino)
+            if reemplazar:
+                self.ejecutar("DELETE FROM archivos WHERE ruta = ?", (destino,))
+            movidos = 0
+            for tabla in ('archivos', 'directorios'):
+                movidos += self.ejecutar(f"UPDATE {tabla} SET ruta = ?, directorio = ? WHERE ruta = ?",
+                                         (destino, posixpath.dirname(destino), origen)).rowcount
+                # El contenido de un directorio se mueve con él
+                movidos += self.ejecutar(
+                    f"UPDATE {tabla} SET ruta = ? || substr(ruta, ?), directorio = ? || substr(directorio, ?) "
+                    "WHERE ruta LIKE ? ESCAPE '\\'",
+                    (destino, len(origen) + 1, destino, len(origen) + 1, self.prefijo(origen))
+                ).rowcount
+            if not movidos:
+                raise FileNotFoundError(origen)
+            self.ejecutar("COMMIT")
+        except Exception:
+            self.ejecutar("ROLLBACK")
+            raise
+
+    def rename(self, origen, destino):
+        self.mover(origen, destino, reemplazar=False)
+
+    def utime(self, ruta, tiempos):
+        """Fecha de modificación (tiempos=(acceso, modificación) o None para ahora)"""
+        ruta = self.normalizar(ruta)
+        modificado = tiempos[1] if tiempos else time.time()
+        for tabla in ('archivos', 'directorios'):
+            if self.ejecutar(f"UPDATE {tabla} SET modificado = ? WHERE ruta = ?", (modificado, ruta)).rowcount:
+                return
+        raise FileNotFoundError(ruta)
+
+    def posix_rename(self, origen, destino):
+        self.mover(origen, destino, reemplazar=True)
+
+    def abrir_canal(self):
+        """Otra conexión a la misma base de datos"""
+        return AlmacenamientoSQLite(self.ruta_db, self.timeout)
+
+    def close(self):
+        self.conexion.close()
+
+
+# =============================================================================
+# SELECCIÓN POR CONFIGURACIÓN
+# =============================================================================
+
+def abrir_almacenamiento(config):
+    """Abrir el almacenamiento indicado en la configuración (por ejemplo st.secrets)
+
+    Lanza ValueError si el tipo no existe; los errores de conexión se propagan.
+    """
+    tipo = config.get("storage_backend", "sftp")
+    if tipo == "sftp":
+        return AlmacenamientoSFTP(
+            config["remote_host"],
+            config["remote_port"],
+            config["remote_user"],
+            config["remote_password"]
+        )
+    if tipo == "local":
+        return AlmacenamientoLocal(config.get("storage_root", "/"))
+    if tipo == "sqlite":
+        return AlmacenamientoSQLite(config["storage_db"])
+    raise ValueError(f"Almacenamiento no reconocido: {tipo} (opciones: {', '.join(TIPOS_ALMACENAMIENTO)})")
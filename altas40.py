@@ -0,0 +1,361 @@
+"""Registro de altas de solo anexado (inscritos y usuarios)
+
+Cada pre-registro se anexa como una línea JSON a <directorio>/<tabla>.jsonl
+en lugar de reescribir inscritos.csv y usuarios.csv completos, por lo que
+el costo de una alta es constante. Los lectores combinan el CSV base con
+las altas pendientes. La compactación (en segundo plano) sella el archivo
+activo como segmento (<tabla>.<marca>.jsonl), incorpora los segmentos al
+CSV base y los borra.
+
+Cada escritor se registra (mkdir de <directorio>/escritores/<id>) antes de
+abrir el archivo activo y se retira al cerrarlo. Después de sellar, la
+compactación espera a que terminen los escritores registrados en ese
+momento: una alta que abrió el archivo antes del sellado queda dentro del
+segmento antes de leerlo, y ninguna se pierde al borrarlo.
+
+Quien reescriba un CSV base completo debe hacerlo con reescribir() (o
+abrir_sesion/consumir/cerrar_sesion): bajo el candado de compactación se
+incorporan las altas que el DataFrame no leyó (las leídas viajan en
+df.attrs['altas_vistas']) y se descartan los segmentos consumidos, para no
+perder altas ni revivir registros borrados.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from io import StringIO
+
+import pandas as pd
+
+from secuencias40 import CandadoOcupado, soltar_candado, tomar_candado
+
+
+class RegistroAltas:
+    def __init__(self, crear_cargador, directorio, tablas, umbral_compactacion=64 * 1024,
+                 espera_maxima=30, candado_caducado=600, escritor_caducado=60):
+        """
+        crear_cargador: función que devuelve un cargador con conectar(),
+        desconectar() y atributo sftp (por ejemplo, la clase CargadorRemoto).
+        tablas: {tabla: (ruta_csv_base, columna_clave)}.
+        """
+        self.crear_cargador = crear_cargador
+        self.directorio = directorio
+        self.tablas = tablas
+        self.umbral_compactacion = umbral_compactacion
+        self.espera_maxima = espera_maxima
+        self.candado_caducado = candado_caducado
+        self.escritor_caducado = escritor_caducado
+        self.ruta_candado = os.path.join(directorio, "compactacion.lock")
+        self.ruta_escritores = os.path.join(directorio, "escritores")
+        self.tamano_activo = {tabla: 0 for tabla in tablas}
+        self.compactando = threading.Lock()
+
+    def ruta_activa(self, tabla):
+        return os.path.join(self.directorio, f"{tabla}.jsonl")
+
+    def conectar(self):
+        """Abrir una conexión propia; lanza ConnectionError si no es posible"""
+        cargador = self.crear_cargador()
+        if not cargador.conectar():
+            raise ConnectionError("No se pudo conectar al servidor remoto")
+        return cargador
+
+    # -------------------------------------------------------------------------
+    # Escritura de altas
+    # -------------------------------------------------------------------------
+
+    def agregar(self, registros):
+        """Anexar un registro por tabla ({tabla: dict}) con una sola conexión"""
+        cargador = self.conectar()
+        try:
+            sftp = cargador.sftp
+            self.crear_directorio(sftp)
+            for tabla, registro in registros.items():
+                self.anexar(sftp, tabla, [registro])
+            return True
+        finally:
+            cargador.desconectar()
+
+    def anexar(self, sftp, tabla, registros):
+        """Anexar registros al archivo activo de una tabla"""
+        ruta = self.ruta_activa(tabla)
+        # Registrarse antes de abrir: quien selle el archivo espera a que termine
+        marca = os.path.join(self.ruta_escritores, os.urandom(8).hex())
+        sftp.mkdir(marca)
+        try:
+            with sftp.file(ruta, 'a') as archivo:
+                archivo.write("".join(json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+                                      for registro in registros))
+        finally:
+            sftp.rmdir(marca)
+        info = sftp.info(ruta)  # None si ya se selló
+        self.tamano_activo[tabla] = info.st_size if info else 0
+
+    def crear_directorio(self, sftp):
+        """Crear el directorio del registro (y sus padres) si no existe"""
+        sftp.crear_directorios(self.ruta_escritores)
+
+    def necesita_compactar(self):
+        """Indicar si algún archivo activo superó el umbral de compactación"""
+        return any(tamano >= self.umbral_compactacion for tamano in self.tamano_activo.values())
+
+    def compactar_en_segundo_plano(self):
+        """Lanzar la compactación en un hilo si no hay otra en curso en este proceso"""
+        if self.compactando.locked():
+            return False
+        threading.Thread(target=self.compactar, daemon=True).start()
+        return True
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+
+    def segmentos(self, sftp, tabla):
+        """Segmentos sellados de una tabla, en orden cronológico"""
+        try:
+            nombres = sftp.listdir(self.directorio)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(self.directorio, nombre) for nombre in sorted(nombres)
+            if nombre.startswith(f"{tabla}.") and nombre.endswith(".jsonl") and nombre != f"{tabla}.jsonl"
+        ]
+
+    def leer_registros(self, sftp, rutas):
+        """Leer las altas de varios archivos; ignora líneas incompletas"""
+        registros = []
+        for ruta in rutas:
+            try:
+                with sftp.file(ruta, 'r') as archivo:
+                    contenido = archivo.read().decode('utf-8')
+            except FileNotFoundError:
+                continue
+            for linea in contenido.splitlines():
+                try:
+                    registros.append(json.loads(linea))
+                except ValueError:
+                    pass
+        return registros
+
+    @staticmethod
+    def claves(registros, clave):
+        """Claves (como texto) de una lista de altas"""
+        return {str(registro[clave]) for registro in registros if registro.get(clave) is not None}
+
+    def incorporar(self, df, registros, clave, excluir=()):
+        """Agregar a df las altas cuya clave no está en df ni en `excluir`; devuelve (df, claves_agregadas)"""
+        if not registros:
+            return df, set()
+
+        nuevos = pd.DataFrame(registros)
+        if clave not in nuevos.columns:
+            return df, set()
+        nuevos = nuevos.dropna(subset=[clave])
+        nuevos[clave] = nuevos[clave].astype(str)
+        nuevos = nuevos.drop_duplicates(subset=[clave], keep='last')
+
+        existentes = set(df[clave].dropna().astype(str)) if clave in df.columns else set()
+        nuevos = nuevos[~nuevos[clave].isin(existentes | set(excluir))]
+        if nuevos.empty:
+            return df, set()
+
+        if df.empty and len(df.columns) == 0:
+            combinado = nuevos.reset_index(drop=True)
+        else:
+            combinado = pd.concat([df, nuevos], ignore_index=True)
+        combinado.attrs = dict(df.attrs)  # conserva la versión remota leída
+        return combinado, set(nuevos[clave])
+
+    def fusionar_lectura(self, datos):
+        """Combinar las altas pendientes en los DataFrames leídos ({tabla: df}, se modifica en su lugar)
+
+        Cada DataFrame lleva en attrs['altas_vistas'] las claves de las altas
+        leídas: si al reescribirlo alguna falta, es porque se borró a propósito.
+        """
+        tablas = [tabla for tabla in self.tablas if tabla in datos]
+        if not tablas:
+            return datos
+
+        cargador = self.conectar()
+        try:
+            for tabla in tablas:
+                rutas = self.segmentos(cargador.sftp, tabla) + [self.ruta_activa(tabla)]
+                registros = self.leer_registros(cargador.sftp, rutas)
+                datos[tabla], _ = self.incorporar(datos[tabla], registros, self.tablas[tabla][1])
+                datos[tabla].attrs['altas_vistas'] = self.claves(registros, self.tablas[tabla][1])
+            return datos
+        finally:
+            cargador.desconectar()
+
+    # -------------------------------------------------------------------------
+    # Reescritura de los CSV base y compactación
+    # -------------------------------------------------------------------------
+
+    def abrir_sesion(self):
+        """Conectar y tomar el candado de compactación"""
+        cargador = self.conectar()
+        try:
+            self.crear_directorio(cargador.sftp)
+            latido = tomar_candado(cargador.sftp, self.ruta_candado, self.espera_maxima, self.candado_caducado)
+        except Exception:
+            cargador.desconectar()
+            raise
+        return {'cargador': cargador, 'latido': latido, 'segmentos': {}, 'sobrantes': {}}
+
+    def sellar(self, sftp, tabla):
+        """Convertir el archivo activo en segmento; True si había altas activas"""
+        marca = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        try:
+            sftp.rename(self.ruta_activa(tabla), os.path.join(self.directorio, f"{tabla}.{marca}.jsonl"))
+        except IOError:
+            return False
+        self.tamano_activo[tabla] = 0
+        return True
+
+    def consumir(self, sesion, dataframes, excluir_vistas=True):
+        """Sellar e incorporar las altas pendientes en los DataFrames a reescribir
+
+        Con excluir_vistas se omiten las altas que se leyeron junto con cada
+        DataFrame (attrs['altas_vistas']): si no están en él es porque se
+        borraron a propósito. Las altas de los segmentos que la reescritura
+        no cubre se guardan en sesion['sobrantes'] para volver a anexarlas.
+        """
+        sftp = sesion['cargador'].sftp
+        tablas = [tabla for tabla in self.tablas if tabla in dataframes]
+        for tabla in tablas:
+            self.sellar(sftp, tabla)
+        # También cubre segmentos sellados por una sesión anterior que no terminó de esperar
+        self.esperar_escritores(sftp)
+
+        resultado = dict(dataframes)
+        for tabla in tablas:
+            sesion['segmentos'][tabla] = self.segmentos(sftp, tabla)
+            registros = self.leer_registros(sftp, sesion['segmentos'][tabla])
+            clave = self.tablas[tabla][1]
+            excluir = set(dataframes[tabla].attrs.get('altas_vistas', ())) if excluir_vistas else set()
+            resultado[tabla], _ = self.incorporar(resultado[tabla], registros, clave, excluir)
+            cubiertas = excluir | (set(resultado[tabla][clave].dropna().astype(str))
+                                   if clave in resultado[tabla].columns else set())
+            sesion['sobrantes'][tabla] = [
+                registro for registro in registros
+                if registro.get(clave) is not None and str(registro[clave]) not in cubiertas
+            ]
+        return resultado
+
+    def esperar_escritores(self, sftp):
+        """Esperar a los escritores registrados al momento de sellar
+
+        Los que se registren después abren el archivo activo nuevo. Lanza
+        CandadoOcupado si alguno sigue escribiendo al agotar la espera (los
+        segmentos se conservan para la siguiente compactación).
+        """
+        pendientes = {os.path.join(self.ruta_escritores, nombre) for nombre in sftp.listar(self.ruta_escritores)}
+        limite = time.time() + self.espera_maxima
+        espera = 0.05
+        while pendientes:
+            for marca in list(pendientes):
+                info = sftp.info(marca)
+                if info is None:
+                    pendientes.discard(marca)
+                elif time.time() - info.st_mtime > self.escritor_caducado:
+                    # Escritor interrumpido: su alta quedó completa o se ignora al leer
+                    try:
+                        sftp.rmdir(marca)
+                    except IOError:
+                        pass
+                    pendientes.discard(marca)
+            if not pendientes:
+                return
+            if time.time() > limite:
+                raise CandadoOcupado(f"Altas en curso en {self.directorio}")
+            time.sleep(espera)
+            espera = min(espera * 2, 0.5)
+
+    def cerrar_sesion(self, sesion, exito):
+        """Borrar los segmentos consumidos (si se guardó) y liberar el candado
+
+        Las altas que la reescritura no cubrió se anexan de nuevo al archivo
+        activo antes de borrar sus segmentos.
+        """
+        sftp = sesion['cargador'].sftp
+        try:
+            if exito:
+                # Sin el candado otra sesión pudo consumir los mismos segmentos
+                sesion['latido'].comprobar()
+                for tabla, sobrantes in sesion['sobrantes'].items():
+                    if sobrantes:
+                        self.anexar(sftp, tabla, sobrantes)
+                for rutas in sesion['segmentos'].values():
+                    for ruta in rutas:
+                        try:
+                            sftp.remove(ruta)
+                        except FileNotFoundError:
+                            pass
+        finally:
+            try:
+                soltar_candado(sftp, self.ruta_candado, sesion['latido'])
+            finally:
+                sesion['cargador'].desconectar()
+
+    def reescribir(self, dataframes, guardar):
+        """Reescribir CSV base completos: guardar({tabla: df}) -> bool; devuelve los DataFrames guardados o None"""
+        sesion = self.abrir_sesion()
+        exito = False
+        try:
+            dataframes = self.consumir(sesion, dataframes)
+            exito = bool(guardar(dataframes))
+            return dataframes if exito else None
+        finally:
+            self.cerrar_sesion(sesion, exito)
+
+    def leer_base(self, sftp, tabla):
+        """Leer un CSV base conservando los valores como texto"""
+        try:
+            with sftp.file(self.tablas[tabla][0], 'r') as archivo:
+                return pd.read_csv(archivo, dtype=str)
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+    def escribir_base(self, sftp, tabla, df):
+        """Escribir un CSV base mediante archivo temporal y reemplazo"""
+        buffer = StringIO()
+        df.to_csv(buffer, index=False, encoding='utf-8')
+        sftp.escribir(self.tablas[tabla][0], buffer.getvalue())
+
+    def compactar(self):
+        """Incorporar todas las altas a los CSV base; devuelve {tabla: altas_incorporadas} o None"""
+        if not self.compactando.acquire(blocking=False):
+            return None
+        try:
+            sesion = self.abrir_sesion()
+            exito = False
+            try:
+                sftp = sesion['cargador'].sftp
+                bases = {tabla: self.leer_base(sftp, tabla) for tabla in self.tablas}
+                compactadas = self.consumir(sesion, bases, excluir_vistas=False)
+                for tabla, df in compactadas.items():
+                    if len(df) != len(bases[tabla]):
+                        self.escribir_base(sftp, tabla, df)
+                exito = True
+                return {tabla: len(df) - len(bases[tabla]) for tabla, df in compactadas.items()}
+            finally:
+                self.cerrar_sesion(sesion, exito)
+        except Exception:
+            return None
+        finally:
+            self.compactando.release()
+
+
+def crear_registro_altas(crear_cargador, base_dir_remoto, **opciones):
+    """Registro de altas de inscritos y usuarios con las rutas estándar del servidor"""
+    return RegistroAltas(
+        crear_cargador,
+        os.path.join(base_dir_remoto, "datos", "altas"),
+        {
+            'inscritos': (os.path.join(base_dir_remoto, "datos", "inscritos.csv"), 'matricula'),
+            'usuarios': (os.path.join(base_dir_remoto, "config", "usuarios.csv"), 'usuario')
+        },
+        **opciones
+    )
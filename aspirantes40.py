@@ -5,24 +5,35 @@ import os
 import json
 from datetime import datetime, date
 import hashlib
+import uuid
 import base64
-import random
-import string
 from PIL import Image
-import paramiko
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configuración de página para website público
-st.set_page_config(
-    page_title="Sistema Escuela Enfermería - Modo Inscripción",
-    page_icon="🏥",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+import almacenamiento40
+import esquemas40
+import secuencias40
+import altas40
+import concurrencia40
+import cola_solicitudes40
+import duplicados40
+import catalogo40
+import motor_sqlite40
+import estadisticas40
+import documentos40
+
+def configurar_pagina():
+    """Configuración de página para website público (primera llamada a Streamlit de cada ejecución)"""
+    st.set_page_config(
+        page_title="Sistema Escuela Enfermería - Modo Inscripción",
+        page_icon="🏥",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
 # =============================================================================
 # SISTEMA DE CARGA REMOTA VIA SSH - COMPLETO
@@ -30,36 +41,23 @@ st.set_page_config(
 
 class CargadorRemoto:
     def __init__(self):
-        self.ssh = None
-        self.sftp = None
+        self.sftp = None  # almacenamiento abierto (interfaz compatible con SFTP)
         
-    def conectar(self):
-        """Establecer conexión SSH con el servidor remoto usando variables de secrets.toml"""
+    def conectar(self, mostrar_errores=True):
+        """Abrir el almacenamiento configurado en secrets.toml (SFTP, local o SQLite)"""
         try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # CONEXIÓN CON VARIABLES DE SECRETS.TOML
-            self.ssh.connect(
-                hostname=st.secrets["remote_host"],
-                port=st.secrets["remote_port"],
-                username=st.secrets["remote_user"],
-                password=st.secrets["remote_password"],
-                timeout=30
-            )
-            self.sftp = self.ssh.open_sftp()
+            self.sftp = almacenamiento40.abrir_almacenamiento(st.secrets)
             return True
         except Exception as e:
-            st.error(f"❌ Error de conexión SSH: {e}")
+            if mostrar_errores:
+                st.error(f"❌ Error de conexión al almacenamiento: {e}")
             return False
     
     def desconectar(self):
-        """Cerrar conexión SSH"""
+        """Cerrar el almacenamiento"""
         try:
             if self.sftp:
                 self.sftp.close()
-            if self.ssh:
-                self.ssh.close()
         except:
             pass
     
@@ -85,8 +83,8 @@ class CargadorRemoto:
                 st.error(f"❌ Error creando directorio {ruta}: {e}")
                 return False
     
-    def cargar_csv_remoto(self, ruta_remota):
-        """Cargar archivo CSV desde el servidor remoto"""
+    def cargar_csv_remoto(self, ruta_remota, tipos=None):
+        """Cargar archivo CSV desde el servidor remoto (tipos: dtype de pd.read_csv)"""
         try:
             if not self.conectar():
                 return pd.DataFrame()
@@ -98,14 +96,11 @@ class CargadorRemoto:
                 # Si el archivo no existe, crear estructura vacía
                 return pd.DataFrame()
             
-            # Leer archivo remoto
+            # Leer archivo remoto y registrar su versión para guardados concurrentes
             with self.sftp.file(ruta_remota, 'r') as archivo_remoto:
-                # Intentar diferentes codificaciones
-                try:
-                    df = pd.read_csv(archivo_remoto, encoding='utf-8')
-                except UnicodeDecodeError:
-                    archivo_remoto.seek(0)
-                    df = pd.read_csv(archivo_remoto, encoding='latin-1')
+                contenido = archivo_remoto.read()
+            df = concurrencia40.leer_csv_bytes(contenido, tipos)
+            obtener_guardado_optimista().registrar_lectura(ruta_remota, contenido, df)
                 
             return df
             
@@ -196,10 +191,11 @@ class SistemaCorreos:
             st.warning(f"⚠️ Configuración de correo no disponible: {e}")
             self.correos_habilitados = False
     
-    def enviar_correo_confirmacion(self, destinatario, nombre_estudiante, matricula, folio, programa):
+    def enviar_correo_confirmacion(self, destinatario, nombre_estudiante, matricula, folio, programa, mostrar_errores=True):
         """Enviar correo de confirmación de pre-inscripción"""
         if not self.correos_habilitados:
-            st.warning("⚠️ Sistema de correos no configurado. No se enviará correo de confirmación.")
+            if mostrar_errores:
+                st.warning("⚠️ Sistema de correos no configurado. No se enviará correo de confirmación.")
             return False
             
         try:
@@ -281,13 +277,92 @@ class SistemaCorreos:
             return True
             
         except Exception as e:
-            st.error(f"❌ Error al enviar correo de confirmación: {e}")
+            if mostrar_errores:
+                st.error(f"❌ Error al enviar correo de confirmación: {e}")
             return False
 
+# =============================================================================
+# SECUENCIAS REMOTAS DE MATRÍCULAS Y FOLIOS
+# =============================================================================
+
+@st.cache_resource
+def obtener_asignador_secuencias():
+    """Asignador compartido por todas las sesiones del proceso (conserva los bloques reservados)"""
+    return secuencias40.AsignadorSecuencias(
+        CargadorRemoto,
+        os.path.join(st.secrets["remote_dir"], "datos", "secuencias"),
+        tamano_bloque=20
+    )
+
+@st.cache_resource
+def obtener_registro_altas():
+    """Registro de altas compartido por el proceso (conserva las claves ya leídas)"""
+    return altas40.crear_registro_altas(CargadorRemoto, st.secrets["remote_dir"])
+
+@st.cache_resource
+def obtener_guardado_optimista():
+    """Versiones leídas de los CSV remotos, para fusionar escrituras concurrentes"""
+    return concurrencia40.GuardadoOptimista(CargadorRemoto)
+
+@st.cache_resource
+def obtener_estadisticas():
+    """Conteos materializados del dashboard y los reportes (datos/estadisticas.json)"""
+    return estadisticas40.crear_estadisticas(CargadorRemoto, st.secrets["remote_dir"], obtener_motor_datasets())
+
+@st.cache_resource
+def obtener_motor_datasets():
+    """Motor SQLite de los datasets (None si no se configuró datasets_db)"""
+    ruta_db = st.secrets.get("datasets_db")
+    return motor_sqlite40.MotorDatasets(ruta_db) if ruta_db else None
+
+@st.cache_resource
+def obtener_registro_documentos():
+    """Registro de documentos (un renglón por documento) compartido por el proceso"""
+    return documentos40.crear_registro_documentos(CargadorRemoto, st.secrets["remote_dir"], obtener_motor_datasets())
+
 # =============================================================================
 # SISTEMA DE GESTIÓN DE INSCRITOS CON CONEXIÓN REMOTA - COMPLETO
 # =============================================================================
 
+def nombre_archivo_documento(matricula, nombre_completo, tipo_documento, nombre_original, momento=None):
+    """Nombre estandarizado de un documento: {matricula}_{nombre}_{timestamp}_{TIPO}.{ext}"""
+    timestamp = (momento or datetime.now()).strftime('%y%m%d%H%M%S')
+    nombre_limpio = ''.join(c for c in nombre_completo if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    nombre_limpio = nombre_limpio.replace(' ', '_')[:30]
+    tipo_limpio = tipo_documento.replace(' ', '_').upper()
+    extension = nombre_original.split('.')[-1].lower() if '.' in nombre_original else 'pdf'
+    return f"{matricula}_{nombre_limpio}_{timestamp}_{tipo_limpio}.{extension}"
+
+def construir_registros_alta(matricula, folio, datos_inscrito, nombres_documentos):
+    """Registros de inscritos.csv y usuarios.csv para una pre-inscripción"""
+    fecha_registro = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    nuevo_inscrito = {
+        'matricula': matricula,
+        'fecha_registro': fecha_registro,
+        'nombre_completo': datos_inscrito['nombre_completo'],
+        'email': datos_inscrito['email'],
+        'telefono': datos_inscrito['telefono'],
+        'programa_interes': datos_inscrito['programa_interes'],
+        'estatus': 'Pre-inscrito',
+        'folio': folio,
+        'documentos_subidos': len(nombres_documentos),
+        'documentos_guardados': ', '.join(nombres_documentos) if nombres_documentos else 'Ninguno',
+        'fecha_nacimiento': str(datos_inscrito['fecha_nacimiento']) if datos_inscrito.get('fecha_nacimiento') else '',
+        'como_se_entero': datos_inscrito.get('como_se_entero') or '',
+        'posibles_duplicados': datos_inscrito.get('posibles_duplicados') or ''
+    }
+    nuevo_usuario = {
+        'usuario': matricula,
+        'password': '123',
+        'rol': 'inscrito',
+        'nombre': datos_inscrito['nombre_completo'],
+        'email': datos_inscrito['email'],
+        'activo': 'True',
+        'fecha_registro': fecha_registro,
+        'estatus': 'activo'
+    }
+    return nuevo_inscrito, nuevo_usuario
+
 class SistemaInscritos:
     def __init__(self):
         # USAR VARIABLES DE SECRETS.TOML PARA RUTAS
@@ -303,8 +378,8 @@ class SistemaInscritos:
         # Instancia del cargador remoto
         self.cargador_remoto = CargadorRemoto()
         
-        # Instancia del sistema de correos
-        self.sistema_correos = SistemaCorreos()
+        # Registro de altas de solo anexado (inscritos y usuarios)
+        self.registro_altas = obtener_registro_altas()
         
         # Cargar datos iniciales
         self.cargar_datos()
@@ -312,8 +387,26 @@ class SistemaInscritos:
     def cargar_datos(self):
         """Cargar datos de inscritos desde el servidor remoto"""
         try:
+            motor = obtener_motor_datasets()
+            if motor is not None:
+                # Con el motor SQLite no hay CSV ni registro de altas que combinar
+                self.df_inscritos = motor.leer('inscritos', esquemas40.tipos_lectura('inscritos'))
+                self.df_usuarios = motor.leer('usuarios')
+                if self.df_inscritos.empty and len(self.df_inscritos.columns) == 0:
+                    self.df_inscritos = pd.DataFrame(columns=[
+                        'matricula', 'fecha_registro', 'nombre_completo', 'email', 
+                        'telefono', 'programa_interes', 'estatus', 'folio',
+                        'documentos_subidos', 'fecha_nacimiento', 'como_se_entero', 'documentos_guardados'
+                    ])
+                if self.df_usuarios.empty and len(self.df_usuarios.columns) == 0:
+                    self.df_usuarios = pd.DataFrame(columns=[
+                        'usuario', 'password', 'rol', 'nombre', 'email', 
+                        'activo', 'fecha_registro', 'estatus'
+                    ])
+                return
+            
             # Cargar inscritos
-            self.df_inscritos = self.cargador_remoto.cargar_csv_remoto(self.archivo_inscritos)
+            self.df_inscritos = self.cargador_remoto.cargar_csv_remoto(self.archivo_inscritos, esquemas40.tipos_lectura('inscritos'))
             if self.df_inscritos.empty:
                 self.df_inscritos = pd.DataFrame(columns=[
                     'matricula', 'fecha_registro', 'nombre_completo', 'email', 
@@ -328,6 +421,17 @@ class SistemaInscritos:
                     'usuario', 'password', 'rol', 'nombre', 'email', 
                     'activo', 'fecha_registro', 'estatus'
                 ])
+            
+            # Combinar las altas que aún no se compactan en los CSV base
+            try:
+                datos = self.registro_altas.fusionar_lectura({
+                    'inscritos': self.df_inscritos,
+                    'usuarios': self.df_usuarios
+                })
+                self.df_inscritos = datos['inscritos']
+                self.df_usuarios = datos['usuarios']
+            except Exception as e:
+                st.warning(f"⚠️ No se pudieron leer las altas recientes: {e}")
                 
         except Exception as e:
             st.error(f"❌ Error cargando datos iniciales: {e}")
@@ -341,189 +445,145 @@ class SistemaInscritos:
                 'usuario', 'password', 'rol', 'nombre', 'email', 
                 'activo', 'fecha_registro', 'estatus'
             ])
+
+# Instancia del sistema de inscritos (se crea al primer uso en la ejecución)
+sistema_inscritos = None
+
+def obtener_sistema_inscritos():
+    """Sistema de inscritos de la ejecución; carga los datos remotos solo cuando se necesitan"""
+    global sistema_inscritos
+    if sistema_inscritos is None:
+        sistema_inscritos = SistemaInscritos()
+    return sistema_inscritos
+
+def numero_inicial_matriculas():
+    """Primer número de la secuencia: mayor número de matrícula existente + 1 (mínimo 10000)
+
+    Solo se usa para crear la secuencia si todavía no existe en el servidor.
+    """
+    sistema = obtener_sistema_inscritos()
+    matriculas = pd.concat([
+        sistema.df_inscritos.get('matricula', pd.Series(dtype=str)),
+        sistema.df_usuarios.get('usuario', pd.Series(dtype=str))
+    ]).dropna().astype(str)
+    numeros = pd.to_numeric(matriculas.str.extract(r'^MAT-[A-Z]*(\d+)$', expand=False), errors='coerce')
+    return max(int(numeros.max()) + 1 if numeros.notna().any() else 0, 10000)
+
+def generar_matricula_inscrito():
+    """Generar matrícula única para inscrito desde la secuencia remota"""
+    try:
+        numero = obtener_asignador_secuencias().siguiente('matricula', inicial=numero_inicial_matriculas)
+        return f"MAT-INS{numero}"
+    except Exception as e:
+        st.error(f"❌ No se pudo asignar una matrícula: {e}")
+        return None
+
+def generar_folio():
+    """Generar folio único desde la secuencia remota"""
+    numero = obtener_asignador_secuencias().siguiente('folio')
+    return f"FOL-{datetime.now().strftime('%Y%m%d')}-{numero:04d}"
+
+# =============================================================================
+# COLA DE SOLICITUDES DE ADMISIÓN (PROCESAMIENTO EN SEGUNDO PLANO)
+# =============================================================================
+
+def procesar_solicitud(solicitud):
+    """Subir documentos, registrar el alta y enviar el correo de una solicitud en cola
+
+    Se ejecuta en un hilo del grupo de trabajo: no escribe en la interfaz y
+    lanza una excepción si hay que reintentar.
+    """
+    datos = solicitud['datos']
+    recibido = datetime.fromtimestamp(solicitud['recibido_en'])
+    carpeta_documentos = os.path.join(st.secrets["remote_dir"], "uploads")
     
-    def guardar_datos(self):
-        """Guardar datos de inscritos en el servidor remoto"""
-        try:
-            # Crear directorios remotos si no existen
-            if not self.crear_estructura_directorios():
-                return False
-            
-            # Guardar inscritos
-            if not self.cargador_remoto.guardar_dataframe_remoto(self.df_inscritos, self.archivo_inscritos):
-                return False
-            
-            # Guardar usuarios
-            if not self.cargador_remoto.guardar_dataframe_remoto(self.df_usuarios, self.archivo_usuarios):
-                return False
-            
-            return True
-            
-        except Exception as e:
-            st.error(f"❌ Error guardando datos de inscritos: {e}")
-            return False
-    
-    def crear_estructura_directorios(self):
-        """Crear estructura de directorios remota si no existe"""
-        try:
-            if not self.cargador_remoto.conectar():
-                return False
-            
-            # Crear directorio base
-            self.cargador_remoto.crear_directorio_remoto(self.BASE_DIR_REMOTO)
-            
-            # Crear subdirectorios necesarios
-            directorios = [
-                self.BASE_DIR_REMOTO,
-                os.path.join(self.BASE_DIR_REMOTO, "datos"),
-                os.path.join(self.BASE_DIR_REMOTO, "config"), 
-                os.path.join(self.BASE_DIR_REMOTO, "uploads")
-            ]
-            
-            for directorio in directorios:
-                if not self.cargador_remoto.crear_directorio_remoto(directorio):
-                    return False
-            
-            self.cargador_remoto.desconectar()
-            return True
-            
-        except Exception as e:
-            st.error(f"❌ Error creando estructura de directorios: {e}")
-            return False
-    
-    def guardar_archivo_remoto(self, contenido_bytes, ruta_remota):
-        """Guardar archivo físico en el servidor remoto"""
-        try:
-            return self.cargador_remoto.guardar_archivo_bytes_remoto(contenido_bytes, ruta_remota)
-            
-        except Exception as e:
-            st.error(f"❌ Error en guardar_archivo_remoto: {e}")
-            return False
+    # Subir todos los documentos con una sola conexión (nombres fijos: los reintentos sobrescriben)
+    nombres_documentos = []
+    registros_documentos = []
+    cargador = CargadorRemoto()
+    if not cargador.conectar(mostrar_errores=False):
+        raise ConnectionError("No se pudo conectar al servidor remoto")
+    try:
+        cargador.crear_directorio_remoto(carpeta_documentos)
+        for documento in solicitud['documentos']:
+            nombre_archivo = nombre_archivo_documento(
+                datos['matricula'], datos['nombre_completo'], documento['tipo'], documento['nombre_original'], recibido
+            )
+            with open(documento['ruta_local'], 'rb') as archivo_local:
+                contenido = archivo_local.read()
+            with cargador.sftp.file(os.path.join(carpeta_documentos, nombre_archivo), 'wb') as archivo_remoto:
+                archivo_remoto.write(contenido)
+            nombres_documentos.append(nombre_archivo)
+            registros_documentos.append(documentos40.registro_documento(
+                datos['matricula'], documento['tipo'], nombre_archivo, contenido, recibido
+            ))
+    finally:
+        cargador.desconectar()
     
-    def generar_matricula_inscrito(self):
-        """Generar matrícula única para inscrito"""
-        try:
-            while True:
-                numero = ''.join(random.choices(string.digits, k=5))
-                matricula = f"MAT-INS{numero}"
-                
-                # Verificar que no exista
-                if self.df_inscritos.empty or matricula not in self.df_inscritos['matricula'].values:
-                    return matricula
-        except Exception as e:
-            return f"MAT-INS{random.randint(10000, 99999)}"
+    # Un renglón por documento en el registro (nombres fijos: los reintentos lo reemplazan)
+    if not obtener_registro_documentos().agregar(registros_documentos):
+        raise ConnectionError("No se pudo registrar los documentos")
     
-    def registrar_inscrito(self, matricula, datos_inscrito, nombres_documentos):
-        """Registrar nuevo inscrito en el sistema remoto"""
-        try:
-            # Crear registro del inscrito
-            nuevo_inscrito = {
-                'matricula': matricula,
-                'fecha_registro': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'nombre_completo': datos_inscrito['nombre_completo'],
-                'email': datos_inscrito['email'],
-                'telefono': datos_inscrito['telefono'],
-                'programa_interes': datos_inscrito['programa_interes'],
-                'estatus': 'Pre-inscrito',
-                'folio': f"FOL-{datetime.now().strftime('%Y%m%d')}-{random.randint(1000,9999)}",
-                'documentos_subidos': len(nombres_documentos),
-                'documentos_guardados': ', '.join(nombres_documentos) if nombres_documentos else 'Ninguno'
-            }
-            
-            # Agregar campos adicionales
-            if 'fecha_nacimiento' in datos_inscrito and datos_inscrito['fecha_nacimiento']:
-                nuevo_inscrito['fecha_nacimiento'] = str(datos_inscrito['fecha_nacimiento'])
-            else:
-                nuevo_inscrito['fecha_nacimiento'] = ''
-            
-            if 'como_se_entero' in datos_inscrito and datos_inscrito['como_se_entero']:
-                nuevo_inscrito['como_se_entero'] = datos_inscrito['como_se_entero']
-            else:
-                nuevo_inscrito['como_se_entero'] = ''
-            
-            # Agregar al DataFrame de inscritos
-            nuevo_df = pd.DataFrame([nuevo_inscrito])
-            if self.df_inscritos.empty:
-                self.df_inscritos = nuevo_df
-            else:
-                self.df_inscritos = pd.concat([self.df_inscritos, nuevo_df], ignore_index=True)
-            
-            # También crear registro en usuarios.csv
-            nuevo_usuario = {
-                'usuario': matricula,
-                'password': '123',
-                'rol': 'inscrito',
-                'nombre': datos_inscrito['nombre_completo'],
-                'email': datos_inscrito['email'],
-                'activo': 'True',
-                'fecha_registro': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'estatus': 'activo'
-            }
-            
-            nuevo_user_df = pd.DataFrame([nuevo_usuario])
-            if self.df_usuarios.empty:
-                self.df_usuarios = nuevo_user_df
-            else:
-                self.df_usuarios = pd.concat([self.df_usuarios, nuevo_user_df], ignore_index=True)
-            
-            # Guardar datos en servidor remoto
-            if self.guardar_datos():
-                # ENVIAR CORREO DE CONFIRMACIÓN
-                correo_enviado = self.sistema_correos.enviar_correo_confirmacion(
-                    destinatario=datos_inscrito['email'],
-                    nombre_estudiante=datos_inscrito['nombre_completo'],
-                    matricula=matricula,
-                    folio=nuevo_inscrito['folio'],
-                    programa=datos_inscrito['programa_interes']
-                )
-                
-                if correo_enviado:
-                    st.success("📧 ¡Correo de confirmación enviado exitosamente!")
-                else:
-                    st.warning("⚠️ Registro completado, pero no se pudo enviar el correo de confirmación.")
-                
-                return matricula, nuevo_inscrito['folio']
-            else:
-                return None, None
-                
-        except Exception as e:
-            st.error(f"❌ Error al registrar inscrito: {e}")
-            return None, None
+    # Anexar el alta al registro remoto
+    nuevo_inscrito, nuevo_usuario = construir_registros_alta(
+        datos['matricula'], datos['folio'], datos, nombres_documentos
+    )
+    motor = obtener_motor_datasets()
+    if motor is not None:
+        # Los reintentos vuelven a escribir el mismo registro en lugar de fallar por clave duplicada
+        motor.insertar_varios({'inscritos': nuevo_inscrito, 'usuarios': nuevo_usuario}, reemplazar=True)
+    else:
+        registro_altas = obtener_registro_altas()
+        registro_altas.agregar({'inscritos': nuevo_inscrito, 'usuarios': nuevo_usuario})
+        if registro_altas.necesita_compactar():
+            registro_altas.compactar_en_segundo_plano()
+    obtener_estadisticas().sumar({'inscritos': [nuevo_inscrito], 'usuarios': [nuevo_usuario]})
     
-    def guardar_documento(self, matricula, nombre_completo, tipo_documento, archivo_streamlit):
-        """Guardar documento del inscrito en uploads/ - COMPLETO"""
-        try:
-            # Generar nombre de archivo estandarizado
-            timestamp = datetime.now().strftime('%y%m%d%H%M%S')
-            nombre_limpio = ''.join(c for c in nombre_completo if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            nombre_limpio = nombre_limpio.replace(' ', '_')[:30]
-            tipo_limpio = tipo_documento.replace(' ', '_').upper()
-            
-            # Obtener extensión del archivo
-            nombre_original = archivo_streamlit.name
-            extension = nombre_original.split('.')[-1].lower() if '.' in nombre_original else 'pdf'
-            
-            # Nombre del archivo final
-            nombre_archivo = f"{matricula}_{nombre_limpio}_{timestamp}_{tipo_limpio}.{extension}"
-            
-            # Ruta completa en servidor remoto
-            ruta_completa = os.path.join(self.carpeta_documentos, nombre_archivo)
-            
-            # Obtener bytes del archivo Streamlit
-            archivo_bytes = archivo_streamlit.getvalue()
-            
-            # Guardar archivo en servidor remoto
-            if self.guardar_archivo_remoto(archivo_bytes, ruta_completa):
-                return nombre_archivo
-            else:
-                return None
-            
-        except Exception as e:
-            st.error(f"❌ Error al guardar documento {tipo_documento}: {e}")
-            return None
+    correo_enviado = SistemaCorreos().enviar_correo_confirmacion(
+        destinatario=datos['email'],
+        nombre_estudiante=datos['nombre_completo'],
+        matricula=datos['matricula'],
+        folio=datos['folio'],
+        programa=datos['programa_interes'],
+        mostrar_errores=False
+    )
+    return {'documentos': len(nombres_documentos), 'correo_enviado': correo_enviado}
+
+@st.cache_resource
+def obtener_indice_duplicados():
+    """Índice de llaves de aspirantes del proceso (se reconstruye cada 5 minutos)"""
+    return duplicados40.IndiceDuplicados(vigencia=300)
+
+def buscar_duplicados(nombre_completo, email, telefono):
+    """Inscritos que comparten correo, teléfono o nombre normalizado: {matrícula: [campos]}"""
+    indice = obtener_indice_duplicados()
+    if not indice.vigente():
+        indice.construir(obtener_sistema_inscritos().df_inscritos)
+    return indice.buscar(nombre_completo, email, telefono)
 
-# Instancia del sistema de inscritos
-sistema_inscritos = SistemaInscritos()
+@st.cache_resource
+def obtener_cola_solicitudes():
+    """Cola de solicitudes del proceso con su grupo de hilos de trabajo"""
+    cola = cola_solicitudes40.ColaSolicitudes(
+        st.secrets.get("cola_dir", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cola_solicitudes")),
+        procesar_solicitud,
+        trabajadores=int(st.secrets.get("cola_trabajadores", 4))
+    )
+    cola.iniciar()
+    return cola
+
+def mostrar_estado_cola(cola):
+    """Mostrar profundidad de la cola y latencia de procesamiento"""
+    estadisticas = cola.estadisticas()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📥 En cola", estadisticas['en_cola'])
+    col2.metric("⚙️ En proceso", f"{estadisticas['en_proceso']}/{estadisticas['trabajadores']}")
+    col3.metric("✅ Procesadas", estadisticas['completadas'], delta=f"{estadisticas['errores']} con error" if estadisticas['errores'] else None, delta_color="inverse")
+    if estadisticas['latencia_promedio'] is None:
+        col4.metric("⏱️ Latencia", "—")
+    else:
+        col4.metric("⏱️ Latencia promedio", f"{estadisticas['latencia_promedio']:.1f} s",
+                    help=f"p95: {estadisticas['latencia_p95']:.1f} s")
 
 # =============================================================================
 # CONFIGURACIÓN Y ESTILOS DEL WEBSITE PÚBLICO - COMPLETO
@@ -579,64 +639,25 @@ def aplicar_estilos_publicos():
     """, unsafe_allow_html=True)
 
 # =============================================================================
-# DATOS ESTÁTICOS DE LA INSTITUCIÓN (SOLO INFORMACIÓN PÚBLICA) - COMPLETO
+# CATÁLOGO PÚBLICO (PROGRAMAS, COSTOS Y TESTIMONIOS)
 # =============================================================================
 
-def obtener_programas_academicos():
-    """Obtener lista de programas académicos disponibles - SOLO INFORMACIÓN PÚBLICA"""
-    return [
-        {
-            "nombre": "Especialidad en Enfermería Cardiovascular",
-            "duracion": "2 años",
-            "modalidad": "Presencial",
-            "descripcion": "Formación especializada en el cuidado de pacientes con patologías cardiovasculares.",
-            "requisitos": ["Licenciatura en Enfermería", "Cédula profesional", "2 años de experiencia"]
-        },
-        {
-            "nombre": "Licenciatura en Enfermería",
-            "duracion": "4 años",
-            "modalidad": "Presencial",
-            "descripcion": "Formación integral en enfermería con enfoque en cardiología.",
-            "requisitos": ["Bachillerato terminado", "Promedio mínimo 8.0"]
-        },
-        {
-            "nombre": "Diplomado de Cardiología Básica",
-            "duracion": "6 meses",
-            "modalidad": "Híbrida",
-            "descripcion": "Actualización en fundamentos de cardiología para profesionales de la salud.",
-            "requisitos": ["Título profesional en área de la salud"]
-        },
-        {
-            "nombre": "Maestría en Ciencias Cardiológicas",
-            "duracion": "2 años",
-            "modalidad": "Presencial",
-            "descripcion": "Formación de investigadores en el área de ciencias cardiológicas.",
-            "requisitos": ["Licenciatura en áreas afines", "Promedio mínimo 8.5"]
-        }
-    ]
+@st.cache_resource
+def obtener_catalogo_publico():
+    """Catálogo compartido por todas las sesiones; se revalida en segundo plano"""
+    return catalogo40.crear_catalogo_publico(
+        CargadorRemoto,
+        st.secrets["remote_dir"],
+        archivo_local=st.secrets.get(
+            "catalogo_local",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogo_publico.json")
+        ),
+        vigencia=int(st.secrets.get("catalogo_vigencia", 300))
+    )
 
-def obtener_testimonios():
-    """Obtener testimonios de estudiantes y egresados - SOLO INFORMACIÓN PÚBLICA"""
-    return [
-        {
-            "nombre": "Dra. Ana Martínez",
-            "programa": "Especialidad en Enfermería Cardiovascular",
-            "testimonio": "La especialidad me dio las herramientas para trabajar en la unidad de cardiología del hospital más importante del país.",
-            "foto": "👩‍⚕️"
-        },
-        {
-            "nombre": "Lic. Carlos Rodríguez",
-            "programa": "Licenciatura en Enfermería",
-            "testimonio": "La formación con enfoque cardiológico me diferenció en el mercado laboral. ¡Altamente recomendable!",
-            "foto": "👨‍⚕️"
-        },
-        {
-            "nombre": "Dr. Miguel Torres",
-            "programa": "Diplomado de Cardiología Básica",
-            "testimonio": "Perfecto para actualizarse sin dejar de trabajar. Los profesores son expertos en su área.",
-            "foto": "🧑‍⚕️"
-        }
-    ]
+def obtener_modelo_catalogo():
+    """Modelo listo para mostrar (programas, nombres de programas y testimonios) - SOLO INFORMACIÓN PÚBLICA"""
+    return obtener_catalogo_publico().obtener()
 
 # =============================================================================
 # SECCIONES DEL WEBSITE PÚBLICO - COMPLETO
@@ -686,7 +707,7 @@ def mostrar_programas_academicos():
     """Mostrar oferta académica"""
     st.markdown('<div class="sub-header">📚 Nuestra Oferta Académica</div>', unsafe_allow_html=True)
     
-    programas = obtener_programas_academicos()
+    programas = obtener_modelo_catalogo()['programas']
     
     for i, programa in enumerate(programas):
         with st.container():
@@ -694,13 +715,18 @@ def mostrar_programas_academicos():
             
             with col1:
                 st.markdown(f'<div class="programa-card">', unsafe_allow_html=True)
-                st.markdown(f"### **{programa['nombre']}**")
-                st.markdown(f"**Duración:** {programa['duracion']} | **Modalidad:** {programa['modalidad']}")
-                st.markdown(f"{programa['descripcion']}")
+                st.markdown(programa['titulo'])
+                st.markdown(programa['detalles'])
+                st.markdown(programa['descripcion'])
                 
-                with st.expander("📋 Ver requisitos"):
-                    for requisito in programa['requisitos']:
-                        st.write(f"• {requisito}")
+                if programa['requisitos']:
+                    with st.expander("📋 Ver requisitos"):
+                        for requisito in programa['requisitos']:
+                            st.write(requisito)
+                if programa['costos']:
+                    with st.expander("💰 Ver costos"):
+                        for costo in programa['costos']:
+                            st.write(costo)
                 st.markdown('</div>', unsafe_allow_html=True)
             
             with col2:
@@ -715,16 +741,16 @@ def mostrar_testimonios():
     st.markdown("---")
     st.markdown('<div class="sub-header">🌟 Testimonios de Nuestra Comunidad</div>', unsafe_allow_html=True)
     
-    testimonios = obtener_testimonios()
+    testimonios = obtener_modelo_catalogo()['testimonios']
     cols = st.columns(3)
     
     for i, testimonio in enumerate(testimonios):
-        with cols[i]:
+        with cols[i % 3]:
             st.markdown(f'<div class="testimonio">', unsafe_allow_html=True)
             st.markdown(f"### {testimonio['foto']}")
             st.markdown(f"**{testimonio['nombre']}**")
-            st.markdown(f"*{testimonio['programa']}*")
-            st.markdown(f"\"{testimonio['testimonio']}\"")
+            st.markdown(testimonio['programa_md'])
+            st.markdown(testimonio['testimonio_md'])
             st.markdown('</div>', unsafe_allow_html=True)
 
 def mostrar_formulario_inscripcion():
@@ -735,6 +761,10 @@ def mostrar_formulario_inscripcion():
     if 'formulario_enviado' not in st.session_state:
         st.session_state.formulario_enviado = False
     
+    # Token de idempotencia: un mismo envío (doble clic o rerun) devuelve el recibo original
+    if 'token_solicitud' not in st.session_state:
+        st.session_state.token_solicitud = uuid.uuid4().hex
+    
     if not st.session_state.formulario_enviado:
         with st.form("formulario_inscripcion", clear_on_submit=True):
             col1, col2 = st.columns(2)
@@ -744,7 +774,7 @@ def mostrar_formulario_inscripcion():
                 email = st.text_input("📧 Correo Electrónico *", placeholder="ejemplo@email.com")
                 programa_interes = st.selectbox(
                     "🎯 Programa de Interés *",
-                    [p['nombre'] for p in obtener_programas_academicos()]
+                    obtener_modelo_catalogo()['nombres_programas']
                 )
             
             with col2:
@@ -809,84 +839,113 @@ def mostrar_formulario_inscripcion():
                     st.error(f"❌ Faltan los siguientes documentos: {', '.join(docs_faltantes)}")
                     return
                 
-                # Registrar inscrito
-                with st.spinner("Procesando tu solicitud..."):
-                    # PRIMERO: Generar la matrícula única UNA SOLA VEZ
-                    matricula_unica = sistema_inscritos.generar_matricula_inscrito()
-                    
-                    datos_inscrito = {
-                        'nombre_completo': nombre_completo,
-                        'email': email,
-                        'telefono': telefono,
-                        'programa_interes': programa_interes,
-                        'fecha_nacimiento': fecha_nacimiento,
-                        'como_se_entero': como_se_entero
-                    }
-                    
-                    # SEGUNDO: Guardar documentos con la MISMA matrícula
-                    documentos_guardados = 0
-                    nombres_documentos = []
-                    
-                    # Lista de documentos a procesar
-                    documentos_a_procesar = [
-                        (acta_nacimiento, "ACTA_NACIMIENTO"),
-                        (curp, "CURP"), 
-                        (certificado, "CERTIFICADO_ESTUDIOS"),
-                        (foto, "FOTOGRAFIA") if foto else None
-                    ]
-                    
-                    # Procesar cada documento
-                    for doc_info in documentos_a_procesar:
-                        if doc_info and doc_info[0] is not None:
-                            try:
-                                nombre_archivo = sistema_inscritos.guardar_documento(
-                                    matricula_unica, 
-                                    nombre_completo, 
-                                    doc_info[1], 
-                                    doc_info[0]
+                # Recibir la solicitud: se guarda localmente y se procesa en segundo plano
+                with st.spinner("Recibiendo tu solicitud..."):
+                    try:
+                        cola = obtener_cola_solicitudes()
+                        
+                        datos_formulario = {
+                            'nombre_completo': nombre_completo,
+                            'email': email,
+                            'telefono': telefono,
+                            'programa_interes': programa_interes,
+                            'fecha_nacimiento': str(fecha_nacimiento) if fecha_nacimiento else '',
+                            'como_se_entero': como_se_entero
+                        }
+                        
+                        # Documentos a procesar (la fotografía es opcional)
+                        documentos_a_procesar = [
+                            (acta_nacimiento, "ACTA_NACIMIENTO"),
+                            (curp, "CURP"),
+                            (certificado, "CERTIFICADO_ESTUDIOS"),
+                            (foto, "FOTOGRAFIA")
+                        ]
+                        documentos = [
+                            (tipo, archivo.name, archivo.getvalue())
+                            for archivo, tipo in documentos_a_procesar if archivo is not None
+                        ]
+                        
+                        # Llaves de idempotencia: token del formulario y huella del contenido
+                        llaves = [
+                            f"token:{st.session_state.token_solicitud}",
+                            f"contenido:{cola_solicitudes40.huella_solicitud(datos_formulario, documentos)}"
+                        ]
+                        
+                        recibo = cola.buscar(llaves)
+                        if not recibo:
+                            # Misma persona ya pre-inscrita: mismo correo más teléfono o nombre
+                            coincidencias = buscar_duplicados(nombre_completo, email, telefono)
+                            previas = [m for m, campos in coincidencias.items() if 'email' in campos and len(campos) > 1]
+                            if previas:
+                                st.error(f"❌ Ya existe una pre-inscripción con estos datos (matrícula {previas[0]}). "
+                                         "Si necesitas actualizarla, escribe a admisiones@escuelaenfermeria.edu.mx")
+                                return
+                            
+                            # La matrícula y el folio se asignan al recibir, para entregarlos en el recibo
+                            matricula_unica = generar_matricula_inscrito()
+                            if not matricula_unica:
+                                st.error("❌ No se pudo generar tu matrícula. Por favor intenta nuevamente.")
+                                return
+                            
+                            # Las coincidencias parciales se registran para revisión del administrador
+                            datos_inscrito = dict(
+                                datos_formulario,
+                                matricula=matricula_unica,
+                                folio=generar_folio(),
+                                posibles_duplicados='; '.join(
+                                    f"{m} ({', '.join(campos)})" for m, campos in coincidencias.items()
                                 )
-                                if nombre_archivo:
-                                    documentos_guardados += 1
-                                    nombres_documentos.append(nombre_archivo)
-                                    st.success(f"✅ {doc_info[1]} guardado correctamente")
-                                else:
-                                    st.warning(f"⚠️ No se pudo guardar: {doc_info[1]}")
-                            except Exception as e:
-                                st.warning(f"⚠️ Error con {doc_info[1]}: {e}")
+                            )
+                            recibo = cola.recibir(datos_inscrito, documentos, llaves)
+                            if not recibo['repetida']:
+                                obtener_indice_duplicados().agregar(matricula_unica, nombre_completo, email, telefono)
+                    except Exception as e:
+                        st.error(f"❌ No se pudo recibir tu solicitud: {e}. Por favor intenta nuevamente.")
+                        return
                     
-                    # TERCERO: Registrar el inscrito con la MISMA matrícula y nombres de documentos
-                    if documentos_guardados >= 3:  # Al menos los 3 documentos obligatorios
-                        matricula_registrada, folio = sistema_inscritos.registrar_inscrito(
-                            matricula_unica, 
-                            datos_inscrito, 
-                            nombres_documentos
-                        )
-                        
-                        if matricula_registrada and folio:
-                            st.session_state.formulario_enviado = True
-                            st.session_state.datos_exitosos = {
-                                'folio': folio,
-                                'matricula': matricula_registrada,
-                                'email': email,
-                                'telefono': telefono,
-                                'programa': programa_interes,
-                                'documentos': documentos_guardados,
-                                'nombre': nombre_completo
-                            }
-                            st.rerun()
-                        else:
-                            st.error("❌ Error al registrar el inscrito. Por favor intenta nuevamente.")
-                    else:
-                        st.error("❌ No se pudieron guardar los documentos obligatorios. Por favor intenta nuevamente.")
+                    datos_recibidos = recibo['datos']
+                    st.session_state.formulario_enviado = True
+                    st.session_state.datos_exitosos = {
+                        'folio': datos_recibidos['folio'],
+                        'matricula': datos_recibidos['matricula'],
+                        'email': datos_recibidos['email'],
+                        'telefono': datos_recibidos['telefono'],
+                        'programa': datos_recibidos['programa_interes'],
+                        'documentos': recibo['documentos'],
+                        'nombre': datos_recibidos['nombre_completo'],
+                        'recibo': recibo['id'],
+                        'recibido_en': recibo['recibido_en'],
+                        'posicion': recibo['posicion'],
+                        'repetida': recibo['repetida']
+                    }
+                    st.rerun()
     
     else:
         # Mostrar resultados exitosos
         datos = st.session_state.datos_exitosos
         
-        st.success("🎉 ¡Solicitud enviada exitosamente!")
+        st.success("🎉 ¡Solicitud recibida exitosamente!")
+        if datos.get('repetida'):
+            st.info("ℹ️ Ya habíamos recibido esta solicitud; te mostramos el recibo original.")
+        
+        # Estado del procesamiento en segundo plano
+        cola = obtener_cola_solicitudes()
+        solicitud = cola.leer(datos['recibo']) or {}
+        estado = solicitud.get('estado', 'PENDIENTE')
+        if estado == 'COMPLETADA':
+            st.success(f"✅ Tu solicitud **{datos['recibo']}** fue procesada y tus documentos están registrados.")
+        elif estado == 'ERROR':
+            st.error(f"❌ No pudimos procesar tu solicitud **{datos['recibo']}**. "
+                     "Contacta a admisiones@escuelaenfermeria.edu.mx indicando tu número de recibo.")
+        else:
+            st.info(f"⏳ Tu solicitud **{datos['recibo']}** (recibida el {datos['recibido_en']}) está en proceso. "
+                    f"Posición al recibirla: {datos['posicion']}.")
+            if st.button("🔄 Actualizar estado"):
+                st.rerun()
         
         col_res1, col_res2 = st.columns(2)
         with col_res1:
+            st.info(f"**🧾 Número de recibo:** {datos['recibo']}")
             st.info(f"**📋 Folio de solicitud:** {datos['folio']}")
             st.info(f"**🎓 Matrícula de inscrito:** {datos['matricula']}")
             st.info(f"**📧 Email de contacto:** {datos['email']}")
@@ -908,12 +967,15 @@ def mostrar_formulario_inscripcion():
         *Te contactaremos al correo proporcionado para informarte los siguientes pasos.*
         """)
         
-        st.info("📧 **Se ha enviado un correo de confirmación a tu dirección de email con todos los detalles de tu registro.**")
+        st.info("📧 **Recibirás un correo de confirmación con todos los detalles de tu registro en cuanto se procese tu solicitud.**")
+        
+        with st.expander("📊 Estado de la cola de solicitudes"):
+            mostrar_estado_cola(cola)
         
         # Mostrar información importante
         st.warning("""
         **⚠️ IMPORTANTE:** 
-        - Guarda tu matrícula y folio para futuras consultas
+        - Guarda tu número de recibo, matrícula y folio para futuras consultas
         - Verifica tu bandeja de entrada y spam
         - Si no recibes el correo en 24 horas, contacta a admisiones@escuelaenfermeria.edu.mx
         """)
@@ -923,6 +985,7 @@ def mostrar_formulario_inscripcion():
             if st.button("📝 Realizar otra pre-inscripción", use_container_width=True):
                 st.session_state.formulario_enviado = False
                 st.session_state.mostrar_formulario = False
+                del st.session_state.token_solicitud
                 st.rerun()
 
 def mostrar_contacto():
@@ -1049,4 +1112,5 @@ def main():
 # =============================================================================
 
 if __name__ == "__main__":
+    configurar_pagina()
     main()
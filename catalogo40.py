@@ -0,0 +1,285 @@
+"""Catálogo público de programas (programas_educativos.csv y costos_programas.csv)
+
+El sitio público muestra un modelo ya armado (tarjetas de programas con sus
+requisitos y costos, nombres para el formulario y testimonios) que se
+guarda en memoria y en una copia local. Las visitas nunca se conectan al
+servidor: cuando el modelo caduca se revalida en un hilo. La revalidación
+compara la versión de los archivos remotos (tamaño y fecha de
+modificación) y solo descarga y reconstruye si cambiaron.
+
+Columnas esperadas:
+- programas_educativos.csv: nombre, duracion, modalidad, descripcion,
+  requisitos (separados por "|"), activo (opcional), orden (opcional).
+  También se acepta programa o nombre_programa en lugar de nombre.
+- costos_programas.csv: programa, concepto, monto.
+- testimonios.csv (opcional): nombre, programa, testimonio, foto.
+"""
+
+import json
+import os
+import threading
+import time
+from io import BytesIO
+
+import pandas as pd
+
+# Catálogo de respaldo mientras no haya una copia del servidor
+PROGRAMAS_PREDETERMINADOS = [
+    {
+        "nombre": "Especialidad en Enfermería Cardiovascular",
+        "duracion": "2 años",
+        "modalidad": "Presencial",
+        "descripcion": "Formación especializada en el cuidado de pacientes con patologías cardiovasculares.",
+        "requisitos": ["Licenciatura en Enfermería", "Cédula profesional", "2 años de experiencia"]
+    },
+    {
+        "nombre": "Licenciatura en Enfermería",
+        "duracion": "4 años",
+        "modalidad": "Presencial",
+        "descripcion": "Formación integral en enfermería con enfoque en cardiología.",
+        "requisitos": ["Bachillerato terminado", "Promedio mínimo 8.0"]
+    },
+    {
+        "nombre": "Diplomado de Cardiología Básica",
+        "duracion": "6 meses",
+        "modalidad": "Híbrida",
+        "descripcion": "Actualización en fundamentos de cardiología para profesionales de la salud.",
+        "requisitos": ["Título profesional en área de la salud"]
+    },
+    {
+        "nombre": "Maestría en Ciencias Cardiológicas",
+        "duracion": "2 años",
+        "modalidad": "Presencial",
+        "descripcion": "Formación de investigadores en el área de ciencias cardiológicas.",
+        "requisitos": ["Licenciatura en áreas afines", "Promedio mínimo 8.5"]
+    }
+]
+
+TESTIMONIOS_PREDETERMINADOS = [
+    {
+        "nombre": "Dra. Ana Martínez",
+        "programa": "Especialidad en Enfermería Cardiovascular",
+        "testimonio": "La especialidad me dio las herramientas para trabajar en la unidad de cardiología del hospital más importante del país.",
+        "foto": "👩‍⚕️"
+    },
+    {
+        "nombre": "Lic. Carlos Rodríguez",
+        "programa": "Licenciatura en Enfermería",
+        "testimonio": "La formación con enfoque cardiológico me diferenció en el mercado laboral. ¡Altamente recomendable!",
+        "foto": "👨‍⚕️"
+    },
+    {
+        "nombre": "Dr. Miguel Torres",
+        "programa": "Diplomado de Cardiología Básica",
+        "testimonio": "Perfecto para actualizarse sin dejar de trabajar. Los profesores son expertos en su área.",
+        "foto": "🧑‍⚕️"
+    }
+]
+
+
+# =============================================================================
+# CONSTRUCCIÓN DEL MODELO DE PRESENTACIÓN
+# =============================================================================
+
+def texto(valor):
+    return str(valor).strip() if pd.notna(valor) else ''
+
+def formatear_monto(valor):
+    try:
+        return f"${float(str(valor).replace('$', '').replace(',', '')):,.2f} MXN"
+    except ValueError:
+        return texto(valor)
+
+def programas_desde_dataframes(df_programas, df_costos=None):
+    """Programas activos del CSV, en orden, con sus costos: lista de dicts"""
+    if df_programas is None or df_programas.empty:
+        return []
+
+    columna_nombre = next((c for c in ['nombre', 'programa', 'nombre_programa'] if c in df_programas.columns), None)
+    if columna_nombre is None:
+        return []
+
+    df = df_programas[df_programas[columna_nombre].notna()].copy()
+    if 'activo' in df.columns:
+        df = df[~df['activo'].astype(str).str.strip().str.lower().isin(['0', 'false', 'no', 'inactivo'])]
+    if 'orden' in df.columns:
+        df = df.assign(orden=pd.to_numeric(df['orden'], errors='coerce')).sort_values('orden', kind='stable')
+
+    costos = {}
+    if df_costos is not None and not df_costos.empty and {'programa', 'monto'} <= set(df_costos.columns):
+        for _, fila in df_costos[df_costos['programa'].notna()].iterrows():
+            costos.setdefault(texto(fila['programa']), []).append({
+                'concepto': texto(fila.get('concepto')) or 'Costo',
+                'monto': formatear_monto(fila['monto'])
+            })
+
+    programas = []
+    for _, fila in df.iterrows():
+        nombre = texto(fila[columna_nombre])
+        programas.append({
+            'nombre': nombre,
+            'duracion': texto(fila.get('duracion')),
+            'modalidad': texto(fila.get('modalidad')),
+            'descripcion': texto(fila.get('descripcion')),
+            'requisitos': [r.strip() for r in texto(fila.get('requisitos')).split('|') if r.strip()],
+            'costos': costos.get(nombre, [])
+        })
+    return programas
+
+def testimonios_desde_dataframe(df):
+    """Testimonios del CSV opcional: lista de dicts"""
+    if df is None or df.empty or 'testimonio' not in df.columns:
+        return []
+    return [{
+        'nombre': texto(fila.get('nombre')),
+        'programa': texto(fila.get('programa')),
+        'testimonio': texto(fila['testimonio']),
+        'foto': texto(fila.get('foto')) or '🎓'
+    } for _, fila in df[df['testimonio'].notna()].iterrows()]
+
+def construir_modelo(programas, testimonios, version=None, origen='predeterminado'):
+    """Modelo listo para mostrar: textos de cada tarjeta, nombres y testimonios"""
+    tarjetas = []
+    for programa in programas:
+        detalles = [f"**{etiqueta}:** {programa[campo]}"
+                    for etiqueta, campo in [('Duración', 'duracion'), ('Modalidad', 'modalidad')] if programa.get(campo)]
+        tarjetas.append({
+            'nombre': programa['nombre'],
+            'titulo': f"### **{programa['nombre']}**",
+            'detalles': ' | '.join(detalles),
+            'descripcion': programa.get('descripcion', ''),
+            'requisitos': [f"• {requisito}" for requisito in programa.get('requisitos', [])],
+            'costos': [f"• {costo['concepto']}: {costo['monto']}" for costo in programa.get('costos', [])]
+        })
+    return {
+        'programas': tarjetas,
+        'nombres_programas': [tarjeta['nombre'] for tarjeta in tarjetas],
+        'testimonios': [dict(t, programa_md=f"*{t['programa']}*", testimonio_md=f"\"{t['testimonio']}\"")
+                        for t in testimonios],
+        'version': version,
+        'origen': origen,
+        'actualizado_en': time.time()
+    }
+
+def modelo_predeterminado():
+    return construir_modelo(PROGRAMAS_PREDETERMINADOS, TESTIMONIOS_PREDETERMINADOS)
+
+
+# =============================================================================
+# CACHÉ COMPARTIDA CON REVALIDACIÓN EN SEGUNDO PLANO
+# =============================================================================
+
+class CatalogoPublico:
+    def __init__(self, crear_cargador, rutas, archivo_local=None, vigencia=300):
+        """
+        crear_cargador: función que devuelve un cargador con
+        conectar(mostrar_errores), desconectar() y atributo sftp.
+        rutas: {'programas': ruta, 'costos': ruta, 'testimonios': ruta}
+        (testimonios es opcional).
+        archivo_local: copia JSON del último modelo, para arrancar sin SSH.
+        """
+        self.crear_cargador = crear_cargador
+        self.rutas = rutas
+        self.archivo_local = archivo_local
+        self.vigencia = vigencia
+        self.revalidando = threading.Lock()
+        self.revisado_en = 0
+        self.ultimo_error = None
+        self.modelo = self.leer_copia_local() or modelo_predeterminado()
+
+    def leer_copia_local(self):
+        if not self.archivo_local:
+            return None
+        try:
+            with open(self.archivo_local, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return None
+
+    def guardar_copia_local(self, modelo):
+        if not self.archivo_local:
+            return
+        try:
+            with open(self.archivo_local + '.tmp', 'w', encoding='utf-8') as archivo:
+                json.dump(modelo, archivo, ensure_ascii=False)
+            os.replace(self.archivo_local + '.tmp', self.archivo_local)
+        except OSError:
+            pass
+
+    def obtener(self):
+        """Modelo actual (sin conexión); si caducó, lanza la revalidación en un hilo"""
+        if time.time() - self.revisado_en >= self.vigencia and not self.revalidando.locked():
+            threading.Thread(target=self.revalidar, daemon=True).start()
+        return self.modelo
+
+    def version_remota(self, sftp):
+        """Versión de los archivos remotos: {clave: 'tamaño-mtime'} (None si no existe)"""
+        version = {}
+        for clave, ruta in self.rutas.items():
+            try:
+                atributos = sftp.stat(ruta)
+                version[clave] = f"{atributos.st_size}-{int(atributos.st_mtime or 0)}"
+            except FileNotFoundError:
+                version[clave] = None
+        return version
+
+    def leer_remoto(self, sftp, clave):
+        try:
+            with sftp.file(self.rutas[clave], 'r') as archivo:
+                contenido = archivo.read()
+        except FileNotFoundError:
+            return pd.DataFrame()
+        try:
+            return pd.read_csv(BytesIO(contenido), encoding='utf-8', dtype=str)
+        except UnicodeDecodeError:
+            return pd.read_csv(BytesIO(contenido), encoding='latin-1', dtype=str)
+
+    def revalidar(self, forzar=False):
+        """Comparar versiones y reconstruir el modelo si cambiaron; True si se reconstruyó"""
+        if not self.revalidando.acquire(blocking=False):
+            return False
+        try:
+            cargador = self.crear_cargador()
+            if not cargador.conectar(mostrar_errores=False):
+                self.ultimo_error = "No se pudo conectar al servidor remoto"
+                return False
+            try:
+                sftp = cargador.sftp
+                version = self.version_remota(sftp)
+                if not forzar and version == self.modelo.get('version'):
+                    return False
+
+                programas = programas_desde_dataframes(self.leer_remoto(sftp, 'programas'), self.leer_remoto(sftp, 'costos'))
+                if not programas:
+                    # Sin catálogo en el servidor se conserva el modelo actual
+                    return False
+                testimonios = TESTIMONIOS_PREDETERMINADOS
+                if 'testimonios' in self.rutas:
+                    testimonios = testimonios_desde_dataframe(self.leer_remoto(sftp, 'testimonios')) or testimonios
+
+                self.modelo = construir_modelo(programas, testimonios, version, origen='servidor')
+                self.guardar_copia_local(self.modelo)
+                self.ultimo_error = None
+                return True
+            finally:
+                cargador.desconectar()
+        except Exception as e:
+            self.ultimo_error = str(e)
+            return False
+        finally:
+            self.revisado_en = time.time()
+            self.revalidando.release()
+
+
+def crear_catalogo_publico(crear_cargador, base_dir_remoto, archivo_local=None, **opciones):
+    """Catálogo público con las rutas estándar del servidor"""
+    return CatalogoPublico(
+        crear_cargador,
+        {
+            'programas': os.path.join(base_dir_remoto, "datos", "programas_educativos.csv"),
+            'costos': os.path.join(base_dir_remoto, "datos", "costos_programas.csv"),
+            'testimonios': os.path.join(base_dir_remoto, "datos", "testimonios.csv")
+        },
+        archivo_local,
+        **opciones
+    )
@@ -0,0 +1,165 @@
+"""Ejecutor de migraciones por línea de comandos (sin interfaz)
+
+Usa la misma capa de datos y el mismo sistema de migración por lotes que
+migracion40.py. Requiere el mismo .streamlit/secrets.toml.
+
+Ejemplos:
+    python cli_migracion40.py inscrito_estudiante --programa "Licenciatura en Enfermería" --cohorte 2025 --dato "genero=Prefiero no decir"
+    python cli_migracion40.py estudiante_egresado --csv egresan.csv --dato nivel_academico=Maestría --dato "estado_laboral=Buscando empleo"
+    python cli_migracion40.py egresado_contratado --matricula MAT-EGR12345 --dato puesto=Enfermera --dato departamento=Urgencias \
+        --dato "salario=25000 MXN" --dato "tipo_contrato=Tiempo completo" --dato fecha_fin=2026-12-31 --formato csv --salida resultado.csv
+    python cli_migracion40.py inscrito_estudiante --cohorte 2025 --dato genero=Femenino --simular --formato diff
+
+Los datos de las personas que no tienen valor por defecto (p. ej. género,
+puesto o salario) son obligatorios con --dato; sin ellos no se ejecuta nada.
+El CSV de entrada debe tener una columna 'matricula'. El resultado (JSON o CSV)
+incluye un renglón por persona; el código de salida es 1 si hubo errores.
+Con --simular solo se calcula el conjunto de cambios, sin escribir en el servidor.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Silenciar los avisos de Streamlit al ejecutarse fuera de `streamlit run`
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+import pandas as pd
+
+
+def leer_matriculas_csv(ruta):
+    """Leer la lista de matrículas de un CSV con columna 'matricula'"""
+    df = pd.read_csv(ruta, dtype=str)
+    if 'matricula' not in df.columns:
+        raise ValueError(f"El archivo {ruta} no tiene la columna 'matricula'")
+    return [m.strip() for m in df['matricula'].dropna() if m.strip()]
+
+
+def convertir_dato(clave, valor):
+    """Convertir los valores --dato clave=valor; las claves fecha_* se leen como YYYY-MM-DD"""
+    if clave.startswith('fecha_'):
+        return datetime.strptime(valor, '%Y-%m-%d')
+    return valor
+
+
+def construir_parser(tipos):
+    parser = argparse.ArgumentParser(
+        description="Migración de roles por lotes sin interfaz (inscrito → estudiante → egresado → contratado)"
+    )
+    parser.add_argument("tipo", choices=tipos, help="Transición a ejecutar")
+    parser.add_argument("--csv", help="CSV con la columna 'matricula' de las personas a migrar")
+    parser.add_argument("--matricula", action="append", default=[], help="Matrícula a migrar (repetible)")
+    parser.add_argument("--programa", action="append", default=[], help="Filtrar por programa (repetible)")
+    parser.add_argument("--cohorte", action="append", default=[], help="Filtrar por año de cohorte (repetible)")
+    parser.add_argument("--estatus", action="append", default=[], help="Filtrar por estatus (repetible)")
+    parser.add_argument("--dato", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="Sobrescribir un dato común del lote, p. ej. fecha_ingreso=2025-08-01")
+    parser.add_argument("--formato", choices=["json", "csv", "diff"], default="json",
+                        help="Formato del resultado ('diff' solo con --simular)")
+    parser.add_argument("--simular", action="store_true",
+                        help="Calcular y mostrar los cambios sin ejecutar la migración")
+    parser.add_argument("--salida", help="Archivo de salida (por defecto, la salida estándar)")
+    parser.add_argument("--todos", action="store_true",
+                        help="Permitir migrar el dataset de origen completo si no se da ningún filtro")
+    return parser
+
+
+def escribir_contenido(contenido, salida):
+    """Escribir en el archivo de salida o en la salida estándar"""
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+    else:
+        sys.stdout.write(contenido if contenido.endswith("\n") else contenido + "\n")
+
+
+def escribir_resultado(resumen, formato, salida):
+    """Escribir el resultado en JSON o CSV"""
+    if formato == "json":
+        contenido = json.dumps(resumen, ensure_ascii=False, indent=2, default=str)
+    else:
+        contenido = pd.DataFrame(resumen['resultados']).to_csv(index=False)
+    escribir_contenido(contenido, salida)
+
+
+def main(argv=None):
+    import migracion40
+
+    parser = construir_parser(list(migracion40.TRANSICIONES_MIGRACION.keys()))
+    args = parser.parse_args(argv)
+    if args.formato == "diff" and not args.simular:
+        parser.error("--formato diff solo se puede usar con --simular")
+
+    matriculas = list(args.matricula)
+    if args.csv:
+        matriculas.extend(leer_matriculas_csv(args.csv))
+
+    if not (matriculas or args.programa or args.cohorte or args.estatus or args.todos):
+        print("Indique --csv, --matricula o algún filtro (o --todos para migrar todo el origen)", file=sys.stderr)
+        return 2
+
+    datos = {}
+    for dato in args.dato:
+        clave, _, valor = dato.partition('=')
+        datos[clave.strip()] = convertir_dato(clave.strip(), valor.strip())
+    faltantes = [c for c in migracion40.TRANSICIONES_MIGRACION[args.tipo]['datos_requeridos'] if not datos.get(c)]
+    if faltantes:
+        print(f"Faltan datos obligatorios para {args.tipo}: "
+              f"{', '.join(f'--dato {c}=...' for c in faltantes)}", file=sys.stderr)
+        return 2
+
+    # Cargar los datos desde el servidor remoto y crear los servicios
+    migracion40.iniciar_aplicacion()
+    migrador_lotes = migracion40.migrador_lotes
+
+    datos_comunes = migrador_lotes.datos_comunes_por_defecto(args.tipo)
+    datos_comunes.update(datos)
+
+    seleccion = migrador_lotes.seleccionar(args.tipo, args.programa, args.cohorte, args.estatus, matriculas)
+
+    if args.simular:
+        _, cambios = migrador_lotes.simular(args.tipo, seleccion, datos_comunes)
+        if args.formato == "diff":
+            escribir_contenido(migrador_lotes.formatear_diff(cambios), args.salida)
+        elif args.formato == "json":
+            escribir_contenido(json.dumps(cambios, ensure_ascii=False, indent=2, default=str), args.salida)
+        else:
+            escribir_contenido(pd.DataFrame(cambios['personas']).to_csv(index=False), args.salida)
+        return 0
+
+    def progreso(fraccion, mensaje):
+        print(f"[{fraccion:6.1%}] {mensaje}", file=sys.stderr)
+
+    inicio = time.time()
+    resultados = migrador_lotes.ejecutar(args.tipo, seleccion, datos_comunes, progreso) if not seleccion.empty else []
+    duracion = round(time.time() - inicio, 3)
+
+    # Matrículas solicitadas que no están en el dataset de origen
+    encontradas = set(seleccion['matricula'].astype(str).str.strip()) if not seleccion.empty else set()
+    for matricula in dict.fromkeys(matriculas):
+        if matricula not in encontradas:
+            resultados.append({
+                'matricula_anterior': matricula, 'matricula_nueva': '', 'nombre_completo': '',
+                'estado': 'OMITIDO', 'archivos_renombrados': 0,
+                'mensaje': f"No se encontró en {migracion40.TRANSICIONES_MIGRACION[args.tipo]['origen']}.csv con los filtros dados"
+            })
+
+    estados = [r['estado'] for r in resultados]
+    resumen = {
+        'tipo': args.tipo,
+        'seleccionados': len(seleccion),
+        'ok': estados.count('OK'),
+        'omitidos': estados.count('OMITIDO'),
+        'errores': estados.count('ERROR'),
+        'duracion_segundos': duracion,
+        'resultados': resultados
+    }
+    escribir_resultado(resumen, args.formato, args.salida)
+    return 1 if resumen['errores'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""Cola de recepción de solicitudes de admisión
+
+El formulario guarda la solicitud (datos y documentos) en un directorio
+local y entrega un recibo de inmediato. Un grupo fijo de hilos procesa las
+solicitudes en segundo plano (subida de documentos, registro y correo).
+Cada solicitud vive en <directorio>/<id>/ con un solicitud.json que guarda
+su estado (PENDIENTE, EN_PROCESO, COMPLETADA, ERROR), por lo que las
+pendientes se vuelven a encolar si el proceso se reinicia. Las terminadas
+se eliminan cuando pasa el periodo de retención.
+
+Las solicitudes pueden llevar llaves de idempotencia (token del formulario
+y huella del contenido): una solicitud repetida devuelve el recibo original
+sin volver a guardar, subir, registrar ni enviar correos.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+
+def huella_solicitud(datos, documentos):
+    """Hash del contenido de una solicitud: datos normalizados más el hash de cada documento"""
+    normalizados = {clave: str(valor).strip().lower() for clave, valor in datos.items()}
+    huella = hashlib.sha256(json.dumps(normalizados, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    for tipo, _, contenido in sorted(documentos, key=lambda documento: documento[0]):
+        huella.update(tipo.encode('utf-8'))
+        huella.update(hashlib.sha256(contenido).digest())
+    return huella.hexdigest()
+
+
+class ColaSolicitudes:
+    def __init__(self, directorio, procesar, trabajadores=4, max_intentos=3, espera_reintento=10,
+                 retencion=7 * 24 * 3600):
+        """
+        procesar: función que recibe la solicitud (dict con id, datos y
+        documentos) y devuelve un dict con el resultado; si lanza una
+        excepción la solicitud se reintenta hasta max_intentos veces.
+        retencion: segundos que se conservan las solicitudes terminadas
+        (COMPLETADA o ERROR) antes de eliminar su carpeta.
+        """
+        self.directorio = directorio
+        self.procesar = procesar
+        self.trabajadores = trabajadores
+        self.max_intentos = max_intentos
+        self.espera_reintento = espera_reintento
+        self.retencion = retencion
+        self.ultima_depuracion = 0
+        self.cola = queue.Queue()
+        self.candado = threading.Lock()
+        self.en_proceso = 0
+        self.completadas = 0
+        self.errores = 0
+        self.latencias = deque(maxlen=200)  # segundos desde la recepción hasta terminar
+        self.llaves = {}  # llave de idempotencia -> id de solicitud
+        self.hilos = []
+
+    # -------------------------------------------------------------------------
+    # Persistencia local
+    # -------------------------------------------------------------------------
+
+    def ruta_solicitud(self, id_solicitud):
+        return os.path.join(self.directorio, id_solicitud, "solicitud.json")
+
+    def guardar(self, solicitud):
+        """Guardar el estado de una solicitud (escritura atómica)"""
+        ruta = self.ruta_solicitud(solicitud['id'])
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as archivo:
+            json.dump(solicitud, archivo, ensure_ascii=False, default=str)
+        os.replace(ruta + '.tmp', ruta)
+
+    def leer(self, id_solicitud):
+        """Leer una solicitud; None si no existe"""
+        try:
+            with open(self.ruta_solicitud(id_solicitud), encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def vencida(self, solicitud, ahora):
+        """Si la solicitud terminó hace más que el periodo de retención"""
+        return (solicitud['estado'] in ('COMPLETADA', 'ERROR')
+                and ahora - solicitud.get('terminado_en', solicitud['recibido_en']) > self.retencion)
+
+    def eliminar(self, solicitud):
+        """Borrar la carpeta de una solicitud y sus llaves de idempotencia"""
+        shutil.rmtree(os.path.join(self.directorio, solicitud['id']), ignore_errors=True)
+        with self.candado:
+            for llave in solicitud.get('llaves', []):
+                if self.llaves.get(llave) == solicitud['id']:
+                    del self.llaves[llave]
+
+    def depurar(self):
+        """Eliminar las solicitudes terminadas que ya pasaron el periodo de retención"""
+        ahora = time.time()
+        self.ultima_depuracion = ahora
+        eliminadas = 0
+        for id_solicitud in os.listdir(self.directorio):
+            solicitud = self.leer(id_solicitud)
+            if solicitud and self.vencida(solicitud, ahora):
+                self.eliminar(solicitud)
+                eliminadas += 1
+        return eliminadas
+
+    # -------------------------------------------------------------------------
+    # Recepción
+    # -------------------------------------------------------------------------
+
+    def recibo(self, solicitud, repetida=False):
+        """Recibo que se entrega al solicitante"""
+        return {
+            'id': solicitud['id'],
+            'recibido_en': datetime.fromtimestamp(solicitud['recibido_en']).strftime('%Y-%m-%d %H:%M:%S'),
+            'posicion': self.cola.qsize() + self.en_proceso,
+            'datos': solicitud['datos'],
+            'documentos': len(solicitud['documentos']),
+            'repetida': repetida
+        }
+
+    def buscar(self, llaves):
+        """Recibo de una solicitud previa con alguna de las llaves (None si no hay o terminó en error)"""
+        for llave in llaves:
+            id_solicitud = self.llaves.get(llave)
+            solicitud = self.leer(id_solicitud) if id_solicitud else None
+            if solicitud and solicitud['estado'] != 'ERROR':
+                return self.recibo(solicitud, repetida=True)
+        return None
+
+    def recibir(self, datos, documentos, llaves=()):
+        """Guardar una solicitud y encolarla; devuelve el recibo
+
+        documentos: lista de (tipo, nombre_original, contenido_bytes).
+        llaves: llaves de idempotencia; si alguna ya corresponde a una
+        solicitud, se devuelve el recibo original (con 'repetida': True).
+        """
+        with self.candado:
+            previa = self.buscar(llaves)
+            if previa:
+                return previa
+
+            id_solicitud = f"REC-{datetime.now().strftime('%Y%m%d')}-{uuid.uuid4().hex[:8].upper()}"
+            carpeta = os.path.join(self.directorio, id_solicitud)
+            os.makedirs(carpeta)
+
+            archivos = []
+            for tipo, nombre_original, contenido in documentos:
+                extension = nombre_original.split('.')[-1].lower() if '.' in nombre_original else 'pdf'
+                ruta_local = os.path.join(carpeta, f"{tipo}.{extension}")
+                with open(ruta_local, 'wb') as archivo:
+                    archivo.write(contenido)
+                archivos.append({'tipo': tipo, 'nombre_original': nombre_original, 'ruta_local': ruta_local})
+
+            solicitud = {
+                'id': id_solicitud,
+                'estado': 'PENDIENTE',
+                'recibido_en': time.time(),
+                'intentos': 0,
+                'datos': datos,
+                'documentos': archivos,
+                'llaves': list(llaves),
+                'resultado': None,
+                'error': None
+            }
+            self.guardar(solicitud)
+            for llave in llaves:
+                self.llaves[llave] = id_solicitud
+
+        self.cola.put(id_solicitud)
+        return self.recibo(solicitud)
+
+    # -------------------------------------------------------------------------
+    # Procesamiento
+    # -------------------------------------------------------------------------
+
+    def iniciar(self):
+        """Volver a encolar las solicitudes sin terminar y arrancar los hilos"""
+        if self.hilos:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+
+        pendientes = []
+        ahora = time.time()
+        self.ultima_depuracion = ahora
+        for id_solicitud in os.listdir(self.directorio):
+            solicitud = self.leer(id_solicitud)
+            if not solicitud:
+                continue
+            if self.vencida(solicitud, ahora):
+                self.eliminar(solicitud)
+                continue
+            for llave in solicitud.get('llaves', []):
+                self.llaves[llave] = id_solicitud
+            if solicitud['estado'] in ('PENDIENTE', 'EN_PROCESO'):
+                pendientes.append((solicitud['recibido_en'], id_solicitud))
+        for _, id_solicitud in sorted(pendientes):
+            self.cola.put(id_solicitud)
+
+        for numero in range(self.trabajadores):
+            hilo = threading.Thread(target=self.trabajar, name=f"cola-solicitudes-{numero}", daemon=True)
+            hilo.start()
+            self.hilos.append(hilo)
+
+    def trabajar(self):
+        """Ciclo de un hilo del grupo: tomar solicitudes y procesarlas"""
+        while True:
+            id_solicitud = self.cola.get()
+            try:
+                self.atender(id_solicitud)
+                if time.time() - self.ultima_depuracion > min(self.retencion, 3600):
+                    self.depurar()
+            except Exception:
+                # Un error al leer o guardar el estado no debe terminar el hilo:
+                # la solicitud se vuelve a encolar y se retoma desde su último estado
+                self.reencolar(id_solicitud, self.espera_reintento)
+
+    def reencolar(self, id_solicitud, espera):
+        """Volver a encolar una solicitud después de una espera"""
+        temporizador = threading.Timer(espera, self.cola.put, [id_solicitud])
+        temporizador.daemon = True
+        temporizador.start()
+
+    def atender(self, id_solicitud):
+        """Procesar una solicitud y guardar su estado"""
+        solicitud = self.leer(id_solicitud)
+        if not solicitud or solicitud['estado'] in ('COMPLETADA', 'ERROR'):
+            return
+
+        with self.candado:
+            self.en_proceso += 1
+        try:
+            solicitud['estado'] = 'EN_PROCESO'
+            solicitud['intentos'] += 1
+            self.guardar(solicitud)
+
+            try:
+                solicitud['resultado'] = self.procesar(solicitud)
+                solicitud['estado'] = 'COMPLETADA'
+                solicitud['error'] = None
+            except Exception as e:
+                solicitud['error'] = str(e)
+                solicitud['estado'] = 'ERROR' if solicitud['intentos'] >= self.max_intentos else 'PENDIENTE'
+        finally:
+            with self.candado:
+                self.en_proceso -= 1
+
+        solicitud['terminado_en'] = time.time()
+        self.guardar(solicitud)
+
+        if solicitud['estado'] == 'PENDIENTE':
+            self.reencolar(id_solicitud, self.espera_reintento * solicitud['intentos'])
+            return
+
+        with self.candado:
+            self.latencias.append(solicitud['terminado_en'] - solicitud['recibido_en'])
+            if solicitud['estado'] == 'COMPLETADA':
+                self.completadas += 1
+            else:
+                self.errores += 1
+
+        # Los documentos ya están en el servidor; solo se conserva el registro
+        if solicitud['estado'] == 'COMPLETADA':
+            for documento in solicitud['documentos']:
+                try:
+                    os.remove(documento['ruta_local'])
+                except FileNotFoundError:
+                    pass
+
+    # -------------------------------------------------------------------------
+    # Consultas
+    # -------------------------------------------------------------------------
+
+    def estadisticas(self):
+        """Profundidad de la cola y latencia de procesamiento (promedio y p95, en segundos)"""
+        with self.candado:
+            latencias = sorted(self.latencias)
+            en_proceso = self.en_proceso
+            completadas = self.completadas
+            errores = self.errores
+        return {
+            'en_cola': self.cola.qsize(),
+            'en_proceso': en_proceso,
+            'completadas': completadas,
+            'errores': errores,
+            'trabajadores': self.trabajadores,
+            'latencia_promedio': sum(latencias) / len(latencias) if latencias else None,
+            'latencia_p95': latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] if latencias else None
+        }
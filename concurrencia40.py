@@ -0,0 +1,246 @@
+"""Escritura optimista de datasets remotos (fusión a tres vías por clave)
+
+Al leer un CSV remoto se registra su versión (hash del contenido) y una
+copia del DataFrame leído (la base). Al guardar, si la versión remota ya no
+es la base, otro proceso escribió mientras tanto: se vuelve a leer el
+remoto y se fusionan por clave los cambios de ambos lados (celda por
+celda); los datasets de solo anexado (bitácora) agregan al remoto sus
+renglones nuevos. Solo la verificación y el reemplazo final se hacen bajo
+un candado breve; si la versión cambió entre la fusión y el candado se
+reintenta.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+from secuencias40 import CandadoOcupado, soltar_candado, tomar_candado
+
+# Datasets de solo anexado: se fusionan agregando los renglones nuevos al remoto
+ANEXADO = '*anexado*'
+
+# Columna clave de los datasets que se fusionan por registro (o ANEXADO)
+CLAVES_DATASETS = {
+    'inscritos': 'matricula',
+    'estudiantes': 'matricula',
+    'egresados': 'matricula',
+    'contratados': 'matricula',
+    'usuarios': 'usuario',
+    'bitacora': ANEXADO
+}
+
+
+class ConflictoEscritura(Exception):
+    """El dataset remoto siguió cambiando durante todos los reintentos"""
+
+
+def version_contenido(contenido):
+    """Versión de un archivo remoto: hash MD5 de su contenido (None si no existe)"""
+    if contenido is None:
+        return None
+    return hashlib.md5(contenido).hexdigest()
+
+
+def leer_csv_bytes(contenido, tipos=None):
+    """Convertir el contenido de un CSV a DataFrame (UTF-8 con respaldo latin-1)"""
+    try:
+        return pd.read_csv(BytesIO(contenido), encoding='utf-8', dtype=tipos)
+    except UnicodeDecodeError:
+        return pd.read_csv(BytesIO(contenido), encoding='latin-1', dtype=tipos)
+
+
+def como_texto(df):
+    """Representación de texto para comparar celdas (vacío en lugar de NaN)"""
+    return df.astype(object).where(df.notna(), '').astype(str)
+
+
+def fusionar_tres_vias(base, local, remoto, clave):
+    """Fusionar los cambios locales (base → local) sobre la versión remota actual
+
+    - Celdas que cambiaron localmente: gana el valor local; el resto conserva el remoto.
+    - Registros agregados en cualquiera de los lados se conservan.
+    - Registros borrados localmente se quitan; los borrados en el remoto se
+      quedan borrados salvo que se hayan modificado localmente.
+    Devuelve (DataFrame_fusionado, celdas_en_conflicto).
+    """
+    if clave not in local.columns or clave not in remoto.columns:
+        return local, 0
+
+    def indexar(df):
+        if clave not in df.columns:
+            return pd.DataFrame(columns=[c for c in local.columns if c != clave]).rename_axis(clave)
+        df = df.dropna(subset=[clave])
+        df = df.assign(**{clave: df[clave].astype(str)}).drop_duplicates(subset=[clave], keep='last')
+        return df.set_index(clave)
+
+    L, R, B = indexar(local), indexar(remoto), indexar(base)
+    columnas = list(R.columns) + [c for c in L.columns if c not in R.columns]
+    L, R, B = L.reindex(columns=columnas), R.reindex(columns=columnas), B.reindex(columns=columnas)
+
+    # Celdas modificadas localmente (los registros nuevos cuentan como modificados por completo)
+    comunes = L.index.intersection(B.index)
+    cambio_local = pd.DataFrame(True, index=L.index, columns=columnas)
+    cambio_local.loc[comunes] = como_texto(L.loc[comunes]).values != como_texto(B.loc[comunes]).values
+
+    borradas_local = B.index.difference(L.index)
+    claves_remotas = R.index.difference(borradas_local)
+    solo_local = L.index.difference(R.index)
+    solo_local = solo_local[~solo_local.isin(B.index) | cambio_local.loc[solo_local].any(axis=1).values]
+
+    ambos = claves_remotas.intersection(L.index)
+    mascara = cambio_local.loc[ambos]
+    fusionado = R.loc[claves_remotas].astype(object)
+    fusionado.loc[ambos] = R.loc[ambos].astype(object).mask(mascara, L.loc[ambos].astype(object))
+
+    # Conflictos: la misma celda cambió en ambos lados con valores distintos
+    en_base = ambos.intersection(B.index)
+    texto_r, texto_l = como_texto(R.loc[en_base]), como_texto(L.loc[en_base])
+    conflictos = (mascara.loc[en_base].values & (texto_r.values != como_texto(B.loc[en_base]).values)
+                  & (texto_r.values != texto_l.values)).sum()
+
+    fusionado = pd.concat([fusionado, L.loc[solo_local].astype(object)]).rename_axis(clave).reset_index()
+    orden = list(local.columns) + [c for c in fusionado.columns if c not in local.columns]
+    return fusionado[orden], int(conflictos)
+
+
+def llaves_renglones(df, columnas):
+    """Texto de cada renglón más su número de repetición (para restar renglones como multiconjunto)"""
+    texto = como_texto(df.reindex(columns=columnas))
+    renglon = texto[columnas[0]]
+    for columna in columnas[1:]:
+        renglon = renglon + '\x1f' + texto[columna]
+    return renglon + '\x1e' + renglon.groupby(renglon).cumcount().astype(str)
+
+
+def fusionar_anexados(base, local, remoto):
+    """Fusionar un dataset de solo anexado: el remoto más los renglones que agregó local
+
+    Son nuevos los renglones locales que no estaban en la base (si se
+    conoce) y que todavía no están en el remoto.
+    """
+    columnas = list(remoto.columns) + [c for c in local.columns if c not in remoto.columns]
+    if not columnas:
+        return local
+    llaves = llaves_renglones(local, columnas)
+    nuevos = ~llaves.isin(llaves_renglones(remoto, columnas))
+    if base is not None:
+        nuevos &= ~llaves.isin(llaves_renglones(base, columnas))
+    return pd.concat([remoto, local[nuevos.values]], ignore_index=True)
+
+
+class GuardadoOptimista:
+    def __init__(self, crear_cargador, max_bases=64, reintentos=3, espera_maxima=15):
+        """
+        crear_cargador: función que devuelve un cargador con conectar(),
+        desconectar() y atributo sftp (por ejemplo, la clase CargadorRemoto).
+        """
+        self.crear_cargador = crear_cargador
+        self.max_bases = max_bases
+        self.reintentos = reintentos
+        self.espera_maxima = espera_maxima
+        self.bases = OrderedDict()  # versión -> copia del DataFrame leído
+
+    def registrar_lectura(self, ruta, contenido, df):
+        """Registrar el DataFrame leído de `ruta` como base; marca df.attrs['version_remota']"""
+        version = version_contenido(contenido)
+        df.attrs['version_remota'] = version
+        if version is not None:
+            self.bases[version] = df.copy()
+            self.bases.move_to_end(version)
+            while len(self.bases) > self.max_bases:
+                self.bases.popitem(last=False)
+        return df
+
+    def base_de(self, ruta, df):
+        """Base con la que comparar df: la de la versión marcada en df (None si no se conoce)
+
+        No se usa la de otra lectura de la ruta: podría incluir registros que
+        df nunca vio y que la fusión tomaría como borrados.
+        """
+        version = df.attrs.get('version_remota')
+        return version, self.bases.get(version)
+
+    def leer_remoto(self, sftp, ruta):
+        """Contenido actual del archivo remoto (None si no existe)"""
+        try:
+            with sftp.file(ruta, 'r') as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            return None
+
+    def preparar(self, sftp, ruta, df, clave, tipos=None):
+        """Fusionar df con la versión remota actual; devuelve (df_final, versión_remota, conflictos)"""
+        contenido = self.leer_remoto(sftp, ruta)
+        version_remota = version_contenido(contenido)
+        version_base, base = self.base_de(ruta, df)
+
+        if contenido is None or version_remota == version_base or not clave:
+            return df, version_remota, 0
+
+        remoto = leer_csv_bytes(contenido, tipos)
+        if clave == ANEXADO:
+            return fusionar_anexados(base, df, remoto), version_remota, 0
+        if base is None:
+            # Sin base no se sabe qué borró df: se fusiona como si todo fuera nuevo (no se borra nada)
+            base = df.iloc[0:0]
+        fusionado, conflictos = fusionar_tres_vias(base, df, remoto, clave)
+        return fusionado, version_remota, conflictos
+
+    def escribir(self, sftp, ruta, df):
+        """Escribir mediante archivo temporal y reemplazo; devuelve el contenido escrito"""
+        buffer = StringIO()
+        df.to_csv(buffer, index=False, encoding='utf-8')
+        contenido = buffer.getvalue().encode('utf-8')
+        sftp.escribir(ruta, contenido)
+        return contenido
+
+    def fusionar(self, ruta, df, clave, tipos=None):
+        """Solo fusionar df con el remoto actual (sin escribir); devuelve (df_final, conflictos)"""
+        cargador = self.crear_cargador()
+        if not cargador.conectar():
+            raise ConnectionError("No se pudo conectar al servidor remoto")
+        try:
+            fusionado, _, conflictos = self.preparar(cargador.sftp, ruta, df, clave, tipos)
+            return fusionado, conflictos
+        finally:
+            cargador.desconectar()
+
+    def guardar(self, ruta, df, clave, tipos=None):
+        """Guardar df en `ruta` fusionando los cambios concurrentes
+
+        Devuelve (df_guardado, conflictos). Lanza ConflictoEscritura si el
+        remoto cambió en cada uno de los reintentos.
+        """
+        cargador = self.crear_cargador()
+        if not cargador.conectar():
+            raise ConnectionError("No se pudo conectar al servidor remoto")
+
+        try:
+            sftp = cargador.sftp
+            ruta_candado = ruta + '.lock'
+            for _ in range(self.reintentos):
+                fusionado, version_leida, conflictos = self.preparar(sftp, ruta, df, clave, tipos)
+
+                try:
+                    latido = tomar_candado(sftp, ruta_candado, self.espera_maxima)
+                except CandadoOcupado:
+                    continue
+                try:
+                    # Verificar que nadie escribió entre la fusión y el candado
+                    if version_contenido(self.leer_remoto(sftp, ruta)) != version_leida:
+                        continue
+                    latido.comprobar()
+                    contenido = self.escribir(sftp, ruta, fusionado)
+                finally:
+                    soltar_candado(sftp, ruta_candado, latido)
+
+                fusionado = fusionado.copy()
+                self.registrar_lectura(ruta, contenido, fusionado)
+                return fusionado, conflictos
+
+            raise ConflictoEscritura(f"{os.path.basename(ruta)} cambió durante {self.reintentos} intentos de guardado")
+        finally:
+            cargador.desconectar()
@@ -0,0 +1,445 @@
+"""Registro normalizado de documentos (un renglón por documento)
+
+Reemplaza los campos empaquetados de los datasets por rol
+(documentos_subidos "tipo:archivo;tipo:archivo" y documentos_guardados
+"a.pdf, b.pdf"): cada documento subido es un renglón con
+
+    matricula, tipo, archivo, tamano, hash, subido_en
+
+Registrar un documento solo anexa su renglón (no reescribe inscritos,
+estudiantes, etc.). Las consultas por persona y por tipo usan un
+DataFrame indexado por matrícula que se lee una vez y se comparte.
+
+Con el motor SQLite (datasets_db) el registro es la tabla documentos,
+con índices por matrícula y tipo; sin él, datos/documentos.csv.
+
+La completitud por rol cruza los documentos requeridos del rol con todo
+el registro en una sola pasada (matriz persona × documento requerido) y
+se mantiene en caché; cada documento agregado marca su celda.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+COLUMNAS_DOCUMENTOS = ['matricula', 'tipo', 'archivo', 'tamano', 'hash', 'subido_en']
+
+DOCUMENTOS_REQUERIDOS = {
+    'inscrito': [
+        "CURP",
+        "Acta de Nacimiento",
+        "Comprobante de Estudios",
+        "Fotografías Tamaño Infantil",
+        "Comprobante de Domicilio"
+    ],
+    'estudiante': [
+        "Certificado de Estudios",
+        "Historial Académico",
+        "Comprobante de Pagos",
+        "Constancia de Servicio Social"
+    ],
+    'egresado': [
+        "Título Profesional",
+        "Cédula Profesional",
+        "Certificado de Estudios Completos",
+        "Constancia de Egreso"
+    ],
+    'contratado': [
+        "Contrato Laboral",
+        "CURP",
+        "Comprobante de Estudios",
+        "Identificación Oficial",
+        "Comprobante de Domicilio"
+    ]
+}
+
+# Tipos con los que se suben los documentos de pre-inscripción -> tipo requerido equivalente
+ALIAS_TIPOS = {
+    'ACTA': 'ACTA_DE_NACIMIENTO',
+    'ACTA_NACIMIENTO': 'ACTA_DE_NACIMIENTO',
+    'CERTIFICADO_ESTUDIOS': 'COMPROBANTE_DE_ESTUDIOS',
+    'FOTOGRAFIA': 'FOTOGRAFIAS_TAMANO_INFANTIL'
+}
+
+
+def registro_documento(matricula, tipo, archivo, contenido=None, subido_en=None):
+    """Renglón del registro para un archivo subido (tamaño y hash si se da el contenido)"""
+    return {
+        'matricula': str(matricula),
+        'tipo': str(tipo),
+        'archivo': os.path.basename(str(archivo)),
+        'tamano': len(contenido) if contenido is not None else None,
+        'hash': hashlib.sha256(contenido).hexdigest() if contenido is not None else None,
+        'subido_en': (subido_en or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def documentos_desde_dataframe(df):
+    """Renglones del registro a partir de los campos empaquetados de un dataset por rol
+
+    documentos_subidos: "tipo:archivo;tipo:archivo" (los valores sin
+    "tipo:" son conteos antiguos y se ignoran).
+    documentos_guardados: "archivo, archivo" (el tipo sale del nombre
+    estandarizado {matricula}_{nombre}_{timestamp}_{TIPO}.ext).
+    """
+    if df is None or df.empty or 'matricula' not in df.columns:
+        return pd.DataFrame(columns=COLUMNAS_DOCUMENTOS)
+
+    partes = []
+    if 'documentos_subidos' in df.columns:
+        subidos = df[['matricula', 'documentos_subidos']].dropna()
+        subidos = subidos.assign(documento=subidos['documentos_subidos'].astype(str).str.split(';')).explode('documento')
+        subidos = subidos[subidos['documento'].str.contains(':', regex=False, na=False)]
+        pares = subidos['documento'].str.split(':', n=1, expand=True)
+        if not subidos.empty:
+            partes.append(pd.DataFrame({
+                'matricula': subidos['matricula'].astype(str),
+                'tipo': pares[0].str.strip(),
+                'archivo': pares[1].str.strip()
+            }))
+    if 'documentos_guardados' in df.columns:
+        guardados = df[['matricula', 'documentos_guardados']].dropna()
+        guardados = guardados.assign(archivo=guardados['documentos_guardados'].astype(str).str.split(',')).explode('archivo')
+        guardados = guardados.assign(archivo=guardados['archivo'].str.strip())
+        guardados = guardados[(guardados['archivo'] != '') & (guardados['archivo'] != 'Ninguno')]
+        if not guardados.empty:
+            partes.append(pd.DataFrame({
+                'matricula': guardados['matricula'].astype(str),
+                'tipo': guardados['archivo'].str.rsplit('.', n=1).str[0].str.rsplit('_', n=1).str[-1],
+                'archivo': guardados['archivo']
+            }))
+    if not partes:
+        return pd.DataFrame(columns=COLUMNAS_DOCUMENTOS)
+    documentos = pd.concat(partes, ignore_index=True).drop_duplicates(subset=['archivo'], keep='first')
+    return documentos.reindex(columns=COLUMNAS_DOCUMENTOS).reset_index(drop=True)
+
+
+# =============================================================================
+# COMPLETITUD DE DOCUMENTOS POR ROL
+# =============================================================================
+
+def clave_tipo(tipo):
+    """Clave comparable de un tipo de documento ("Acta de Nacimiento" -> ACTA_DE_NACIMIENTO)"""
+    return claves_tipo(pd.Series([tipo])).iloc[0]
+
+def claves_tipo(tipos):
+    """clave_tipo para una Series completa"""
+    claves = (tipos.fillna('').astype(str).str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+              .str.upper().str.replace(r'[^A-Z0-9]+', '_', regex=True).str.strip('_'))
+    return claves.replace(ALIAS_TIPOS)
+
+def matriz_completitud(matriculas, documentos, requeridos):
+    """Matriz booleana persona × documento requerido (True si ya lo subió)
+
+    matriculas: personas del rol; documentos: registro con columnas matricula y tipo.
+    """
+    personas = pd.Index(pd.Series(matriculas, dtype=str).dropna().unique(), name='matricula')
+    claves = [clave_tipo(tipo) for tipo in requeridos]
+    cruce = pd.DataFrame({'matricula': documentos['matricula'].astype(str).values, 'clave': claves_tipo(documentos['tipo']).values})
+    cruce = cruce[cruce['clave'].isin(claves) & cruce['matricula'].isin(personas)]
+    presentes = pd.crosstab(cruce['matricula'], cruce['clave']).gt(0)
+    matriz = presentes.reindex(index=personas, columns=claves, fill_value=False).astype(bool)
+    matriz.columns = list(requeridos)
+    return matriz
+
+def resumen_completitud(matriz):
+    """Agregados de una matriz de completitud
+
+    Devuelve {'personas': DataFrame por matrícula (entregados, faltantes,
+    porcentaje, completo), 'por_documento': DataFrame por tipo (entregados,
+    faltantes), 'total', 'completos', 'promedio'}.
+    """
+    requeridos = matriz.shape[1]
+    entregados = matriz.sum(axis=1)
+    personas = pd.DataFrame({
+        'entregados': entregados,
+        'faltantes': requeridos - entregados,
+        'porcentaje': (100 * entregados / requeridos).round(1) if requeridos else 100.0,
+        'completo': entregados == requeridos
+    })
+    por_documento = pd.DataFrame({'entregados': matriz.sum(axis=0), 'faltantes': (~matriz).sum(axis=0)})
+    return {
+        'personas': personas,
+        'por_documento': por_documento,
+        'total': int(len(matriz)),
+        'completos': int(personas['completo'].sum()),
+        'promedio': float(personas['porcentaje'].mean()) if len(matriz) else 0.0
+    }
+
+
+class RegistroDocumentos:
+    def __init__(self, crear_cargador, ruta, motor=None, vigencia=60):
+        """
+        crear_cargador: función que devuelve un cargador con conectar(),
+        desconectar() y atributo sftp (por ejemplo, la clase CargadorRemoto).
+        ruta: datos/documentos.csv en el servidor (sin motor).
+        motor: MotorDatasets opcional; si se da, el registro es su tabla documentos.
+        vigencia: segundos que se reutiliza la última lectura.
+        """
+        self.crear_cargador = crear_cargador
+        self.ruta = ruta
+        self.motor = motor
+        self.vigencia = vigencia
+        self.candado = threading.Lock()
+        self.documentos = None
+        self.leido_en = 0
+        self.version = 0  # cambia cada vez que se vuelve a leer el registro
+        self.completitudes = {}  # rol -> (versión, firma de las personas, matriz)
+        self.consultas = OrderedDict()  # filtros -> (registro consultado, resultado ordenado)
+        self.inicializado = False
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+
+    def leer(self):
+        """Registro completo desde el servidor o el motor (None si aún no existe)"""
+        if self.motor is not None:
+            if not self.motor.existe('documentos'):
+                return None
+            return self.motor.leer('documentos', {'matricula': str})
+        cargador = self.crear_cargador()
+        if not cargador.conectar():
+            return None
+        try:
+            contenido = cargador.sftp.leer(self.ruta)
+        finally:
+            cargador.desconectar()
+        if contenido is None:
+            return None
+        return pd.read_csv(BytesIO(contenido), dtype={'matricula': str, 'tipo': str, 'archivo': str, 'tamano': 'Int64', 'hash': str})
+
+    def cargar(self, forzar=False):
+        """Registro indexado por matrícula (compartido; se relee al caducar)"""
+        with self.candado:
+            if not forzar and self.documentos is not None and time.time() - self.leido_en < self.vigencia:
+                return self.documentos
+        documentos = self.leer()
+        if documentos is None:
+            documentos = pd.DataFrame(columns=COLUMNAS_DOCUMENTOS)
+        documentos = documentos.reindex(columns=COLUMNAS_DOCUMENTOS).drop_duplicates(subset=['archivo'], keep='last')
+        documentos = documentos.set_index('matricula', drop=False).sort_index()
+        with self.candado:
+            self.documentos, self.leido_en = documentos, time.time()
+            self.version += 1
+        return documentos
+
+    def de_persona(self, matricula):
+        """Documentos de una matrícula"""
+        documentos = self.cargar()
+        # Índice ordenado: búsqueda binaria
+        return documentos.loc[str(matricula):str(matricula)]
+
+    def de_personas(self, matriculas):
+        """Documentos de un conjunto de matrículas"""
+        documentos = self.cargar()
+        return documentos[documentos.index.isin([str(m) for m in matriculas])]
+
+    def conteo_por_persona(self, matriculas=None):
+        """Documentos por matrícula (Series)"""
+        documentos = self.cargar() if matriculas is None else self.de_personas(matriculas)
+        return documentos.groupby(level=0).size()
+
+    def conteo_por_tipo(self, matriculas=None):
+        """Documentos por tipo (Series)"""
+        documentos = self.cargar() if matriculas is None else self.de_personas(matriculas)
+        return documentos['tipo'].value_counts()
+
+    def consultar(self, matriculas=None, busqueda='', tipos=None, coincidencias=None, orden='subido_en', descendente=True):
+        """Documentos filtrados y ordenados (las últimas consultas quedan en caché)
+
+        matriculas: limitar a estas personas; busqueda: texto en matrícula,
+        tipo o archivo; coincidencias: matrículas que cuentan como encontradas
+        por la búsqueda (por ejemplo, por nombre); tipos: lista de tipos.
+        """
+        documentos = self.cargar()
+        firma = lambda valores: None if valores is None else int(pd.util.hash_pandas_object(pd.Series(list(valores), dtype=str), index=False).sum())
+        clave = (firma(matriculas), busqueda.strip().lower(), tuple(sorted(tipos or [])), firma(coincidencias), orden, descendente)
+        with self.candado:
+            guardada = self.consultas.get(clave)
+            if guardada is not None and guardada[0] is documentos:
+                self.consultas.move_to_end(clave)
+                return guardada[1]
+
+        filtro = pd.Series(True, index=range(len(documentos)))
+        if matriculas is not None:
+            filtro &= documentos.index.isin([str(m) for m in matriculas])
+        if tipos:
+            filtro &= documentos['tipo'].isin(tipos).values
+        if clave[1]:
+            texto = (documentos['matricula'].astype(str) + ' ' + documentos['tipo'].astype(str) + ' ' + documentos['archivo'].astype(str)).str.lower()
+            encontrados = texto.str.contains(clave[1], regex=False).values
+            if coincidencias is not None:
+                encontrados = encontrados | documentos.index.isin([str(m) for m in coincidencias])
+            filtro &= encontrados
+        resultado = documentos[filtro.values]
+        if orden in resultado.columns:
+            valores = resultado[orden].reset_index(drop=True)
+            if orden == 'tamano':
+                valores = pd.to_numeric(valores, errors='coerce')
+            resultado = resultado.iloc[valores.sort_values(ascending=not descendente, kind='stable', na_position='last').index]
+
+        with self.candado:
+            self.consultas[clave] = (documentos, resultado)
+            while len(self.consultas) > 8:
+                self.consultas.popitem(last=False)
+        return resultado
+
+    def pagina(self, numero=1, tamano=25, **filtros):
+        """Página `numero` (desde 1) de consultar(**filtros); devuelve (DataFrame, total)"""
+        resultado = self.consultar(**filtros)
+        inicio = (max(numero, 1) - 1) * tamano
+        return resultado.iloc[inicio:inicio + tamano], len(resultado)
+
+    # -------------------------------------------------------------------------
+    # Escritura
+    # -------------------------------------------------------------------------
+
+    def agregar(self, registros):
+        """Anexar renglones al registro (lista de dicts de registro_documento); True si se guardó"""
+        if not registros:
+            return True
+        if self.motor is not None:
+            with self.motor.transaccion():
+                for registro in registros:
+                    self.motor.insertar('documentos', registro, reemplazar=True)
+        else:
+            cargador = self.crear_cargador()
+            if not cargador.conectar():
+                return False
+            try:
+                sftp = cargador.sftp
+                sftp.crear_directorios(os.path.dirname(self.ruta))
+                with sftp.candado(self.ruta + '.lock'):
+                    nuevo = sftp.info(self.ruta) is None
+                    buffer = StringIO()
+                    pd.DataFrame(registros).reindex(columns=COLUMNAS_DOCUMENTOS).to_csv(buffer, index=False, header=nuevo)
+                    sftp.anexar(self.ruta, buffer.getvalue().encode('utf-8'))
+            finally:
+                cargador.desconectar()
+
+        nuevos = pd.DataFrame(registros).reindex(columns=COLUMNAS_DOCUMENTOS)
+        with self.candado:
+            if self.documentos is not None:
+                self.documentos = pd.concat([
+                    self.documentos[~self.documentos['archivo'].isin(nuevos['archivo'])],
+                    nuevos.set_index('matricula', drop=False)
+                ]).sort_index()
+            # Marcar los documentos nuevos en las matrices de completitud en caché
+            claves = claves_tipo(nuevos['tipo'])
+            for _, _, matriz in self.completitudes.values():
+                columnas = {clave_tipo(columna): columna for columna in matriz.columns}
+                for matricula, clave in zip(nuevos['matricula'].astype(str), claves):
+                    if clave in columnas and matricula in matriz.index:
+                        matriz.at[matricula, columnas[clave]] = True
+        return True
+
+    def renombrar(self, renombres):
+        """Aplicar renombrados de archivos (pares de rutas o nombres); devuelve los renglones cambiados
+
+        La matrícula del renglón se actualiza con el prefijo del nombre nuevo
+        (los renombrados de migración solo cambian la matrícula del nombre).
+        """
+        mapa = {os.path.basename(viejo): os.path.basename(nuevo) for viejo, nuevo in renombres}
+        if not mapa:
+            return 0
+
+        def aplicar(documentos):
+            cambiar = documentos['archivo'].isin(mapa)
+            if not cambiar.any():
+                return documentos, 0
+            documentos = documentos.copy()
+            # El nombre nuevo solo cambia la matrícula del prefijo: el resto del nombre se conserva
+            documentos.loc[cambiar, 'matricula'] = [
+                mapa[viejo][:len(mapa[viejo]) - (len(viejo) - len(matricula))] if viejo.startswith(matricula) else matricula
+                for viejo, matricula in zip(documentos.loc[cambiar, 'archivo'], documentos.loc[cambiar, 'matricula'].astype(str))
+            ]
+            documentos.loc[cambiar, 'archivo'] = documentos.loc[cambiar, 'archivo'].map(mapa)
+            return documentos, int(cambiar.sum())
+
+        if self.motor is not None:
+            documentos = self.motor.leer('documentos', {'matricula': str}) if self.motor.existe('documentos') else None
+            if documentos is None:
+                return 0
+            documentos, cambiados = aplicar(documentos)
+            if cambiados:
+                self.motor.guardar('documentos', documentos)
+        else:
+            cargador = self.crear_cargador()
+            if not cargador.conectar():
+                return 0
+            try:
+                sftp = cargador.sftp
+                with sftp.candado(self.ruta + '.lock'):
+                    contenido = sftp.leer(self.ruta)
+                    if contenido is None:
+                        return 0
+                    documentos, cambiados = aplicar(pd.read_csv(BytesIO(contenido), dtype=str))
+                    if cambiados:
+                        sftp.escribir(self.ruta, documentos.to_csv(index=False).encode('utf-8'))
+            finally:
+                cargador.desconectar()
+
+        with self.candado:
+            self.documentos = None
+        return cambiados
+
+    def completitud(self, rol, matriculas):
+        """Matriz de completitud del rol para estas matrículas (en caché hasta releer el registro)"""
+        documentos = self.cargar()
+        matriculas = pd.Series(matriculas, dtype=str).dropna()
+        firma = int(pd.util.hash_pandas_object(matriculas, index=False).sum())
+        with self.candado:
+            guardada = self.completitudes.get(rol)
+            if guardada and guardada[0] == self.version and guardada[1] == firma:
+                return guardada[2]
+            version = self.version
+        matriz = matriz_completitud(matriculas, documentos, DOCUMENTOS_REQUERIDOS.get(rol, []))
+        with self.candado:
+            self.completitudes[rol] = (version, firma, matriz)
+        return matriz
+
+    def inicializar(self, datos):
+        """Crear el registro desde los campos empaquetados de los datasets si aún no existe
+
+        datos: {nombre: DataFrame} con inscritos, estudiantes, egresados y contratados.
+        Devuelve la cantidad de renglones importados (0 si el registro ya existía).
+        """
+        if self.inicializado:
+            return 0
+        if self.leer() is not None:
+            self.inicializado = True
+            return 0
+        documentos = pd.concat(
+            [documentos_desde_dataframe(datos.get(nombre)) for nombre in ['inscritos', 'estudiantes', 'egresados', 'contratados']],
+            ignore_index=True
+        ).drop_duplicates(subset=['archivo'], keep='last')
+        if self.motor is not None:
+            with self.motor.transaccion() as conexion:
+                self.motor.asegurar_tabla(conexion, 'documentos', COLUMNAS_DOCUMENTOS)
+        elif documentos.empty:
+            # Solo el encabezado: marca el registro como creado
+            cargador = self.crear_cargador()
+            if not cargador.conectar():
+                return 0
+            try:
+                cargador.sftp.crear_directorios(os.path.dirname(self.ruta))
+                cargador.sftp.escribir(self.ruta, (','.join(COLUMNAS_DOCUMENTOS) + '\n').encode('utf-8'))
+            finally:
+                cargador.desconectar()
+            self.inicializado = True
+            return 0
+        if not self.agregar(documentos.to_dict('records')):
+            return 0
+        self.inicializado = True
+        return len(documentos)
+
+
+def crear_registro_documentos(crear_cargador, base_dir_remoto, motor=None, **opciones):
+    """Registro de documentos en la ruta estándar del servidor"""
+    return RegistroDocumentos(crear_cargador, os.path.join(base_dir_remoto, "datos", "documentos.csv"), motor, **opciones)
@@ -0,0 +1,174 @@
+"""Detección de aspirantes duplicados
+
+Cada persona se resume en llaves normalizadas y con hash (correo, teléfono
+y nombre). Un índice {campo: {hash: [matrículas]}} permite revisar una
+solicitud nueva en tiempo constante. La pasada por lotes agrupa los
+registros existentes por esas llaves (bloqueo) y solo compara por
+similitud los nombres dentro de bloques pequeños (iniciales + fecha de
+nacimiento), por lo que no es cuadrática.
+"""
+
+import hashlib
+import itertools
+import time
+import unicodedata
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+CAMPOS_LLAVE = ['email', 'telefono', 'nombre']
+
+
+# =============================================================================
+# NORMALIZACIÓN Y LLAVES
+# =============================================================================
+
+def quitar_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+def normalizar_email(valor):
+    return str(valor).strip().lower() if pd.notna(valor) else ''
+
+def normalizar_telefono(valor):
+    """Solo dígitos; se comparan los últimos 10 (sin lada internacional)"""
+    digitos = ''.join(c for c in str(valor) if c.isdigit()) if pd.notna(valor) else ''
+    return digitos[-10:] if len(digitos) >= 7 else ''
+
+def normalizar_nombre(valor):
+    """Minúsculas sin acentos ni signos, con las palabras ordenadas"""
+    if pd.isna(valor):
+        return ''
+    texto = ''.join(c if c.isalpha() else ' ' for c in quitar_acentos(str(valor)).lower())
+    return ' '.join(sorted(texto.split()))
+
+def hash_llave(valor):
+    return hashlib.sha1(valor.encode('utf-8')).hexdigest() if valor else ''
+
+def llaves_persona(nombre_completo, email, telefono):
+    """Llaves con hash de una persona (las vacías se omiten)"""
+    normalizadas = {
+        'email': normalizar_email(email),
+        'telefono': normalizar_telefono(telefono),
+        'nombre': normalizar_nombre(nombre_completo)
+    }
+    return {campo: hash_llave(valor) for campo, valor in normalizadas.items() if valor}
+
+def llaves_dataframe(df):
+    """Llaves normalizadas y con hash de cada registro (columnas email, telefono, nombre)"""
+    def columna(nombre):
+        return df[nombre] if nombre in df.columns else pd.Series('', index=df.index)
+
+    normalizadas = pd.DataFrame({
+        'email': columna('email').map(normalizar_email),
+        'telefono': columna('telefono').map(normalizar_telefono),
+        'nombre': columna('nombre_completo').map(normalizar_nombre)
+    }, index=df.index)
+    llaves = normalizadas.apply(lambda serie: serie.map(hash_llave))
+    return normalizadas, llaves
+
+
+# =============================================================================
+# ÍNDICE PARA REVISAR SOLICITUDES NUEVAS
+# =============================================================================
+
+class IndiceDuplicados:
+    def __init__(self, vigencia=300):
+        self.vigencia = vigencia
+        self.construido_en = 0
+        self.llaves = {campo: {} for campo in CAMPOS_LLAVE}
+
+    def vigente(self):
+        return time.time() - self.construido_en < self.vigencia
+
+    def construir(self, df):
+        """Indexar los registros existentes (columna matricula y datos de contacto)"""
+        self.llaves = {campo: {} for campo in CAMPOS_LLAVE}
+        if not df.empty and 'matricula' in df.columns:
+            _, llaves = llaves_dataframe(df)
+            for campo in CAMPOS_LLAVE:
+                validas = llaves[campo] != ''
+                agrupadas = df.loc[validas, 'matricula'].astype(str).groupby(llaves.loc[validas, campo]).agg(list)
+                self.llaves[campo] = agrupadas.to_dict()
+        self.construido_en = time.time()
+
+    def agregar(self, matricula, nombre_completo, email, telefono):
+        """Agregar una persona recién registrada al índice"""
+        for campo, llave in llaves_persona(nombre_completo, email, telefono).items():
+            self.llaves[campo].setdefault(llave, []).append(matricula)
+
+    def buscar(self, nombre_completo, email, telefono):
+        """Registros existentes que comparten alguna llave: {matrícula: [campos coincidentes]}"""
+        coincidencias = {}
+        for campo, llave in llaves_persona(nombre_completo, email, telefono).items():
+            for matricula in self.llaves[campo].get(llave, []):
+                coincidencias.setdefault(matricula, []).append(campo)
+        return coincidencias
+
+
+# =============================================================================
+# PASADA POR LOTES SOBRE LOS DATOS EXISTENTES
+# =============================================================================
+
+def detectar_duplicados(df, umbral_similitud=0.9, max_bloque=50):
+    """Pares de registros que probablemente son la misma persona
+
+    Devuelve un DataFrame con matricula_a, matricula_b, motivo (email,
+    telefono, nombre o nombre_similar), similitud y grupo (personas unidas
+    por cualquiera de sus pares).
+    """
+    columnas = ['grupo', 'matricula_a', 'nombre_a', 'matricula_b', 'nombre_b', 'motivo', 'similitud']
+    if df.empty or 'matricula' not in df.columns:
+        return pd.DataFrame(columns=columnas)
+
+    df = df.drop_duplicates(subset=['matricula']).reset_index(drop=True)
+    matriculas = df['matricula'].astype(str)
+    normalizadas, llaves = llaves_dataframe(df)
+    pares = {}
+
+    # Bloqueo por llaves exactas: cada registro se empareja con el primero de su
+    # bloque (basta para formar el grupo y mantiene el costo lineal)
+    for campo in CAMPOS_LLAVE:
+        validas = llaves[campo] != ''
+        for indices in llaves[campo][validas].groupby(llaves[campo][validas]).groups.values():
+            primero, *resto = sorted(indices)
+            for otro in resto:
+                pares.setdefault((primero, otro), ([], 1.0))[0].append(campo)
+
+    # Bloqueo por iniciales del nombre y fecha de nacimiento para nombres parecidos
+    iniciales = normalizadas['nombre'].map(lambda nombre: ''.join(palabra[:2] for palabra in nombre.split()[:2]))
+    nacimiento = df['fecha_nacimiento'].astype(str) if 'fecha_nacimiento' in df.columns else pd.Series('', index=df.index)
+    bloques = (iniciales + '|' + nacimiento)[iniciales != '']
+    for indices in bloques.groupby(bloques).groups.values():
+        if len(indices) < 2 or len(indices) > max_bloque:
+            continue
+        for a, b in itertools.combinations(sorted(indices), 2):
+            if (a, b) in pares:
+                continue
+            similitud = SequenceMatcher(None, normalizadas.at[a, 'nombre'], normalizadas.at[b, 'nombre']).ratio()
+            if similitud >= umbral_similitud:
+                pares[(a, b)] = (['nombre_similar'], round(similitud, 3))
+
+    if not pares:
+        return pd.DataFrame(columns=columnas)
+
+    # Grupos: componentes conexas de los pares (unión-búsqueda)
+    padre = {}
+    def raiz(x):
+        while padre.get(x, x) != x:
+            padre[x] = padre.get(padre[x], padre[x])
+            x = padre[x]
+        return x
+    for a, b in pares:
+        padre[raiz(b)] = raiz(a)
+
+    nombres = df['nombre_completo'] if 'nombre_completo' in df.columns else pd.Series('', index=df.index)
+    filas = [{
+        'grupo': matriculas[raiz(a)],
+        'matricula_a': matriculas[a],
+        'nombre_a': nombres[a],
+        'matricula_b': matriculas[b],
+        'nombre_b': nombres[b],
+        'motivo': ', '.join(motivos),
+        'similitud': similitud
+    } for (a, b), (motivos, similitud) in pares.items()]
+    return pd.DataFrame(filas, columns=columnas).sort_values(['grupo', 'matricula_a', 'matricula_b']).reset_index(drop=True)
@@ -0,0 +1,210 @@
+"""Embudo de inscripción: inscritos → estudiantes → egresados → contratados
+
+Una persona conserva el número de su matrícula al migrar de rol (solo
+cambia el prefijo MAT-INS/MAT-EST/MAT-EGR/MAT-CON), así que ese número es
+la llave que une las cuatro tablas. Cada persona llega hasta la etapa más
+avanzada en la que aparece; las fechas, el programa y el canal
+(como_se_entero) se toman del primer valor disponible en cualquiera de
+sus renglones.
+
+Todo se calcula con operaciones por columnas (groupby, crosstab y
+cuantiles), sin recorrer personas.
+"""
+
+import pandas as pd
+
+ETAPAS = ['inscritos', 'estudiantes', 'egresados', 'contratados']
+
+NOMBRES_ETAPAS = {
+    'inscritos': 'Inscrito',
+    'estudiantes': 'Estudiante',
+    'egresados': 'Egresado',
+    'contratados': 'Contratado'
+}
+
+# Fecha en que la persona entra a cada etapa
+FECHAS_ETAPAS = {
+    'inscritos': 'fecha_registro',
+    'estudiantes': 'fecha_ingreso',
+    'egresados': 'fecha_graduacion',
+    'contratados': 'fecha_contratacion'
+}
+
+# Columnas de programa por orden de preferencia
+COLUMNAS_PROGRAMA = ['programa', 'programa_original', 'programa_interes']
+
+RANGOS_DIAS = [-1, 30, 90, 180, 365, float('inf')]
+NOMBRES_RANGOS = ['0-30 días', '31-90 días', '91-180 días', '181-365 días', 'Más de 1 año']
+
+
+def clave_persona(matriculas):
+    """Número de matrícula sin el prefijo de rol (MAT-INS00001 -> 00001)"""
+    return matriculas.astype(str).str.strip().str.replace(r'^MAT-(?:INS|EST|EGR|CON)', '', regex=True)
+
+def texto_o_nulo(serie):
+    serie = serie.astype('string').str.strip()
+    return serie.mask(serie == '')
+
+
+# =============================================================================
+# PERSONAS DEL EMBUDO
+# =============================================================================
+
+def personas_embudo(datos):
+    """Un renglón por persona: etapa alcanzada, fechas de entrada, programa, canal y cohorte
+
+    datos: {dataset: DataFrame} con las cuatro tablas de etapa.
+    """
+    columnas_fecha = list(FECHAS_ETAPAS.values())
+    partes = []
+    for numero, etapa in enumerate(ETAPAS):
+        df = datos.get(etapa)
+        if df is None or df.empty or 'matricula' not in df.columns:
+            continue
+        df = df[df['matricula'].notna()]
+        parte = pd.DataFrame({
+            'persona': clave_persona(df['matricula']).values,
+            'etapa': numero,
+            'matricula': df['matricula'].astype(str).values
+        })
+        for columna in columnas_fecha:
+            if columna in df.columns:
+                parte[columna] = pd.to_datetime(df[columna], errors='coerce', format='mixed').values
+        for columna in COLUMNAS_PROGRAMA + ['como_se_entero']:
+            if columna in df.columns:
+                parte[columna] = texto_o_nulo(df[columna]).values
+        partes.append(parte)
+
+    columnas = ['etapa', 'matricula', 'programa', 'canal', 'cohorte'] + columnas_fecha
+    if not partes:
+        vacio = pd.DataFrame(columns=columnas).rename_axis('persona').astype({'etapa': int})
+        return vacio.astype({columna: 'datetime64[ns]' for columna in columnas_fecha})
+
+    renglones = pd.concat(partes, ignore_index=True).reindex(
+        columns=['persona', 'etapa', 'matricula'] + columnas_fecha + COLUMNAS_PROGRAMA + ['como_se_entero']
+    )
+    renglones[columnas_fecha] = renglones[columnas_fecha].astype('datetime64[ns]')
+    # Renglón más avanzado primero: su matrícula es la vigente
+    renglones = renglones.sort_values('etapa', ascending=False, kind='stable')
+    agrupados = renglones.groupby('persona', sort=False)
+    personas = agrupados[['etapa', 'matricula']].first()
+    personas[columnas_fecha] = agrupados[columnas_fecha].first()
+    programas = agrupados[COLUMNAS_PROGRAMA].first()
+    programa = programas[COLUMNAS_PROGRAMA[0]]
+    for columna in COLUMNAS_PROGRAMA[1:]:
+        programa = programa.fillna(programas[columna])
+    personas['programa'] = programa.fillna('Sin programa')
+    personas['canal'] = agrupados['como_se_entero'].first().fillna('Sin dato')
+    # Cohorte: mes de la primera fecha conocida de la persona
+    inicio = personas[columnas_fecha].min(axis=1)
+    personas['cohorte'] = inicio.dt.strftime('%Y-%m').fillna('Sin fecha')
+    return personas[columnas]
+
+
+# =============================================================================
+# CONVERSIÓN
+# =============================================================================
+
+def alcanzaron(personas, por=None):
+    """Personas que llegaron a cada etapa (o más allá), por grupo si se da `por`"""
+    grupos = personas[por] if por else pd.Series('Total', index=personas.index)
+    conteo = pd.crosstab(grupos, personas['etapa']).reindex(columns=range(len(ETAPAS)), fill_value=0)
+    # Llegar a una etapa implica haber pasado por las anteriores
+    acumulado = conteo.iloc[:, ::-1].cumsum(axis=1).iloc[:, ::-1]
+    acumulado.columns = [NOMBRES_ETAPAS[etapa] for etapa in ETAPAS]
+    return acumulado
+
+def conversion_etapas(personas):
+    """Por etapa: personas que la alcanzaron, tasa desde la etapa anterior y desde el inicio (%)"""
+    total = alcanzaron(personas).sum(axis=0)
+    anterior = total.shift(1)
+    return pd.DataFrame({
+        'personas': total,
+        'tasa_etapa': (100 * total / anterior).round(1).where(anterior > 0),
+        'tasa_total': (100 * total / total.iloc[0]).round(1) if total.iloc[0] else float('nan')
+    }).rename_axis('etapa')
+
+def conversion_por(personas, por):
+    """Desglose por `por` (programa, canal o cohorte): alcanzados por etapa y tasas entre etapas (%)"""
+    acumulado = alcanzaron(personas, por)
+    resultado = acumulado.copy()
+    nombres = list(acumulado.columns)
+    for origen, destino in zip(nombres, nombres[1:]):
+        resultado[f'% {origen} → {destino}'] = (100 * acumulado[destino] / acumulado[origen].where(acumulado[origen] > 0)).round(1)
+    resultado['% global'] = (100 * acumulado[nombres[-1]] / acumulado[nombres[0]].where(acumulado[nombres[0]] > 0)).round(1)
+    return resultado.sort_values(nombres[0], ascending=False)
+
+
+# =============================================================================
+# TIEMPO EN CADA ETAPA
+# =============================================================================
+
+def dias_en_etapas(personas, hoy=None):
+    """Días que cada persona pasó en cada etapa (formato largo)
+
+    Las etapas concluidas se miden entre la fecha de entrada y la de la
+    etapa siguiente; la etapa actual, hasta `hoy` (en_curso=True).
+    """
+    hoy = pd.Timestamp(hoy) if hoy is not None else pd.Timestamp.now().normalize()
+    partes = []
+    for numero, etapa in enumerate(ETAPAS):
+        entrada = personas[FECHAS_ETAPAS[etapa]]
+        if numero + 1 < len(ETAPAS):
+            salida = personas[FECHAS_ETAPAS[ETAPAS[numero + 1]]]
+            concluida = personas['etapa'] > numero
+        else:
+            salida = pd.Series(pd.NaT, index=personas.index)
+            concluida = pd.Series(False, index=personas.index)
+        en_curso = personas['etapa'] == numero
+        fin = salida.where(concluida, pd.Series(hoy, index=personas.index).where(en_curso))
+        dias = (fin - entrada).dt.days
+        validos = dias.notna() & (dias >= 0)
+        partes.append(pd.DataFrame({
+            'etapa': NOMBRES_ETAPAS[etapa],
+            'dias': dias[validos].astype(int),
+            'en_curso': en_curso[validos]
+        }))
+    return pd.concat(partes).rename_axis('persona').reset_index()
+
+def tiempos_etapas(dias):
+    """Distribución de días por etapa (concluidas y en curso por separado)"""
+    orden = [NOMBRES_ETAPAS[etapa] for etapa in ETAPAS]
+    if dias.empty:
+        return pd.DataFrame(columns=['personas', 'media', 'p25', 'mediana', 'p75', 'maximo'])
+    estado = dias['en_curso'].map({False: 'Concluida', True: 'En curso'})
+    agrupados = dias.groupby([dias['etapa'], estado])['dias']
+    tiempos = pd.DataFrame({
+        'personas': agrupados.size(),
+        'media': agrupados.mean().round(1),
+        'p25': agrupados.quantile(0.25),
+        'mediana': agrupados.median(),
+        'p75': agrupados.quantile(0.75),
+        'maximo': agrupados.max()
+    })
+    tiempos.index.names = ['etapa', 'estado']
+    return tiempos.reindex(orden, level=0)
+
+def rangos_etapas(dias):
+    """Personas por rango de días en cada etapa (histograma)"""
+    rangos = pd.cut(dias['dias'], RANGOS_DIAS, labels=NOMBRES_RANGOS)
+    tabla = pd.crosstab(dias['etapa'], rangos).reindex(columns=NOMBRES_RANGOS, fill_value=0)
+    return tabla.reindex([NOMBRES_ETAPAS[etapa] for etapa in ETAPAS]).dropna(how='all').astype(int)
+
+
+def analizar_embudo(datos, hoy=None):
+    """Análisis completo del embudo
+
+    Devuelve {'personas', 'etapas', 'por_programa', 'por_canal',
+    'por_cohorte', 'tiempos', 'rangos'}.
+    """
+    personas = personas_embudo(datos)
+    dias = dias_en_etapas(personas, hoy)
+    return {
+        'personas': personas,
+        'etapas': conversion_etapas(personas),
+        'por_programa': conversion_por(personas, 'programa'),
+        'por_canal': conversion_por(personas, 'canal'),
+        'por_cohorte': conversion_por(personas, 'cohorte').sort_index(),
+        'tiempos': tiempos_etapas(dias),
+        'rangos': rangos_etapas(dias)
+    }
@@ -1,30 +1,42 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import os
 import json
 from datetime import datetime, timedelta
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import paramiko
-from io import StringIO, BytesIO
+from io import BytesIO
 import time
 import hashlib
 import base64
-import matplotlib.pyplot as plt
-import seaborn as sns
-from PIL import Image
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configuración de página
-st.set_page_config(
-    page_title="Sistema Escuela Enfermería - Modo Supervisión",
-    page_icon="🏥",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+from importacion_diferida40 import diferir
+
+# Módulos pesados: se importan en su primer uso (matplotlib, vía graficas40, solo en reportes)
+smtplib = diferir('smtplib')
+
+import almacenamiento40
+import esquemas40
+import altas40
+import concurrencia40
+import duplicados40
+import embudo40
+import vinculacion40
+import motor_sqlite40
+import estadisticas40
+import documentos40
+import graficas40
+
+def configurar_pagina():
+    """Configuración de página (primera llamada a Streamlit de cada ejecución)"""
+    st.set_page_config(
+        page_title="Sistema Escuela Enfermería - Modo Supervisión",
+        page_icon="🏥",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
 # =============================================================================
 # SISTEMA DE CARGA REMOTA VIA SSH - CORREGIDO CON VARIABLES DE SECRETS
@@ -32,40 +44,28 @@ st.set_page_config(
 
 class CargadorRemoto:
     def __init__(self):
-        self.ssh = None
-        self.sftp = None
+        self.sftp = None  # almacenamiento abierto (interfaz compatible con SFTP)
         self.BASE_DIR_REMOTO = st.secrets.get("remote_dir")
         
     def conectar(self):
-        """Establecer conexión SSH con el servidor remoto usando variables de secrets.toml"""
+        """Abrir el almacenamiento configurado en secrets.toml (SFTP, local o SQLite)"""
         try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh.connect(
-                hostname=st.secrets["remote_host"],
-                port=st.secrets["remote_port"],
-                username=st.secrets["remote_user"],
-                password=st.secrets["remote_password"],
-                timeout=30
-            )
-            self.sftp = self.ssh.open_sftp()
+            self.sftp = almacenamiento40.abrir_almacenamiento(st.secrets)
             return True
         except Exception as e:
-            st.error(f"❌ Error de conexión SSH: {e}")
+            st.error(f"❌ Error de conexión al almacenamiento: {e}")
             return False
     
     def desconectar(self):
-        """Cerrar conexión SSH"""
+        """Cerrar el almacenamiento"""
         try:
             if self.sftp:
                 self.sftp.close()
-            if self.ssh:
-                self.ssh.close()
         except:
             pass
     
-    def cargar_csv_remoto(self, ruta_remota):
-        """Cargar archivo CSV desde el servidor remoto - SIN DATOS DE EJEMPLO"""
+    def cargar_csv_remoto(self, ruta_remota, tipos=None):
+        """Cargar archivo CSV desde el servidor remoto - SIN DATOS DE EJEMPLO (tipos: dtype por columna)"""
         try:
             if not self.conectar():
                 return pd.DataFrame()  # Devuelve DataFrame vacío si no puede conectar
@@ -77,14 +77,11 @@ class CargadorRemoto:
                 st.warning(f"📁 Archivo remoto no encontrado: {os.path.basename(ruta_remota)}")
                 return pd.DataFrame()  # DataFrame vacío si no existe
             
-            # Leer archivo remoto
+            # Leer archivo remoto y registrar su versión para guardados concurrentes
             with self.sftp.file(ruta_remota, 'r') as archivo_remoto:
-                # Intentar diferentes codificaciones
-                try:
-                    df = pd.read_csv(archivo_remoto, encoding='utf-8')
-                except UnicodeDecodeError:
-                    archivo_remoto.seek(0)
-                    df = pd.read_csv(archivo_remoto, encoding='latin-1')
+                contenido = archivo_remoto.read()
+            df = concurrencia40.leer_csv_bytes(contenido, tipos)
+            obtener_guardado_optimista().registrar_lectura(ruta_remota, contenido, df)
                 
             st.success(f"✅ {os.path.basename(ruta_remota)} cargado desde servidor ({len(df)} registros)")
             return df
@@ -114,16 +111,61 @@ class CargadorRemoto:
         }
         
         datos_cargados = {}
+        motor = obtener_motor_datasets()
         
         with st.spinner("🌐 Conectando al servidor remoto..."):
             for nombre, ruta_remota in rutas_remotas.items():
+                if motor is not None and nombre in motor_sqlite40.DATASETS_MOTOR:
+                    datos_cargados[nombre] = motor.leer(nombre, esquemas40.tipos_lectura(nombre))
+                    continue
                 # SOLO CARGAR DESDE REMOTO, NO USAR DATOS DE EJEMPLO
-                datos_cargados[nombre] = self.cargar_csv_remoto(ruta_remota)
+                datos_cargados[nombre] = self.cargar_csv_remoto(ruta_remota, esquemas40.tipos_lectura(nombre))
+        
+        if motor is not None:
+            # Las altas se insertan directamente en el motor
+            return datos_cargados
+        
+        # Combinar las altas de aspirantes que aún no se compactan en los CSV base
+        try:
+            obtener_registro_altas().fusionar_lectura(datos_cargados)
+        except Exception as e:
+            st.warning(f"⚠️ No se pudieron leer las altas recientes: {e}")
         
         return datos_cargados
 
-# Instanciar el cargador remoto
-cargador_remoto = CargadorRemoto()
+# Cargador remoto de la ejecución (se crea en iniciar_aplicacion)
+cargador_remoto = None
+
+@st.cache_resource
+def obtener_registro_altas():
+    """Registro de altas compartido por el proceso (conserva las claves ya leídas)"""
+    return altas40.crear_registro_altas(CargadorRemoto, st.secrets["remote_dir"])
+
+@st.cache_resource
+def obtener_guardado_optimista():
+    """Versiones leídas de los CSV remotos, para fusionar escrituras concurrentes"""
+    return concurrencia40.GuardadoOptimista(CargadorRemoto)
+
+@st.cache_resource
+def obtener_estadisticas():
+    """Conteos materializados del dashboard y los reportes (datos/estadisticas.json)"""
+    return estadisticas40.crear_estadisticas(CargadorRemoto, st.secrets["remote_dir"], obtener_motor_datasets())
+
+@st.cache_resource
+def obtener_motor_datasets():
+    """Motor SQLite de los datasets (None si no se configuró datasets_db)"""
+    ruta_db = st.secrets.get("datasets_db")
+    return motor_sqlite40.MotorDatasets(ruta_db) if ruta_db else None
+
+@st.cache_resource
+def obtener_registro_documentos():
+    """Registro de documentos (un renglón por documento) compartido por el proceso"""
+    return documentos40.crear_registro_documentos(CargadorRemoto, st.secrets["remote_dir"], obtener_motor_datasets())
+
+@st.cache_resource
+def obtener_graficas():
+    """Gráficas de los reportes ya renderizadas (caché LRU por hash de los datos)"""
+    return graficas40.ServicioGraficas()
 
 # =============================================================================
 # CARGA DE TODOS LOS DATOS DESDE EL SERVIDOR REMOTO - SIN CACHE TEMPORAL
@@ -133,21 +175,25 @@ def cargar_datos_completos():
     """Cargar todos los datos desde el servidor remoto - SIN CACHE"""
     return cargador_remoto.cargar_todos_los_datos()
 
-# Cargar todos los datos SIN cache para forzar carga remota
-datos = cargar_datos_completos()
-
-# Asignar a variables globales
-df_inscritos = datos.get('inscritos', pd.DataFrame())
-df_estudiantes = datos.get('estudiantes', pd.DataFrame())
-df_egresados = datos.get('egresados', pd.DataFrame())
-df_contratados = datos.get('contratados', pd.DataFrame())
-df_actualizaciones = datos.get('actualizaciones_academicas', pd.DataFrame())
-df_certificaciones = datos.get('certificaciones', pd.DataFrame())
-df_programas = datos.get('programas_educativos', pd.DataFrame())
-df_costos = datos.get('costos_programas', pd.DataFrame())
-df_usuarios = datos.get('usuarios', pd.DataFrame())
-df_roles = datos.get('roles_permisos', pd.DataFrame())
-df_bitacora = datos.get('bitacora', pd.DataFrame())
+def asignar_datos_globales(datos_cargados):
+    """Asignar los DataFrames cargados a las variables globales del módulo"""
+    global datos, df_inscritos, df_estudiantes, df_egresados, df_contratados, df_actualizaciones
+    global df_certificaciones, df_programas, df_costos, df_usuarios, df_roles, df_bitacora
+    datos = datos_cargados
+    df_inscritos = datos.get('inscritos', pd.DataFrame())
+    df_estudiantes = datos.get('estudiantes', pd.DataFrame())
+    df_egresados = datos.get('egresados', pd.DataFrame())
+    df_contratados = datos.get('contratados', pd.DataFrame())
+    df_actualizaciones = datos.get('actualizaciones_academicas', pd.DataFrame())
+    df_certificaciones = datos.get('certificaciones', pd.DataFrame())
+    df_programas = datos.get('programas_educativos', pd.DataFrame())
+    df_costos = datos.get('costos_programas', pd.DataFrame())
+    df_usuarios = datos.get('usuarios', pd.DataFrame())
+    df_roles = datos.get('roles_permisos', pd.DataFrame())
+    df_bitacora = datos.get('bitacora', pd.DataFrame())
+
+# Variables globales vacías hasta que iniciar_aplicacion cargue los datos
+asignar_datos_globales({})
 
 # =============================================================================
 # SISTEMA DE ENVÍO DE EMAILS - VERSIÓN MEJORADA CON COPIA A NOTIFICATION_EMAIL
@@ -406,8 +452,8 @@ class SistemaEmail:
         
         return self.enviar_notificacion_email(datos_inscripcion, documentos_guardados, es_completado)
 
-# Instancia del sistema de email
-sistema_email = SistemaEmail()
+# Instancia del sistema de email (se crea en iniciar_aplicacion)
+sistema_email = None
 
 # =============================================================================
 # SISTEMA DE AUTENTICACIÓN Y SEGURIDAD - VERSIÓN MEJORADA
@@ -512,22 +558,25 @@ class SistemaAutenticacion:
         self.sesion_activa = False
         self.usuario_actual = None
 
-# Instancia global del sistema de autenticación
-auth = SistemaAutenticacion()
+# Instancia global del sistema de autenticación (se crea en iniciar_aplicacion)
+auth = None
 
 # =============================================================================
 # SISTEMA DE GESTIÓN ACADÉMICA - MEJORADO PARA MOSTRAR DATOS PERSONALES
 # =============================================================================
 
 class SistemaAcademico:
-    def __init__(self):
-        self.inscritos = df_inscritos
-        self.estudiantes = df_estudiantes
-        self.egresados = df_egresados
-        self.contratados = df_contratados
-        self.programas = df_programas
-        self.certificaciones = df_certificaciones
-        self.costos = df_costos
+    def __init__(self, datos_academicos=None):
+        """datos_academicos: {dataset: DataFrame}; por omisión, los DataFrames globales cargados"""
+        if datos_academicos is None:
+            datos_academicos = datos
+        self.inscritos = datos_academicos.get('inscritos', pd.DataFrame())
+        self.estudiantes = datos_academicos.get('estudiantes', pd.DataFrame())
+        self.egresados = datos_academicos.get('egresados', pd.DataFrame())
+        self.contratados = datos_academicos.get('contratados', pd.DataFrame())
+        self.programas = datos_academicos.get('programas_educativos', pd.DataFrame())
+        self.certificaciones = datos_academicos.get('certificaciones', pd.DataFrame())
+        self.costos = datos_academicos.get('costos_programas', pd.DataFrame())
 
     def obtener_datos_usuario_actual(self):
         """Obtener datos del usuario actual - VERSIÓN MEJORADA"""
@@ -621,8 +670,8 @@ class SistemaAcademico:
         
         return pd.DataFrame()
 
-# Instancia del sistema académico
-academico = SistemaAcademico()
+# Instancia del sistema académico (se crea en iniciar_aplicacion)
+academico = None
 
 # =============================================================================
 # SISTEMA DE EDICIÓN Y GUARDADO REMOTO - CORREGIDO CON VARIABLES DE SECRETS
@@ -652,26 +701,71 @@ class EditorRemoto:
     
     def guardar_dataframe_remoto(self, df, ruta_remota):
         """Guardar DataFrame en el servidor remoto"""
+        motor = obtener_motor_datasets()
+        nombre = next((n for n in motor_sqlite40.DATASETS_MOTOR if self.obtener_ruta_archivo(n) == ruta_remota), None)
+        if motor is not None and nombre:
+            # Solo se escriben los registros y celdas que cambiaron
+            try:
+                motor.guardar(nombre, df)
+            except Exception as e:
+                st.error(f"❌ Error guardando {nombre} en la base de datos: {e}")
+                return False
+            self.actualizar_estadisticas(ruta_remota, df)
+            return True
+        
+        # inscritos/usuarios se reescriben bajo el candado del registro de altas
+        registro_altas = obtener_registro_altas()
+        for tabla, (ruta_base, _) in registro_altas.tablas.items():
+            if ruta_remota == ruta_base:
+                try:
+                    return registro_altas.reescribir(
+                        {tabla: df}, lambda dfs: self.subir_dataframe_remoto(dfs[tabla], ruta_remota)
+                    ) is not None
+                except Exception as e:
+                    st.error(f"❌ Error guardando archivo remoto: {e}")
+                    return False
+        return self.subir_dataframe_remoto(df, ruta_remota)
+    
+    def agregar_registro_remoto(self, nombre, registro, df):
+        """Agregar un registro; con el motor se inserta solo ese registro, si no se guarda df completo"""
+        motor = obtener_motor_datasets()
+        if motor is not None and nombre in motor_sqlite40.DATASETS_MOTOR:
+            try:
+                motor.insertar(nombre, registro)
+            except Exception as e:
+                st.error(f"❌ Error guardando {nombre} en la base de datos: {e}")
+                return False
+            self.actualizar_estadisticas(self.obtener_ruta_archivo(nombre), df)
+            return True
+        return self.guardar_dataframe_remoto(df, self.obtener_ruta_archivo(nombre))
+    
+    def subir_dataframe_remoto(self, df, ruta_remota):
+        """Subir un DataFrame como CSV al servidor remoto, fusionando cambios concurrentes por clave"""
         try:
-            if self.cargador.conectar():
-                # Guardar DataFrame en un buffer en memoria
-                buffer = StringIO()
-                df.to_csv(buffer, index=False, encoding='utf-8')
-                buffer.seek(0)
-                
-                # Subir al servidor remoto
-                with self.cargador.sftp.file(ruta_remota, 'w') as archivo_remoto:
-                    archivo_remoto.write(buffer.getvalue())
-                
-                self.cargador.desconectar()
-                return True
+            nombre = next((n for n in concurrencia40.CLAVES_DATASETS if self.obtener_ruta_archivo(n) == ruta_remota), None)
+            guardado, conflictos = obtener_guardado_optimista().guardar(
+                ruta_remota, df,
+                concurrencia40.CLAVES_DATASETS.get(nombre),
+                esquemas40.tipos_lectura(nombre) if nombre else None
+            )
+            if conflictos:
+                st.warning(f"⚠️ {os.path.basename(ruta_remota)} fue modificado por otra sesión; "
+                           f"{conflictos} campo(s) en conflicto se guardaron con tu versión")
+            self.actualizar_estadisticas(ruta_remota, guardado)
+            return True
                 
         except Exception as e:
             st.error(f"❌ Error guardando archivo remoto: {e}")
             return False
+    
+    def actualizar_estadisticas(self, ruta_remota, df):
+        """Reemplazar el resumen materializado del dataset recién guardado"""
+        nombre = next((n for n in estadisticas40.DATASETS_ESTADISTICAS if self.obtener_ruta_archivo(n) == ruta_remota), None)
+        if nombre and not obtener_estadisticas().reemplazar({nombre: df}):
+            st.warning("⚠️ Los datos se guardaron, pero no se pudieron actualizar las estadísticas del dashboard")
 
-# Instancia del editor remoto
-editor = EditorRemoto()
+# Instancia del editor remoto (se crea en iniciar_aplicacion)
+editor = None
 
 # =============================================================================
 # SISTEMA DOCUMENTAL - MEJORADO Y CORREGIDO CON VARIABLES DE SECRETS
@@ -711,6 +805,16 @@ class SistemaDocumental:
             st.warning("No se pudo identificar la matrícula del usuario")
             return []
         
+        # Documentos registrados de la matrícula (sin listar uploads/ ni consultar cada archivo)
+        registrados = obtener_registro_documentos().de_persona(matricula)
+        if not registrados.empty:
+            return [{
+                'nombre': fila['archivo'],
+                'ruta': os.path.join(self.directorio_uploads, fila['archivo']),
+                'tipo': fila['tipo'] if pd.notna(fila['tipo']) else self.obtener_tipo_documento(fila['archivo']),
+                'tamaño': self.formatear_tamaño(fila['tamano']) if pd.notna(fila['tamano']) else "Desconocido"
+            } for fila in registrados.to_dict('records')]
+        
         documentos = []
         
         try:
@@ -758,17 +862,20 @@ class SistemaDocumental:
                 stats = cargador_remoto.sftp.stat(ruta_completa)
                 cargador_remoto.desconectar()
                 
-                # Convertir bytes a KB o MB
-                tamaño_bytes = stats.st_size
-                if tamaño_bytes > 1024 * 1024:
-                    return f"{tamaño_bytes / (1024 * 1024):.1f} MB"
-                else:
-                    return f"{tamaño_bytes / 1024:.1f} KB"
+                return self.formatear_tamaño(stats.st_size)
                     
         except:
             pass
         return "Desconocido"
 
+    def formatear_tamaño(self, tamaño_bytes):
+        """Convertir bytes a KB o MB"""
+        tamaño_bytes = float(tamaño_bytes)
+        if tamaño_bytes > 1024 * 1024:
+            return f"{tamaño_bytes / (1024 * 1024):.1f} MB"
+        else:
+            return f"{tamaño_bytes / 1024:.1f} KB"
+
     def descargar_documento(self, nombre_archivo):
         """Descargar documento desde el servidor remoto"""
         try:
@@ -841,14 +948,15 @@ class SistemaDocumental:
                 ruta_remota = os.path.join(self.directorio_uploads, nombre_archivo)
                 
                 # Subir archivo al servidor
+                contenido = archivo.getvalue()
                 with cargador_remoto.sftp.file(ruta_remota, 'wb') as archivo_remoto:
-                    archivo_remoto.write(archivo.getvalue())
-                
-                # ACTUALIZAR CAMPO documentos_subidos EN LA BASE DE DATOS CORRESPONDIENTE
-                self.actualizar_documentos_subidos(matricula, nombre_archivo, tipo_documento)
+                    archivo_remoto.write(contenido)
                 
                 cargador_remoto.desconectar()
                 
+                # Registrar el documento (un renglón; no se reescribe la tabla del rol)
+                self.registrar_documento(matricula, nombre_archivo, tipo_documento, contenido)
+                
                 # ENVIAR EMAIL DE CONFIRMACIÓN (con copia a notification_email)
                 usuario_actual = st.session_state.usuario_actual.get('usuario', '')
                 email_enviado = sistema_email.enviar_email_confirmacion(
@@ -872,105 +980,27 @@ class SistemaDocumental:
             st.error(f"❌ Error al subir documento: {e}")
             return False
 
-    def actualizar_documentos_subidos(self, matricula, nombre_archivo, tipo_documento):
-        """Actualizar campo documentos_subidos en la base de datos correspondiente"""
+    def registrar_documento(self, matricula, nombre_archivo, tipo_documento, contenido):
+        """Agregar el documento al registro de documentos"""
         try:
-            # Determinar en qué DataFrame buscar según el rol del usuario
-            rol_actual = st.session_state.usuario_actual.get('rol', '').lower()
-            
-            if rol_actual == 'inscrito' and not self.inscritos.empty:
-                df_actualizar = self.inscritos
-                ruta_archivo = editor.obtener_ruta_archivo('inscritos')
-            elif rol_actual == 'estudiante' and not self.estudiantes.empty:
-                df_actualizar = self.estudiantes
-                ruta_archivo = editor.obtener_ruta_archivo('estudiantes')
-            elif rol_actual == 'egresado' and not self.egresados.empty:
-                df_actualizar = self.egresados
-                ruta_archivo = editor.obtener_ruta_archivo('egresados')
-            elif rol_actual == 'contratado' and not self.contratados.empty:
-                df_actualizar = self.contratados
-                ruta_archivo = editor.obtener_ruta_archivo('contratados')
-            else:
-                return False
-            
-            # Buscar el registro del usuario - buscar por diferentes campos
-            indice = None
-            campos_busqueda = ['matricula', 'usuario', 'id']
-            
-            for campo in campos_busqueda:
-                if campo in df_actualizar.columns:
-                    coincidencias = df_actualizar[df_actualizar[campo].astype(str) == str(matricula)]
-                    if not coincidencias.empty:
-                        indice = coincidencias.index[0]
-                        break
-            
-            if indice is None:
-                st.warning(f"⚠️ No se encontró registro para matrícula/usuario {matricula}")
-                return False
-            
-            # Crear o actualizar el campo documentos_subidos
-            if 'documentos_subidos' not in df_actualizar.columns:
-                df_actualizar['documentos_subidos'] = ''
-            
-            # Obtener documentos actuales
-            documentos_actuales = df_actualizar.at[indice, 'documentos_subidos']
-            if pd.isna(documentos_actuales) or documentos_actuales == '':
-                documentos_actuales = f"{tipo_documento}:{nombre_archivo}"
-            else:
-                # CORRECCIÓN: Convertir a string si es necesario
-                if not isinstance(documentos_actuales, str):
-                    documentos_actuales = str(documentos_actuales)
-                documentos_actuales += f";{tipo_documento}:{nombre_archivo}"
-            
-            # Actualizar el campo
-            df_actualizar.at[indice, 'documentos_subidos'] = documentos_actuales
-            
-            # Guardar en el servidor remoto
-            if editor.guardar_dataframe_remoto(df_actualizar, ruta_archivo):
-                st.success("📝 Campo 'documentos_subidos' actualizado en la base de datos")
+            registro = documentos40.registro_documento(matricula, tipo_documento, nombre_archivo, contenido)
+            if obtener_registro_documentos().agregar([registro]):
+                st.success("📝 Documento registrado en la base de datos")
                 return True
             else:
-                st.error("❌ Error al actualizar la base de datos")
+                st.error("❌ Error al registrar el documento")
                 return False
                 
         except Exception as e:
-            st.error(f"❌ Error al actualizar documentos subidos: {e}")
+            st.error(f"❌ Error al registrar el documento: {e}")
             return False
 
     def obtener_documentos_requeridos(self, rol):
         """Obtener lista de documentos requeridos según el rol"""
-        documentos_requeridos = {
-            'inscrito': [
-                "CURP",
-                "Acta de Nacimiento",
-                "Comprobante de Estudios",
-                "Fotografías Tamaño Infantil",
-                "Comprobante de Domicilio"
-            ],
-            'estudiante': [
-                "Certificado de Estudios",
-                "Historial Académico",
-                "Comprobante de Pagos",
-                "Constancia de Servicio Social"
-            ],
-            'egresado': [
-                "Título Profesional",
-                "Cédula Profesional",
-                "Certificado de Estudios Completos",
-                "Constancia de Egreso"
-            ],
-            'contratado': [
-                "Contrato Laboral",
-                "CURP",
-                "Comprobante de Estudios",
-                "Identificación Oficial",
-                "Comprobante de Domicilio"
-            ]
-        }
-        return documentos_requeridos.get(rol.lower(), [])
+        return documentos40.DOCUMENTOS_REQUERIDOS.get(rol.lower(), [])
 
-# Instancia del sistema documental
-documentos = SistemaDocumental()
+# Instancia del sistema documental (se crea en iniciar_aplicacion)
+documentos = None
 
 # =============================================================================
 # INTERFACES DE USUARIO POR ROL - MEJORADAS CON CAMPOS CORRECTOS
@@ -995,9 +1025,8 @@ def mostrar_interfaz_inscrito():
     with col1:
         st.subheader("👤 Información Personal")
         
-        # CAMPOS CORRECTOS PARA INSCRITOS
-        campos_inscritos = ['matricula', 'nombre_completo', 'programa', 'email', 
-                           'telefono', 'fecha_nacimiento', 'genero', 'fecha_inscripcion', 'estatus']
+        # Campos del portal según el registro de esquemas
+        campos_inscritos = esquemas40.campos_vista('inscritos')
         
         for campo in campos_inscritos:
             if campo in usuario_actual and pd.notna(usuario_actual[campo]):
@@ -1156,9 +1185,8 @@ def mostrar_interfaz_estudiante():
     with col1:
         st.subheader("👤 Información Académica")
         
-        # CAMPOS CORRECTOS PARA ESTUDIANTES
-        campos_estudiantes = ['matricula', 'nombre_completo', 'programa', 'email', 
-                             'telefono', 'fecha_nacimiento', 'genero', 'fecha_inscripcion', 'estatus']
+        # Campos del portal según el registro de esquemas
+        campos_estudiantes = esquemas40.campos_vista('estudiantes')
         
         for campo in campos_estudiantes:
             if campo in usuario_actual and pd.notna(usuario_actual[campo]):
@@ -1326,10 +1354,8 @@ def mostrar_interfaz_egresado():
     with col1:
         st.subheader("👤 Información Profesional")
         
-        # CAMPOS CORRECTOS PARA EGRESADOS
-        campos_egresados = ['matricula', 'nombre_completo', 'programa_original', 
-                           'fecha_graduacion', 'nivel_academico', 'email', 'telefono', 
-                           'estado_laboral', 'fecha_actualizacion']
+        # Campos del portal según el registro de esquemas
+        campos_egresados = esquemas40.campos_vista('egresados')
         
         for campo in campos_egresados:
             if campo in usuario_actual and pd.notna(usuario_actual[campo]):
@@ -1483,9 +1509,8 @@ def mostrar_interfaz_contratado():
     with col1:
         st.subheader("👤 Información Laboral")
 
-        # CAMPOS ACTUALIZADOS PARA CONTRATADOS
-        campos_contratados = ['matricula', 'fecha_contratacion', 'puesto', 'departamento',
-                             'estatus', 'salario', 'tipo_contrato', 'fecha_inicio', 'fecha_fin']
+        # Campos del portal según el registro de esquemas
+        campos_contratados = esquemas40.campos_vista('contratados')
 
         for campo in campos_contratados:
             if campo in usuario_actual and pd.notna(usuario_actual[campo]):
@@ -1663,9 +1688,12 @@ def mostrar_interfaz_administrador():
             "📊 Dashboard General",
             "👥 Gestión de Usuarios", 
             "📁 Gestión de Documentos",
+            "📋 Completitud de Documentos",
             "📧 Configuración de Email",
             "🔐 Roles y Permisos",
             "📈 Reportes y Estadísticas",
+            "🔻 Embudo de Inscripción",
+            "🔁 Posibles Duplicados",
             "🔍 Verificación de Datos"
         ]
     )
@@ -1676,37 +1704,52 @@ def mostrar_interfaz_administrador():
         mostrar_gestion_usuarios()
     elif opcion == "📁 Gestión de Documentos":
         mostrar_gestion_documentos()
+    elif opcion == "📋 Completitud de Documentos":
+        mostrar_completitud_documentos()
     elif opcion == "📧 Configuración de Email":
         mostrar_configuracion_email()
     elif opcion == "🔐 Roles y Permisos":
         mostrar_roles_permisos()
     elif opcion == "📈 Reportes y Estadísticas":
         mostrar_reportes_estadisticas()
+    elif opcion == "🔻 Embudo de Inscripción":
+        mostrar_embudo_inscripcion()
+    elif opcion == "🔁 Posibles Duplicados":
+        mostrar_posibles_duplicados()
     elif opcion == "🔍 Verificación de Datos":
         verificar_vinculacion_usuarios()
 
+def obtener_resumenes():
+    """Resúmenes materializados por dataset; los que falten se calculan de los datos cargados"""
+    resumenes = dict(obtener_estadisticas().obtener())
+    cargados = {
+        'inscritos': df_inscritos, 'estudiantes': df_estudiantes, 'egresados': df_egresados,
+        'contratados': df_contratados, 'usuarios': df_usuarios
+    }
+    for nombre in estadisticas40.DATASETS_ESTADISTICAS:
+        if nombre not in resumenes:
+            resumenes[nombre] = estadisticas40.resumen_dataset(cargados[nombre])
+    return resumenes
+
 def mostrar_dashboard_administrador():
     """Dashboard general para administradores"""
     st.subheader("📊 Dashboard General")
     
-    # Métricas generales
+    # Métricas generales (conteos materializados)
+    estadisticas = obtener_resumenes()
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_inscritos = len(df_inscritos) if not df_inscritos.empty else 0
-        st.metric("Total Inscritos", total_inscritos)
+        st.metric("Total Inscritos", estadisticas['inscritos']['registros'])
     
     with col2:
-        total_estudiantes = len(df_estudiantes) if not df_estudiantes.empty else 0
-        st.metric("Total Estudiantes", total_estudiantes)
+        st.metric("Total Estudiantes", estadisticas['estudiantes']['registros'])
     
     with col3:
-        total_egresados = len(df_egresados) if not df_egresados.empty else 0
-        st.metric("Total Egresados", total_egresados)
+        st.metric("Total Egresados", estadisticas['egresados']['registros'])
     
     with col4:
-        total_contratados = len(df_contratados) if not df_contratados.empty else 0
-        st.metric("Total Contratados", total_contratados)
+        st.metric("Total Contratados", estadisticas['contratados']['registros'])
     
     # Información del sistema
     st.subheader("🔧 Estado del Sistema")
@@ -1714,7 +1757,8 @@ def mostrar_dashboard_administrador():
     col1, col2 = st.columns(2)
     
     with col1:
-        st.info("**Conexión SSH:** ✅ Activa" if cargador_remoto.conectar() else "**Conexión SSH:** ❌ Inactiva")
+        tipo_almacenamiento = st.secrets.get("storage_backend", "sftp").upper()
+        st.info(f"**Almacenamiento ({tipo_almacenamiento}):** ✅ Activo" if cargador_remoto.conectar() else f"**Almacenamiento ({tipo_almacenamiento}):** ❌ Inactivo")
         cargador_remoto.desconectar()
         
         # Verificar configuración de email
@@ -1724,9 +1768,9 @@ def mostrar_dashboard_administrador():
     with col2:
         # Verificar archivos críticos
         archivos_criticos = {
-            'usuarios.csv': not df_usuarios.empty,
-            'inscritos.csv': not df_inscritos.empty,
-            'estudiantes.csv': not df_estudiantes.empty
+            'usuarios.csv': estadisticas['usuarios']['registros'] > 0,
+            'inscritos.csv': estadisticas['inscritos']['registros'] > 0,
+            'estudiantes.csv': estadisticas['estudiantes']['registros'] > 0
         }
         
         st.write("**Archivos del Sistema:**")
@@ -1776,8 +1820,10 @@ def mostrar_gestion_usuarios():
                     # Crear una copia para evitar problemas de referencia
                     df_temp = df_usuarios.copy()
                     df_temp = pd.concat([df_temp, pd.DataFrame([nuevo_registro])], ignore_index=True)
+                    # pd.concat descarta attrs: conservar la lectura con la que se comparan los cambios
+                    df_temp.attrs = dict(df_usuarios.attrs)
 
-                    if editor.guardar_dataframe_remoto(df_temp, editor.obtener_ruta_archivo('usuarios')):
+                    if editor.agregar_registro_remoto('usuarios', nuevo_registro, df_temp):
                         # Actualizar la variable global
                         df_usuarios = df_temp
                         st.success("✅ Usuario agregado exitosamente")
@@ -1801,7 +1847,7 @@ def mostrar_gestion_usuarios():
                     st.rerun()
 
 def mostrar_gestion_documentos():
-    """Gestión de documentos para administradores - CORREGIDO"""
+    """Gestión de documentos para administradores (paginada; descargas bajo demanda)"""
     st.subheader("📁 Gestión de Documentos")
     
     # Navegación por tipos de usuarios
@@ -1820,39 +1866,130 @@ def mostrar_gestion_documentos():
     else:  # Contratados
         datos = df_contratados
     
-    if datos.empty:
+    if datos.empty or 'matricula' not in datos.columns:
         st.info(f"📝 No hay datos de {tipo_usuario.lower()} disponibles")
         return
     
-    # Mostrar documentos subidos - CORRECCIÓN: Convertir a string antes de split
-    if 'documentos_subidos' in datos.columns:
-        st.subheader(f"Documentos de {tipo_usuario}")
-        
-        for _, usuario in datos.iterrows():
-            documentos_subidos = usuario.get('documentos_subidos')
-            
-            # CORRECCIÓN: Verificar y convertir a string
-            if pd.notna(documentos_subidos) and str(documentos_subidos).strip() != '':
-                # Convertir a string si es necesario
-                if not isinstance(documentos_subidos, str):
-                    documentos_subidos = str(documentos_subidos)
-                
-                with st.expander(f"📂 {usuario.get('nombre', 'Usuario')} - {usuario.get('matricula', 'N/A')}"):
-                    documentos_lista = documentos_subidos.split(';')
-                    for doc in documentos_lista:
-                        if ':' in doc:
-                            try:
-                                tipo, archivo = doc.split(':', 1)
-                                st.write(f"**{tipo}:** {archivo}")
-                                
-                                # Botón para descargar
-                                if st.button(f"📥 Descargar {tipo}", key=f"descargar_{archivo}"):
-                                    if documentos.descargar_documento(archivo.strip()):
-                                        st.success(f"✅ {archivo} descargado")
-                            except ValueError:
-                                st.warning(f"⚠️ Formato incorrecto: {doc}")
-    else:
-        st.info(f"📝 No hay documentos subidos para {tipo_usuario.lower()}")
+    registro = obtener_registro_documentos()
+    columna_nombre = 'nombre_completo' if 'nombre_completo' in datos.columns else 'nombre'
+    personas = datos.dropna(subset=['matricula']).drop_duplicates('matricula')
+    nombres = personas.set_index('matricula')[columna_nombre] if columna_nombre in personas.columns else pd.Series(dtype=str)
+    
+    # Búsqueda, filtro y orden
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        busqueda = st.text_input("🔎 Buscar (matrícula, nombre o archivo)")
+    with col2:
+        tipos = st.multiselect("Tipo de documento", sorted(registro.conteo_por_tipo(personas['matricula']).index))
+    with col3:
+        orden = st.selectbox("Ordenar por", ["Más recientes", "Matrícula", "Tipo", "Tamaño"])
+    
+    coincidencias = None
+    if busqueda.strip() and not nombres.empty:
+        coincidencias = nombres.index[nombres.astype(str).str.contains(busqueda.strip(), case=False, regex=False)]
+    columna_orden, descendente = {
+        "Más recientes": ('subido_en', True),
+        "Matrícula": ('matricula', False),
+        "Tipo": ('tipo', False),
+        "Tamaño": ('tamano', True)
+    }[orden]
+    filtros = {
+        'matriculas': personas['matricula'], 'busqueda': busqueda, 'tipos': tipos,
+        'coincidencias': coincidencias, 'orden': columna_orden, 'descendente': descendente
+    }
+    
+    col1, col2 = st.columns(2)
+    with col2:
+        tamano = st.selectbox("Documentos por página", [25, 50, 100])
+    total = len(registro.consultar(**filtros))
+    paginas = max((total + tamano - 1) // tamano, 1)
+    with col1:
+        numero = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1, step=1)
+    
+    pagina, total = registro.pagina(int(numero), tamano, **filtros)
+    if total == 0:
+        st.info(f"📝 No hay documentos subidos para {tipo_usuario.lower()} con esos filtros")
+        return
+    
+    st.write(f"### Documentos de {tipo_usuario} ({total} encontrados)")
+    tabla = pd.DataFrame({
+        'Matrícula': pagina['matricula'].values,
+        'Nombre': nombres.reindex(pagina['matricula'].astype(str)).fillna('Usuario').values,
+        'Tipo': pagina['tipo'].values,
+        'Archivo': pagina['archivo'].values,
+        'Tamaño': [documentos.formatear_tamaño(t) if pd.notna(t) else "Desconocido" for t in pagina['tamano']],
+        'Subido': pagina['subido_en'].values
+    })
+    st.dataframe(tabla, use_container_width=True, hide_index=True)
+    
+    # El archivo se lee del servidor solo al pedirlo
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        archivo = st.selectbox("Documento a descargar", list(pagina['archivo']))
+    with col2:
+        st.write("")
+        preparar = st.button("📥 Preparar descarga")
+    if preparar and archivo:
+        documentos.descargar_documento(archivo)
+
+def mostrar_completitud_documentos():
+    """Documentos requeridos entregados y faltantes por persona, para todo un rol"""
+    st.subheader("📋 Completitud de Documentos")
+    
+    datasets = {
+        'Inscritos': ('inscrito', df_inscritos),
+        'Estudiantes': ('estudiante', df_estudiantes),
+        'Egresados': ('egresado', df_egresados),
+        'Contratados': ('contratado', df_contratados)
+    }
+    tipo_usuario = st.selectbox("Seleccionar tipo de usuario", list(datasets.keys()))
+    rol, datos = datasets[tipo_usuario]
+    
+    if datos.empty or 'matricula' not in datos.columns:
+        st.info(f"📝 No hay datos de {tipo_usuario.lower()} disponibles")
+        return
+    
+    matriz = obtener_registro_documentos().completitud(rol, datos['matricula'])
+    resumen = documentos40.resumen_completitud(matriz)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Personas", resumen['total'])
+    col2.metric("Expedientes completos", resumen['completos'])
+    col3.metric("Con faltantes", resumen['total'] - resumen['completos'])
+    col4.metric("Completitud promedio", f"{resumen['promedio']:.1f}%")
+    
+    st.write("### 📄 Faltantes por documento")
+    st.bar_chart(resumen['por_documento']['faltantes'])
+    
+    # Filtrar por documentos faltantes
+    col1, col2 = st.columns(2)
+    with col1:
+        faltantes = st.multiselect("Les falta alguno de", list(matriz.columns))
+    with col2:
+        solo_incompletos = st.checkbox("Solo expedientes incompletos", value=True)
+    
+    seleccion = pd.Series(True, index=matriz.index)
+    if faltantes:
+        seleccion &= ~matriz[faltantes].all(axis=1)
+    if solo_incompletos:
+        seleccion &= ~resumen['personas']['completo']
+    
+    columna_nombre = 'nombre_completo' if 'nombre_completo' in datos.columns else 'nombre'
+    tabla = matriz[seleccion].apply(lambda columna: columna.map({True: '✅', False: '❌'}))
+    tabla.insert(0, 'porcentaje', resumen['personas'].loc[seleccion, 'porcentaje'])
+    if columna_nombre in datos.columns:
+        nombres = datos.dropna(subset=['matricula']).drop_duplicates('matricula').set_index('matricula')[columna_nombre]
+        tabla.insert(0, 'nombre', nombres.reindex(tabla.index).values)
+    tabla = tabla.reset_index()
+    
+    st.write(f"### 👥 {len(tabla)} de {resumen['total']} personas")
+    st.dataframe(tabla, use_container_width=True, hide_index=True)
+    st.download_button(
+        "📥 Descargar CSV",
+        tabla.to_csv(index=False).encode('utf-8'),
+        file_name=f"completitud_documentos_{rol}.csv",
+        mime="text/csv"
+    )
 
 def mostrar_configuracion_email():
     """Configuración del sistema de email"""
@@ -1943,20 +2080,17 @@ def mostrar_reportes_estadisticas():
     """Reportes y estadísticas para administradores"""
     st.subheader("📈 Reportes y Estadísticas")
     
+    estadisticas = obtener_resumenes()
+    
     # Estadísticas de usuarios por rol
-    if not df_usuarios.empty and 'rol' in df_usuarios.columns:
+    if estadisticas['usuarios']['roles']:
         st.write("### 👥 Distribución de Usuarios por Rol")
-        distribucion_roles = df_usuarios['rol'].value_counts()
+        distribucion_roles = pd.Series(estadisticas['usuarios']['roles']).sort_values(ascending=False)
         
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            fig, ax = plt.subplots()
-            distribucion_roles.plot(kind='bar', ax=ax, color='skyblue')
-            ax.set_title('Usuarios por Rol')
-            ax.set_ylabel('Cantidad')
-            plt.xticks(rotation=45)
-            st.pyplot(fig)
+            st.image(obtener_graficas().barras(distribucion_roles, 'Usuarios por Rol', 'Cantidad'))
         
         with col2:
             st.write("**Resumen:**")
@@ -1966,77 +2100,203 @@ def mostrar_reportes_estadisticas():
     # Estadísticas de documentos - CORRECCIÓN: Convertir a string antes de split
     st.write("### 📊 Estadísticas de Documentos")
     
-    total_documentos = 0
+    registro = obtener_registro_documentos()
+    docs_inscritos = int(registro.conteo_por_persona(df_inscritos['matricula']).sum()) if 'matricula' in df_inscritos.columns else 0
+    docs_estudiantes = int(registro.conteo_por_persona(df_estudiantes['matricula']).sum()) if 'matricula' in df_estudiantes.columns else 0
+    st.write(f"- **Inscritos:** {docs_inscritos} documentos")
+    st.write(f"- **Estudiantes:** {docs_estudiantes} documentos")
+    st.write(f"**Total de documentos en el sistema:** {docs_inscritos + docs_estudiantes}")
+
+@st.cache_data(ttl=300)
+def calcular_embudo(inscritos, estudiantes, egresados, contratados):
+    """Análisis del embudo de inscripción (cacheado por versión de los datos, 5 minutos)"""
+    return embudo40.analizar_embudo({
+        'inscritos': inscritos,
+        'estudiantes': estudiantes,
+        'egresados': egresados,
+        'contratados': contratados
+    })
+
+def mostrar_embudo_inscripcion():
+    """Conversión entre etapas, tiempo en cada etapa y desgloses por programa, cohorte y canal"""
+    st.subheader("🔻 Embudo de Inscripción")
+    
+    embudo = calcular_embudo(df_inscritos, df_estudiantes, df_egresados, df_contratados)
+    etapas = embudo['etapas']
+    if embudo['personas'].empty:
+        st.info("📝 No hay registros en las etapas del embudo")
+        return
+    
+    columnas = st.columns(len(etapas))
+    for columna, (etapa, fila) in zip(columnas, etapas.iterrows()):
+        tasa = f"{fila['tasa_etapa']:.1f}% de la etapa anterior" if pd.notna(fila['tasa_etapa']) else None
+        columna.metric(etapa, int(fila['personas']), tasa, delta_color="off")
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.image(obtener_graficas().barras(etapas['personas'], 'Personas que alcanzaron cada etapa', 'Personas'))
+    with col2:
+        st.write("**Conversión:**")
+        st.dataframe(etapas, use_container_width=True)
+    
+    # Desgloses
+    st.write("### 🔎 Desglose")
+    desgloses = {
+        "Programa": 'por_programa',
+        "Canal de captación": 'por_canal',
+        "Cohorte (mes de registro)": 'por_cohorte'
+    }
+    desglose = st.selectbox("Desglosar por", list(desgloses.keys()))
+    tabla = embudo[desgloses[desglose]]
+    st.dataframe(tabla, use_container_width=True)
+    st.download_button(
+        "📥 Descargar CSV",
+        tabla.to_csv().encode('utf-8'),
+        file_name=f"embudo_{desgloses[desglose]}.csv",
+        mime="text/csv"
+    )
+    
+    # Tiempo en cada etapa
+    st.write("### ⏱️ Días en cada etapa")
+    if embudo['tiempos'].empty:
+        st.info("📝 No hay fechas suficientes para medir el tiempo en las etapas")
+    else:
+        st.dataframe(embudo['tiempos'], use_container_width=True)
+        st.write("**Personas por rango de días:**")
+        st.dataframe(embudo['rangos'], use_container_width=True)
+
+@st.cache_data(ttl=300)
+def calcular_posibles_duplicados(df, umbral_similitud):
+    """Pasada por lotes de detección de duplicados (cacheada 5 minutos)"""
+    return duplicados40.detectar_duplicados(df, umbral_similitud=umbral_similitud)
+
+def mostrar_posibles_duplicados():
+    """Personas registradas más de una vez (mismo correo, teléfono o nombre)"""
+    st.subheader("🔁 Posibles Duplicados")
+    
+    datasets = {
+        'Inscritos': df_inscritos,
+        'Estudiantes': df_estudiantes,
+        'Egresados': df_egresados
+    }
+    col1, col2 = st.columns(2)
+    with col1:
+        nombre_dataset = st.selectbox("Conjunto de datos", list(datasets.keys()))
+    with col2:
+        umbral = st.slider("Similitud mínima de nombres", 0.80, 1.0, 0.90, 0.01)
+    
+    df = datasets[nombre_dataset]
+    if df.empty:
+        st.info(f"No hay registros de {nombre_dataset.lower()}")
+        return
     
-    if not df_inscritos.empty and 'documentos_subidos' in df_inscritos.columns:
-        docs_inscritos = df_inscritos['documentos_subidos'].apply(
-            lambda x: len(str(x).split(';')) if pd.notna(x) and str(x).strip() != '' else 0
-        ).sum()
-        total_documentos += docs_inscritos
-        st.write(f"- **Inscritos:** {docs_inscritos} documentos")
+    pares = calcular_posibles_duplicados(df, umbral)
     
-    if not df_estudiantes.empty and 'documentos_subidos' in df_estudiantes.columns:
-        docs_estudiantes = df_estudiantes['documentos_subidos'].apply(
-            lambda x: len(str(x).split(';')) if pd.notna(x) and str(x).strip() != '' else 0
-        ).sum()
-        total_documentos += docs_estudiantes
-        st.write(f"- **Estudiantes:** {docs_estudiantes} documentos")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Registros revisados", len(df))
+    col2.metric("Grupos de posibles duplicados", pares['grupo'].nunique())
+    col3.metric("Registros involucrados", len(set(pares['matricula_a']) | set(pares['matricula_b'])))
     
-    st.write(f"**Total de documentos en el sistema:** {total_documentos}")
+    if pares.empty:
+        st.success("✅ No se encontraron posibles duplicados")
+    else:
+        st.dataframe(pares, use_container_width=True, hide_index=True)
+        st.download_button(
+            "📥 Descargar CSV",
+            pares.to_csv(index=False).encode('utf-8'),
+            file_name=f"posibles_duplicados_{nombre_dataset.lower()}.csv",
+            mime="text/csv"
+        )
+    
+    # Coincidencias detectadas al recibir solicitudes nuevas
+    if 'posibles_duplicados' in df.columns:
+        marcados = df[df['posibles_duplicados'].fillna('').astype(str).str.strip() != '']
+        if not marcados.empty:
+            st.write("### 📝 Solicitudes marcadas al registrarse")
+            columnas = [c for c in ['matricula', 'nombre_completo', 'email', 'telefono', 'fecha_registro', 'posibles_duplicados'] if c in marcados.columns]
+            st.dataframe(marcados[columnas], use_container_width=True, hide_index=True)
+
+@st.cache_data(ttl=300)
+def calcular_vinculacion(usuarios, inscritos, estudiantes, egresados, contratados):
+    """Pasada vectorizada de vinculación usuarios-registros (cacheada 5 minutos)"""
+    return vinculacion40.calcular_vinculacion(usuarios, {
+        'inscritos': inscritos,
+        'estudiantes': estudiantes,
+        'egresados': egresados,
+        'contratados': contratados
+    })
 
 def verificar_vinculacion_usuarios():
     """Verificar la vinculación entre usuarios y datos académicos"""
     st.subheader("🔍 Verificación de Vinculación de Usuarios")
     
-    if df_usuarios.empty:
+    if df_usuarios.empty or 'usuario' not in df_usuarios.columns:
         st.error("❌ No hay datos de usuarios disponibles")
         return
     
-    # Mostrar usuarios y su información vinculada
+    vinculacion = calcular_vinculacion(df_usuarios, df_inscritos, df_estudiantes, df_egresados, df_contratados)
+    usuarios = vinculacion['usuarios']
+    conteo = usuarios['vinculo'].value_counts()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("✅ Vinculados", int(conteo.get('Vinculado', 0)))
+    col2.metric("⚠️ Sin vínculo", int(conteo.get('Sin vínculo', 0)))
+    col3.metric("🔀 Ambiguos", int(conteo.get('Ambiguo', 0)))
+    col4.metric("📄 Registros huérfanos", len(vinculacion['huerfanos']))
+    
+    st.write("### 📊 Resumen por rol")
+    st.dataframe(vinculacion['resumen'], use_container_width=True)
+    
+    # Usuarios filtrados por estado de vinculación y rol
     st.write("### 👥 Usuarios del Sistema")
+    col1, col2 = st.columns(2)
+    with col1:
+        estados = st.multiselect("Estado de vinculación", vinculacion40.ESTADOS_VINCULO, default=['Sin vínculo', 'Ambiguo'])
+    with col2:
+        roles = st.multiselect("Rol", sorted(usuarios['rol'].unique()))
+    filtrados = usuarios
+    if estados:
+        filtrados = filtrados[filtrados['vinculo'].isin(estados)]
+    if roles:
+        filtrados = filtrados[filtrados['rol'].isin(roles)]
+    st.dataframe(filtrados, use_container_width=True, hide_index=True)
+    st.download_button(
+        "📥 Descargar CSV",
+        filtrados.to_csv(index=False).encode('utf-8'),
+        file_name="vinculacion_usuarios.csv",
+        mime="text/csv"
+    )
     
-    for _, usuario in df_usuarios.iterrows():
-        with st.expander(f"👤 {usuario['usuario']} - Rol: {usuario.get('rol', 'N/A')}"):
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**Información del usuario:**")
-                st.write(f"- Email: {usuario.get('email', 'No disponible')}")
-                st.write(f"- Rol: {usuario.get('rol', 'No disponible')}")
-                st.write(f"- Estado: {usuario.get('estado', 'No disponible')}")
-            
-            with col2:
-                st.write("**Datos vinculados:**")
-                # Buscar en diferentes datasets según el rol
-                rol = usuario.get('rol', '').lower()
-                usuario_id = usuario['usuario']
-                
-                datos_vinculados = False
-                
-                if rol == 'inscrito' and not df_inscritos.empty:
-                    for campo in ['matricula', 'usuario', 'id']:
-                        if campo in df_inscritos.columns:
-                            vinculado = df_inscritos[df_inscritos[campo].astype(str) == usuario_id]
-                            if not vinculado.empty:
-                                st.write(f"✅ Vinculado con inscritos (campo: {campo})")
-                                st.write(f"- Matrícula: {vinculado.iloc[0].get('matricula', 'N/A')}")
-                                st.write(f"- Nombre: {vinculado.iloc[0].get('nombre_completo', 'N/A')}")
-                                datos_vinculados = True
-                                break
-                
-                if rol == 'estudiante' and not df_estudiantes.empty:
-                    for campo in ['matricula', 'usuario', 'id']:
-                        if campo in df_estudiantes.columns:
-                            vinculado = df_estudiantes[df_estudiantes[campo].astype(str) == usuario_id]
-                            if not vinculado.empty:
-                                st.write(f"✅ Vinculado con estudiantes (campo: {campo})")
-                                st.write(f"- Matrícula: {vinculado.iloc[0].get('matricula', 'N/A')}")
-                                st.write(f"- Programa: {vinculado.iloc[0].get('programa', 'N/A')}")
-                                datos_vinculados = True
-                                break
-                
-                if not datos_vinculados:
-                    st.warning("⚠️ No se encontraron datos vinculados")
+    # Detalle de un usuario
+    if not filtrados.empty:
+        usuario_id = st.selectbox("Ver detalle del usuario", filtrados['usuario'].tolist())
+        usuario = filtrados[filtrados['usuario'] == usuario_id].iloc[0]
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Información del usuario:**")
+            st.write(f"- Email: {usuario['email'] or 'No disponible'}")
+            st.write(f"- Rol: {usuario['rol'] or 'No disponible'}")
+            st.write(f"- Estado: {usuario['estado'] or 'No disponible'}")
+        with col2:
+            st.write("**Datos vinculados:**")
+            registros = vinculacion['coincidencias']
+            registros = registros[(registros['usuario'] == usuario_id) & (registros['rol'] == usuario['rol'])]
+            if usuario['vinculo'] == 'No aplica':
+                st.info("ℹ️ El rol no tiene datos académicos vinculados")
+            elif registros.empty:
+                st.warning("⚠️ No se encontraron datos vinculados")
+            else:
+                if len(registros) > 1:
+                    st.warning(f"⚠️ {len(registros)} registros coinciden con este usuario")
+                for _, registro in registros.iterrows():
+                    st.write(f"✅ Vinculado con {registro['dataset']} (campo: {registro['campo']})")
+                    st.write(f"- Matrícula: {registro['matricula'] or 'N/A'}")
+                    st.write(f"- Nombre: {registro['nombre'] or 'N/A'}")
+    
+    # Registros sin usuario
+    if not vinculacion['huerfanos'].empty:
+        with st.expander(f"📄 Registros sin usuario ({len(vinculacion['huerfanos'])})"):
+            st.dataframe(vinculacion['huerfanos'], use_container_width=True, hide_index=True)
 
 # =============================================================================
 # SISTEMA DE LOGIN Y NAVEGACIÓN PRINCIPAL
@@ -2162,6 +2422,30 @@ def mostrar_login():
                 else:
                     st.warning("⚠️ Complete todos los campos")
 
+# =============================================================================
+# ARRANQUE DE LA APLICACIÓN
+# =============================================================================
+
+def iniciar_aplicacion():
+    """Configurar la página, cargar los datos y crear los servicios de la ejecución
+
+    Importar el módulo no abre conexiones: todo el trabajo de red ocurre aquí.
+    """
+    global cargador_remoto, sistema_email, auth, academico, editor, documentos
+    configurar_pagina()
+    cargador_remoto = CargadorRemoto()
+    asignar_datos_globales(cargar_datos_completos())
+    if any(not datos.get(nombre, pd.DataFrame()).empty for nombre in estadisticas40.DATASETS_ESTADISTICAS):
+        # Materializar los conteos de los datasets que aún no los tienen (primera ejecución)
+        obtener_estadisticas().inicializar(datos)
+        # Pasar los documentos de los campos empaquetados al registro (primera ejecución)
+        obtener_registro_documentos().inicializar(datos)
+    sistema_email = SistemaEmail()
+    auth = SistemaAutenticacion()
+    academico = SistemaAcademico()
+    editor = EditorRemoto()
+    documentos = SistemaDocumental()
+
 def main():
     """Función principal de la aplicación"""
     
@@ -2213,4 +2497,5 @@ def main():
             st.info("Roles disponibles: administrador, inscrito, estudiante, egresado, contratado")
 
 if __name__ == "__main__":
+    iniciar_aplicacion()
     main()
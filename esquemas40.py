@@ -0,0 +1,262 @@
+"""Registro central de esquemas de las tablas de roles
+
+Describe las columnas y tipos de inscritos, estudiantes, egresados y
+contratados, y el mapeo de campos entre roles. Lo usan migracion40.py
+(proyecciones de columnas al migrar) y escuela40.py (lectura tipada y
+campos de cada portal).
+"""
+
+import pandas as pd
+
+# Tipos de columna: 'texto', 'entero', 'fecha' (YYYY-MM-DD) y 'fecha_hora' (YYYY-MM-DD HH:MM:SS)
+FORMATOS_FECHA = {
+    'fecha': '%Y-%m-%d',
+    'fecha_hora': '%Y-%m-%d %H:%M:%S'
+}
+
+# =============================================================================
+# ESQUEMAS DE LAS TABLAS DE ROLES
+# =============================================================================
+
+ESQUEMAS = {
+    'inscritos': {
+        'rol': 'inscrito',
+        'columnas': {
+            'matricula': 'texto',
+            'fecha_registro': 'fecha_hora',
+            'nombre_completo': 'texto',
+            'email': 'texto',
+            'telefono': 'texto',
+            'programa_interes': 'texto',
+            'estatus': 'texto',
+            'folio': 'texto',
+            'documentos_subidos': 'entero',
+            'documentos_guardados': 'texto',
+            'fecha_nacimiento': 'fecha',
+            'como_se_entero': 'texto'
+        },
+        'obligatorias': ['matricula', 'nombre_completo', 'email'],
+        'vista': ['matricula', 'nombre_completo', 'programa_interes', 'email', 'telefono',
+                  'fecha_nacimiento', 'fecha_registro', 'folio', 'estatus']
+    },
+    'estudiantes': {
+        'rol': 'estudiante',
+        'columnas': {
+            'matricula': 'texto',
+            'nombre_completo': 'texto',
+            'programa': 'texto',
+            'email': 'texto',
+            'telefono': 'texto',
+            'fecha_nacimiento': 'fecha',
+            'genero': 'texto',
+            'fecha_inscripcion': 'fecha_hora',
+            'estatus': 'texto',
+            'documentos_subidos': 'texto',
+            'fecha_registro': 'fecha_hora',
+            'programa_interes': 'texto',
+            'folio': 'texto',
+            'como_se_entero': 'texto',
+            'fecha_ingreso': 'fecha',
+            'usuario': 'texto',
+            'documentos_guardados': 'texto'
+        },
+        'obligatorias': ['matricula', 'nombre_completo', 'programa'],
+        'vista': ['matricula', 'nombre_completo', 'programa', 'email', 'telefono',
+                  'fecha_nacimiento', 'genero', 'fecha_inscripcion', 'estatus']
+    },
+    'egresados': {
+        'rol': 'egresado',
+        'columnas': {
+            'matricula': 'texto',
+            'nombre_completo': 'texto',
+            'programa_original': 'texto',
+            'fecha_graduacion': 'fecha',
+            'nivel_academico': 'texto',
+            'email': 'texto',
+            'telefono': 'texto',
+            'estado_laboral': 'texto',
+            'fecha_actualizacion': 'fecha',
+            'documentos_subidos': 'texto'
+        },
+        'obligatorias': ['matricula', 'nombre_completo', 'programa_original'],
+        'vista': ['matricula', 'nombre_completo', 'programa_original', 'fecha_graduacion',
+                  'nivel_academico', 'email', 'telefono', 'estado_laboral', 'fecha_actualizacion']
+    },
+    'contratados': {
+        'rol': 'contratado',
+        'columnas': {
+            'matricula': 'texto',
+            'fecha_contratacion': 'fecha',
+            'puesto': 'texto',
+            'departamento': 'texto',
+            'estatus': 'texto',
+            'salario': 'texto',
+            'tipo_contrato': 'texto',
+            'fecha_inicio': 'fecha',
+            'fecha_fin': 'fecha',
+            'documentos_subidos': 'texto'
+        },
+        'obligatorias': ['matricula', 'puesto', 'fecha_contratacion'],
+        'vista': ['matricula', 'fecha_contratacion', 'puesto', 'departamento',
+                  'estatus', 'salario', 'tipo_contrato', 'fecha_inicio', 'fecha_fin']
+    }
+}
+
+# Mapeo de campos entre roles: {(origen, destino): {columna_destino: columna_origen}}
+# Las columnas destino que no aparecen aquí se llenan con los valores de la migración.
+MAPEOS = {
+    ('inscritos', 'estudiantes'): {
+        'nombre_completo': 'nombre_completo',
+        'programa': 'programa_interes',
+        'email': 'email',
+        'telefono': 'telefono',
+        'fecha_nacimiento': 'fecha_nacimiento',
+        'documentos_subidos': 'documentos_subidos',
+        'fecha_registro': 'fecha_registro',
+        'programa_interes': 'programa_interes',
+        'folio': 'folio',
+        'como_se_entero': 'como_se_entero',
+        'documentos_guardados': 'documentos_guardados'
+    },
+    ('estudiantes', 'egresados'): {
+        'nombre_completo': 'nombre_completo',
+        'programa_original': 'programa',
+        'email': 'email',
+        'telefono': 'telefono'
+    },
+    ('egresados', 'contratados'): {}
+}
+
+# Columnas opcionales del origen que se conservan en el destino si existen
+COLUMNAS_CONSERVADAS = {
+    ('inscritos', 'estudiantes'): ['curp', 'direccion', 'ciudad', 'estado', 'codigo_postal', 'nacionalidad']
+}
+
+# =============================================================================
+# CONSULTAS AL REGISTRO
+# =============================================================================
+
+def columnas(tabla):
+    """Columnas del esquema de una tabla, en orden"""
+    return list(ESQUEMAS[tabla]['columnas'])
+
+def campos_vista(tabla):
+    """Campos que muestra el portal del rol correspondiente a la tabla"""
+    return list(ESQUEMAS[tabla]['vista'])
+
+def tipos_lectura(tabla):
+    """dtype para pd.read_csv: las columnas de texto y enteras se leen como str
+
+    Así se conservan los ceros a la izquierda y los conteos no pasan a
+    flotante ("2.0") cuando la columna tiene vacíos; parsear() da los tipos
+    para cálculos.
+    """
+    if tabla not in ESQUEMAS:
+        return None
+    return {columna: str for columna, tipo in ESQUEMAS[tabla]['columnas'].items() if tipo in ('texto', 'entero')}
+
+# =============================================================================
+# NORMALIZACIÓN, TIPOS Y VALIDACIÓN
+# =============================================================================
+
+def normalizar(df, tabla):
+    """Asegurar las columnas del esquema (en su orden) conservando las columnas extra al final"""
+    esquema = columnas(tabla)
+    extras = [c for c in df.columns if c not in esquema]
+    return df.reindex(columns=esquema + extras)
+
+def agregar_registros(df, nuevos, tabla):
+    """Agregar registros nuevos a una tabla alineando ambos DataFrames al esquema"""
+    nuevos = normalizar(nuevos, tabla)
+    if df.empty and len(df.columns) == 0:
+        return nuevos.reset_index(drop=True)
+    df = normalizar(df, tabla)
+    extras = [c for c in nuevos.columns if c not in df.columns]
+    combinado = pd.concat([df.reindex(columns=list(df.columns) + extras), nuevos], ignore_index=True)
+    combinado.attrs = dict(df.attrs)  # conserva la versión remota leída
+    return combinado
+
+def formatear_fechas(serie, tipo):
+    """Convertir una serie de fechas (texto, date o datetime) al formato de almacenamiento"""
+    fechas = pd.to_datetime(serie, errors='coerce', format='mixed')
+    return fechas.dt.strftime(FORMATOS_FECHA[tipo]).where(fechas.notna(), serie)
+
+def parsear(df, tabla):
+    """Copia tipada de una tabla: fechas a datetime, enteros a Int64 y texto a string"""
+    tipado = normalizar(df, tabla).copy()
+    for columna, tipo in ESQUEMAS[tabla]['columnas'].items():
+        if tipo in FORMATOS_FECHA:
+            tipado[columna] = pd.to_datetime(tipado[columna], errors='coerce', format='mixed')
+        elif tipo == 'entero':
+            tipado[columna] = pd.to_numeric(tipado[columna], errors='coerce').astype('Int64')
+        else:
+            tipado[columna] = tipado[columna].astype('string')
+    return tipado
+
+def validar(df, tabla):
+    """Validar una tabla contra su esquema; devuelve una lista de problemas (vacía si es válida)"""
+    problemas = []
+    esquema = ESQUEMAS[tabla]
+
+    faltantes = [c for c in esquema['columnas'] if c not in df.columns]
+    if faltantes:
+        problemas.append(f"{tabla}: faltan columnas {', '.join(faltantes)}")
+
+    for columna in esquema['obligatorias']:
+        if columna in df.columns:
+            vacios = df[columna].isna() | (df[columna].astype(str).str.strip() == '')
+            if vacios.any():
+                problemas.append(f"{tabla}.{columna}: {int(vacios.sum())} registro(s) sin valor")
+
+    if 'matricula' in df.columns:
+        duplicadas = df['matricula'].dropna().astype(str).str.strip().duplicated()
+        if duplicadas.any():
+            problemas.append(f"{tabla}.matricula: {int(duplicadas.sum())} matrícula(s) duplicada(s)")
+
+    for columna, tipo in esquema['columnas'].items():
+        if columna not in df.columns or tipo == 'texto':
+            continue
+        valores = df[columna].dropna()
+        valores = valores[valores.astype(str).str.strip() != '']
+        if tipo in FORMATOS_FECHA:
+            invalidos = pd.to_datetime(valores, errors='coerce', format='mixed').isna()
+        else:
+            invalidos = pd.to_numeric(valores, errors='coerce').isna()
+        if invalidos.any():
+            problemas.append(f"{tabla}.{columna}: {int(invalidos.sum())} valor(es) que no son de tipo {tipo}")
+
+    return problemas
+
+# =============================================================================
+# PROYECCIÓN ENTRE ROLES
+# =============================================================================
+
+def proyectar(df_origen, origen, destino, valores=None):
+    """Construir los registros destino a partir de los registros origen (vectorizado)
+
+    valores: {columna_destino: escalar | lista | Series} con los datos propios de
+    la migración (matrícula nueva, datos del formulario, etc.); tienen prioridad
+    sobre el mapeo. Las columnas de fecha se guardan en el formato del esquema.
+    """
+    valores = valores or {}
+    mapeo = MAPEOS.get((origen, destino), {})
+    tipos = ESQUEMAS[destino]['columnas']
+    resultado = pd.DataFrame(index=df_origen.index)
+
+    for columna in tipos:
+        if columna in valores:
+            valor = valores[columna]
+            resultado[columna] = valor.values if isinstance(valor, pd.Series) else valor
+        elif columna in mapeo and mapeo[columna] in df_origen.columns:
+            resultado[columna] = df_origen[mapeo[columna]]
+        else:
+            resultado[columna] = pd.NA
+
+        if tipos[columna] in FORMATOS_FECHA:
+            resultado[columna] = formatear_fechas(resultado[columna], tipos[columna])
+
+    for columna in COLUMNAS_CONSERVADAS.get((origen, destino), []):
+        if columna in df_origen.columns and df_origen[columna].notna().any():
+            resultado[columna] = df_origen[columna]
+
+    return resultado.reset_index(drop=True)
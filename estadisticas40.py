@@ -0,0 +1,243 @@
+"""Estadísticas materializadas de los datasets (dashboard y reportes)
+
+Los conteos que muestran el dashboard y los reportes (registros por
+dataset y usuarios por rol) se guardan ya calculados
+en datos/estadisticas.json y se actualizan en cada escritura:
+
+- sumar(): altas y bajas de registros sueltos (pre-inscripciones), con
+  costo proporcional a los registros, no al tamaño de las tablas. Cada
+  registro se aplica una sola vez por clave (matrícula o usuario), así que
+  reintentar un alta no la cuenta de nuevo.
+- reemplazar(): datasets que se acaban de reescribir completos (edición,
+  usuarios, migraciones); su resumen sale del mismo DataFrame que se
+  guardó.
+
+Con el motor SQLite ambos recalculan el resumen desde lo almacenado
+(conteo total y agrupado por rol) bajo el candado de las estadísticas: el
+DataFrame de la sesión no incluye lo que otras sesiones escribieron.
+
+Los documentos se cuentan en el registro de documentos (documentos40).
+
+Las pantallas solo leen este archivo pequeño (obtener()), sin importar
+cuántos registros tengan las tablas.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from concurrencia40 import CLAVES_DATASETS
+
+DATASETS_ESTADISTICAS = ['inscritos', 'estudiantes', 'egresados', 'contratados', 'usuarios']
+
+# Claves aplicadas por sumar() que se recuerdan por dataset
+MAX_APLICADOS = 1000
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+# RESÚMENES
+# =============================================================================
+
+def resumen_vacio():
+    return {'registros': 0, 'roles': {}}
+
+def resumen_dataset(df):
+    """Resumen de un DataFrame completo: registros y conteo por rol"""
+    resumen = resumen_vacio()
+    if df is None or df.empty:
+        return resumen
+    resumen['registros'] = int(len(df))
+    if 'rol' in df.columns:
+        resumen['roles'] = {str(rol): int(n) for rol, n in df['rol'].value_counts().items()}
+    return resumen
+
+def resumen_registros(registros):
+    """Resumen de una lista de registros (dicts)"""
+    resumen = resumen_vacio()
+    for registro in registros:
+        resumen['registros'] += 1
+        rol = registro.get('rol')
+        if rol is not None and not pd.isna(rol):
+            resumen['roles'][str(rol)] = resumen['roles'].get(str(rol), 0) + 1
+    return resumen
+
+def resumen_motor(motor, dataset):
+    """Resumen de un dataset almacenado en el motor (COUNT y GROUP BY rol)"""
+    resumen = resumen_vacio()
+    resumen['registros'] = int(motor.contar(dataset))
+    resumen['roles'] = {str(rol): int(n) for rol, n in motor.contar_por(dataset, 'rol').items()}
+    return resumen
+
+def clave_registro(dataset, registro):
+    """Clave con la que sumar() reconoce un registro ya aplicado (None si no tiene)"""
+    columna = CLAVES_DATASETS.get(dataset)
+    valor = registro.get(columna) if columna in registro else None
+    if valor is None or pd.isna(valor):
+        return None
+    return str(valor)
+
+def combinar(resumen, delta, signo=1):
+    """Sumar (signo=1) o restar (signo=-1) un resumen parcial"""
+    combinado = {
+        'registros': max(resumen.get('registros', 0) + signo * delta['registros'], 0),
+        'roles': dict(resumen.get('roles', {}))
+    }
+    for rol, n in delta['roles'].items():
+        combinado['roles'][rol] = combinado['roles'].get(rol, 0) + signo * n
+        if combinado['roles'][rol] <= 0:
+            del combinado['roles'][rol]
+    return combinado
+
+
+# =============================================================================
+# ALMACÉN COMPARTIDO (datos/estadisticas.json)
+# =============================================================================
+
+class EstadisticasMaterializadas:
+    def __init__(self, crear_cargador, ruta, motor=None, vigencia=30):
+        """
+        crear_cargador: función que devuelve un cargador con conectar(),
+        desconectar() y atributo sftp (por ejemplo, la clase CargadorRemoto).
+        motor: MotorDatasets opcional; si se da, los resúmenes se recalculan de sus tablas.
+        vigencia: segundos que se reutiliza la última lectura del archivo.
+        """
+        self.crear_cargador = crear_cargador
+        self.ruta = ruta
+        self.motor = motor
+        self.vigencia = vigencia
+        self.candado = threading.Lock()
+        self.contenido = None
+        self.leido_en = 0
+
+    def leer(self, sftp):
+        contenido = sftp.leer(self.ruta)
+        return json.loads(contenido) if contenido else None
+
+    def obtener(self):
+        """Resúmenes por dataset ({} si todavía no hay estadísticas)"""
+        with self.candado:
+            if self.contenido is not None and time.time() - self.leido_en < self.vigencia:
+                return self.contenido['datasets']
+        cargador = self.crear_cargador()
+        if not cargador.conectar():
+            return self.contenido['datasets'] if self.contenido else {}
+        try:
+            contenido = self.leer(cargador.sftp)
+        except (OSError, ValueError):
+            contenido = None
+        finally:
+            cargador.desconectar()
+        with self.candado:
+            if contenido is not None:
+                self.contenido, self.leido_en = contenido, time.time()
+            return self.contenido['datasets'] if self.contenido else {}
+
+    def actualizar(self, cambios):
+        """Aplicar {dataset: función(resumen_actual) -> resumen_nuevo} bajo el candado remoto
+
+        resumen_actual es None si el dataset aún no tiene estadísticas; la
+        función devuelve None para dejarlo así.
+
+        Devuelve True si se guardó; los errores se registran en el log.
+        """
+        cargador = self.crear_cargador()
+        if not cargador.conectar():
+            log.warning("Sin conexión: no se actualizaron las estadísticas de %s", ', '.join(cambios))
+            return False
+        try:
+            sftp = cargador.sftp
+            sftp.crear_directorios(os.path.dirname(self.ruta))
+            with sftp.candado(self.ruta + '.lock'):
+                contenido = self.leer(sftp) or {'version': 0, 'datasets': {}}
+                for dataset, cambio in cambios.items():
+                    resumen = cambio(contenido['datasets'].get(dataset))
+                    if resumen is not None:
+                        contenido['datasets'][dataset] = resumen
+                contenido['version'] += 1
+                contenido['actualizado_en'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                sftp.escribir(self.ruta, json.dumps(contenido, ensure_ascii=False).encode('utf-8'))
+            with self.candado:
+                self.contenido, self.leido_en = contenido, time.time()
+            return True
+        except Exception:
+            log.exception("No se pudieron actualizar las estadísticas de %s", ', '.join(cambios))
+            return False
+        finally:
+            cargador.desconectar()
+
+    def sumar(self, registros, signo=1):
+        """Registrar altas (signo=1) o bajas (signo=-1) sueltas: {dataset: [registros]}
+
+        Los datasets sin estadísticas previas se omiten: inicializar() los
+        calcula completos desde los datos.
+        """
+        registros = {dataset: lista for dataset, lista in registros.items() if lista}
+        if self.motor is not None:
+            return self.recontar(registros)
+        return self.actualizar({
+            dataset: (lambda actual, dataset=dataset, lista=lista: None if actual is None
+                      else self.aplicar_una_vez(actual, dataset, lista, signo))
+            for dataset, lista in registros.items()
+        })
+
+    @staticmethod
+    def aplicar_una_vez(actual, dataset, registros, signo):
+        """Combinar en `actual` los registros cuya clave no se había aplicado con el mismo signo"""
+        marca, contraria = ('+', '-') if signo > 0 else ('-', '+')
+        aplicados = list(actual.get('aplicados', []))
+        vistos = set(aplicados)
+        nuevos = []
+        for registro_alta in registros:
+            clave = clave_registro(dataset, registro_alta)
+            if clave is not None:
+                if marca + clave in vistos:
+                    continue
+                if contraria + clave in vistos:
+                    aplicados.remove(contraria + clave)
+                vistos.add(marca + clave)
+                aplicados.append(marca + clave)
+            nuevos.append(registro_alta)
+        combinado = combinar(actual, resumen_registros(nuevos), signo)
+        combinado['aplicados'] = aplicados[-MAX_APLICADOS:]
+        return combinado
+
+    def reemplazar(self, dataframes):
+        """Registrar datasets reescritos completos: {dataset: DataFrame guardado}"""
+        if self.motor is not None:
+            return self.recontar(dataframes)
+        resumenes = {dataset: resumen_dataset(df) for dataset, df in dataframes.items() if dataset in DATASETS_ESTADISTICAS}
+        return self.actualizar({
+            dataset: (lambda actual, resumen=resumen: dict(resumen, aplicados=(actual or {}).get('aplicados', [])))
+            for dataset, resumen in resumenes.items()
+        })
+
+    def recontar(self, datasets):
+        """Recalcular desde el motor (bajo el candado) los resúmenes de los datasets dados"""
+        return self.actualizar({
+            dataset: (lambda actual, dataset=dataset: resumen_motor(self.motor, dataset))
+            for dataset in datasets if dataset in DATASETS_ESTADISTICAS
+        })
+
+    def inicializar(self, datos):
+        """Calcular desde los datos cargados las estadísticas de los datasets que aún no las tienen"""
+        existentes = self.obtener()
+        faltantes = [dataset for dataset in DATASETS_ESTADISTICAS if dataset not in existentes]
+        if not faltantes:
+            return False
+        if self.motor is not None:
+            return self.recontar(faltantes)
+        return self.actualizar({
+            dataset: (lambda actual, resumen=resumen_dataset(datos.get(dataset)): resumen if actual is None else actual)
+            for dataset in faltantes
+        })
+
+
+def crear_estadisticas(crear_cargador, base_dir_remoto, motor=None, **opciones):
+    """Estadísticas materializadas en la ruta estándar del servidor"""
+    return EstadisticasMaterializadas(crear_cargador, os.path.join(base_dir_remoto, "datos", "estadisticas.json"), motor, **opciones)
@@ -0,0 +1,86 @@
+"""Gráficas de los reportes, renderizadas una vez por versión de los datos
+
+Cada gráfica se dibuja en una Figure independiente (sin el estado global
+de pyplot), se guarda como PNG o SVG y se descarta. Los bytes quedan en
+una caché LRU cuya llave es el tipo de gráfica, sus opciones y el hash de
+los datos: mientras los datos no cambien, volver a mostrar el reporte no
+dibuja nada, y la memoria queda acotada por el máximo de entradas.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+from importacion_diferida40 import diferir
+
+# Solo al renderizar la primera gráfica
+figura = diferir('matplotlib.figure')
+
+FORMATOS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+
+def hash_datos(serie):
+    """Hash estable de los valores y etiquetas de una Series"""
+    valores = pd.util.hash_pandas_object(serie, index=True).values
+    return hashlib.md5(valores.tobytes()).hexdigest()
+
+
+class ServicioGraficas:
+    def __init__(self, maximo=32, dpi=100):
+        """
+        maximo: gráficas que se conservan (se descartan las menos usadas).
+        """
+        self.maximo = maximo
+        self.dpi = dpi
+        self.candado = threading.Lock()
+        self.cache = OrderedDict()  # llave -> bytes
+        self.aciertos = 0
+        self.renderizadas = 0
+
+    def obtener(self, llave, dibujar, formato='png', tamano=(6.4, 4.8)):
+        """Bytes de la gráfica `llave`; si no está en caché, dibujar(ax) la genera"""
+        llave = (llave, formato, tamano)
+        with self.candado:
+            if llave in self.cache:
+                self.cache.move_to_end(llave)
+                self.aciertos += 1
+                return self.cache[llave]
+
+        fig = figura.Figure(figsize=tamano, dpi=self.dpi)
+        ax = fig.add_subplot()
+        dibujar(ax)
+        fig.tight_layout()
+        buffer = BytesIO()
+        fig.savefig(buffer, format=formato)
+        contenido = buffer.getvalue()
+
+        with self.candado:
+            self.renderizadas += 1
+            self.cache[llave] = contenido
+            self.cache.move_to_end(llave)
+            while len(self.cache) > self.maximo:
+                self.cache.popitem(last=False)
+        return contenido
+
+    def barras(self, serie, titulo='', etiqueta_y='', color='skyblue', formato='png'):
+        """Gráfica de barras de una Series (etiquetas del índice rotadas 45°)"""
+        def dibujar(ax):
+            serie.plot(kind='bar', ax=ax, color=color)
+            ax.set_title(titulo)
+            ax.set_ylabel(etiqueta_y)
+            ax.tick_params(axis='x', labelrotation=45)
+
+        return self.obtener(('barras', hash_datos(serie), titulo, etiqueta_y, color), dibujar, formato)
+
+    def estado(self):
+        """Entradas, bytes en caché, aciertos y gráficas renderizadas"""
+        with self.candado:
+            return {
+                'entradas': len(self.cache),
+                'bytes': sum(len(contenido) for contenido in self.cache.values()),
+                'aciertos': self.aciertos,
+                'renderizadas': self.renderizadas
+            }
@@ -0,0 +1,149 @@
+"""Importación diferida de módulos pesados y perfil de tiempos de importación
+
+    plt = diferir('matplotlib.pyplot')
+
+crea un sustituto que importa el módulo real la primera vez que se usa
+uno de sus atributos (plt.subplots, ...). Así el arranque de la página de
+login y las sesiones que no grafican no pagan la carga de matplotlib. El
+tiempo de cada importación diferida queda registrado en
+importaciones_realizadas().
+
+Reporte de arranque (importa el módulo en un proceso aparte con
+python -X importtime):
+
+    python importacion_diferida40.py escuela40 --top 25
+"""
+
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+_candado = threading.Lock()
+_importaciones = {}  # módulo -> segundos que tomó su primera importación diferida
+
+
+class ModuloDiferido:
+    def __init__(self, nombre):
+        object.__setattr__(self, '_nombre', nombre)
+        object.__setattr__(self, '_modulo', None)
+
+    def _cargar(self):
+        modulo = object.__getattribute__(self, '_modulo')
+        if modulo is None:
+            nombre = object.__getattribute__(self, '_nombre')
+            with _candado:
+                modulo = object.__getattribute__(self, '_modulo')
+                if modulo is None:
+                    inicio = time.perf_counter()
+                    modulo = importlib.import_module(nombre)
+                    _importaciones.setdefault(nombre, time.perf_counter() - inicio)
+                    object.__setattr__(self, '_modulo', modulo)
+        return modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._cargar(), atributo)
+
+    def __setattr__(self, atributo, valor):
+        setattr(self._cargar(), atributo, valor)
+
+    def __dir__(self):
+        return dir(self._cargar())
+
+    def __repr__(self):
+        nombre = object.__getattribute__(self, '_nombre')
+        estado = 'cargado' if object.__getattribute__(self, '_modulo') is not None else 'sin cargar'
+        return f"<módulo diferido {nombre} ({estado})>"
+
+
+def diferir(nombre):
+    """Sustituto de `import nombre` que importa el módulo en su primer uso"""
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    return ModuloDiferido(nombre)
+
+
+def importaciones_realizadas():
+    """Importaciones diferidas que ya ocurrieron en este proceso: {módulo: segundos}"""
+    with _candado:
+        return dict(_importaciones)
+
+
+# =============================================================================
+# PERFIL DE IMPORTACIÓN (python -X importtime)
+# =============================================================================
+
+def perfil_importacion(modulo, directorio=None, python=None):
+    """Importar `modulo` en un proceso aparte y devolver sus tiempos de importación
+
+    Devuelve una lista de dicts {modulo, propio_ms, acumulado_ms, nivel}
+    en el orden del reporte de Python: cada módulo aparece después de lo
+    que importa y el módulo pedido tiene nivel 0.
+    """
+    entorno = dict(os.environ, PYTHONWARNINGS='ignore')
+    proceso = subprocess.run(
+        [python or sys.executable, '-X', 'importtime', '-c', f"import {modulo}"],
+        cwd=directorio or os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, env=entorno
+    )
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        try:
+            propio, acumulado, nombre = linea[len('import time:'):].split('|')
+            filas.append({
+                'modulo': nombre.strip(),
+                'propio_ms': int(propio) / 1000,
+                'acumulado_ms': int(acumulado) / 1000,
+                'nivel': (len(nombre) - len(nombre.lstrip()) - 1) // 2
+            })
+        except ValueError:
+            continue
+    if proceso.returncode != 0 and not filas:
+        raise ImportError(proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else modulo)
+    return filas
+
+
+def resumen_perfil(filas, modulo, top=20):
+    """Texto con el tiempo de importación de `modulo` y sus importaciones directas más costosas"""
+    objetivo = next((fila for fila in filas if fila['nivel'] == 0 and fila['modulo'] == modulo), None)
+    if objetivo is None:
+        return f"{modulo} no aparece en el perfil de importación"
+
+    # Las importaciones directas del módulo aparecen antes que él con nivel 1
+    posicion = filas.index(objetivo)
+    inicio = posicion
+    while inicio > 0 and filas[inicio - 1]['nivel'] > 0:
+        inicio -= 1
+    directas = [fila for fila in filas[inicio:posicion] if fila['nivel'] == 1]
+
+    total = objetivo['acumulado_ms']
+    lineas = [f"Importar {modulo}: {total:.0f} ms ({posicion - inicio + 1} módulos)", ""]
+    lineas.append(f"{'acumulado ms':>12}  {'%':>5}  módulo")
+    for fila in sorted(directas, key=lambda f: f['acumulado_ms'], reverse=True)[:top]:
+        porcentaje = 100 * fila['acumulado_ms'] / total if total else 0
+        lineas.append(f"{fila['acumulado_ms']:>12.1f}  {porcentaje:>5.1f}  {fila['modulo']}")
+    return "\n".join(lineas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de tiempos de importación de un módulo")
+    parser.add_argument('modulo', nargs='?', default='escuela40', help="Módulo a importar (por omisión escuela40)")
+    parser.add_argument('--top', type=int, default=20, help="Cantidad de módulos a mostrar")
+    args = parser.parse_args(argv)
+
+    try:
+        filas = perfil_importacion(args.modulo)
+    except ImportError as e:
+        print(f"No se pudo importar {args.modulo}: {e}", file=sys.stderr)
+        return 1
+    print(resumen_perfil(filas, args.modulo, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
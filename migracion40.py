@@ -7,21 +7,33 @@ from datetime import datetime, timedelta
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import paramiko
-from io import StringIO, BytesIO
+from io import BytesIO
 import time
 import hashlib
+import re
+import queue
 import base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configuración de página
-st.set_page_config(
-    page_title="Sistema Escuela Enfermería - Modo Migración",
-    page_icon="🔄",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+import almacenamiento40
+import esquemas40
+import altas40
+import concurrencia40
+import motor_sqlite40
+import estadisticas40
+import documentos40
+import secuencias40
+
+def configurar_pagina():
+    """Configuración de página (primera llamada a Streamlit de cada ejecución)"""
+    st.set_page_config(
+        page_title="Sistema Escuela Enfermería - Modo Migración",
+        page_icon="🔄",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
 # =============================================================================
 # SISTEMA DE CARGA REMOTA VIA SSH
@@ -29,41 +41,28 @@ st.set_page_config(
 
 class CargadorRemoto:
     def __init__(self):
-        self.ssh = None
-        self.sftp = None
+        self.sftp = None  # almacenamiento abierto (interfaz compatible con SFTP)
         
-    def conectar(self):
-        """Establecer conexión SSH con el servidor remoto"""
+    def conectar(self, mostrar_errores=True):
+        """Abrir el almacenamiento configurado en secrets.toml (SFTP, local o SQLite)"""
         try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            # Cargar credenciales desde secrets de Streamlit
-            self.ssh.connect(
-                hostname=st.secrets["remote_host"],
-                port=st.secrets["remote_port"],
-                username=st.secrets["remote_user"],
-                password=st.secrets["remote_password"],
-                timeout=30
-            )
-            self.sftp = self.ssh.open_sftp()
+            self.sftp = almacenamiento40.abrir_almacenamiento(st.secrets)
             return True
         except Exception as e:
-            st.error(f"❌ Error de conexión SSH: {e}")
+            if mostrar_errores:
+                st.error(f"❌ Error de conexión al almacenamiento: {e}")
             return False
     
     def desconectar(self):
-        """Cerrar conexión SSH"""
+        """Cerrar el almacenamiento"""
         try:
             if self.sftp:
                 self.sftp.close()
-            if self.ssh:
-                self.ssh.close()
         except:
             pass
     
-    def cargar_csv_remoto(self, ruta_remota):
-        """Cargar archivo CSV desde el servidor remoto"""
+    def cargar_csv_remoto(self, ruta_remota, tipos=None):
+        """Cargar archivo CSV desde el servidor remoto (tipos: dtype por columna, opcional)"""
         try:
             if not self.conectar():
                 return pd.DataFrame()
@@ -75,13 +74,11 @@ class CargadorRemoto:
                 st.warning(f"📁 Archivo remoto no encontrado: {os.path.basename(ruta_remota)}")
                 return pd.DataFrame()
             
-            # Leer archivo remoto
+            # Leer archivo remoto y registrar su versión para guardados concurrentes
             with self.sftp.file(ruta_remota, 'r') as archivo_remoto:
-                try:
-                    df = pd.read_csv(archivo_remoto, encoding='utf-8')
-                except UnicodeDecodeError:
-                    archivo_remoto.seek(0)
-                    df = pd.read_csv(archivo_remoto, encoding='latin-1')
+                contenido = archivo_remoto.read()
+            df = concurrencia40.leer_csv_bytes(contenido, tipos)
+            obtener_guardado_optimista().registrar_lectura(ruta_remota, contenido, df)
                 
             return df
             
@@ -107,14 +104,523 @@ class CargadorRemoto:
         
         datos_cargados = {}
         
+        motor = obtener_motor_datasets()
+        if motor is not None:
+            # Con el motor SQLite las altas ya están en sus tablas
+            for nombre in rutas_remotas:
+                datos_cargados[nombre] = motor.leer(nombre, esquemas40.tipos_lectura(nombre))
+            return datos_cargados
+        
         for nombre, ruta_remota in rutas_remotas.items():
-            datos_cargados[nombre] = self.cargar_csv_remoto(ruta_remota)
+            datos_cargados[nombre] = self.cargar_csv_remoto(ruta_remota, esquemas40.tipos_lectura(nombre))
+        
+        # Combinar las altas de aspirantes que aún no se compactan en los CSV base
+        try:
+            obtener_registro_altas().fusionar_lectura(datos_cargados)
+        except Exception as e:
+            st.warning(f"⚠️ No se pudieron leer las altas recientes: {e}")
         
         return datos_cargados
 
 # Instanciar el cargador remoto
 cargador_remoto = CargadorRemoto()
 
+@st.cache_resource
+def obtener_registro_altas():
+    """Registro de altas compartido por el proceso (conserva las claves ya leídas)"""
+    return altas40.crear_registro_altas(CargadorRemoto, st.secrets["remote_dir"])
+
+@st.cache_resource
+def obtener_guardado_optimista():
+    """Versiones leídas de los CSV remotos, para fusionar escrituras concurrentes"""
+    return concurrencia40.GuardadoOptimista(CargadorRemoto)
+
+@st.cache_resource
+def obtener_estadisticas():
+    """Conteos materializados del dashboard y los reportes (datos/estadisticas.json)"""
+    return estadisticas40.crear_estadisticas(CargadorRemoto, st.secrets["remote_dir"], obtener_motor_datasets())
+
+@st.cache_resource
+def obtener_motor_datasets():
+    """Motor SQLite de los datasets (None si no se configuró datasets_db)"""
+    ruta_db = st.secrets.get("datasets_db")
+    return motor_sqlite40.MotorDatasets(ruta_db) if ruta_db else None
+
+@st.cache_resource
+def obtener_registro_documentos():
+    """Registro de documentos (un renglón por documento) compartido por el proceso"""
+    return documentos40.crear_registro_documentos(CargadorRemoto, st.secrets["remote_dir"], obtener_motor_datasets())
+
+# =============================================================================
+# MOTOR DE RENOMBRADO DE PDF (ÍNDICE + CANALES SFTP EN PARALELO)
+# =============================================================================
+
+# Matrícula seguida de '_' dentro del nombre de un archivo (MAT-INS12345_...)
+PATRON_MATRICULA_ARCHIVO = re.compile(r'(MAT-[A-Z]*\d+)_')
+
+class IndiceArchivos:
+    def __init__(self, archivos):
+        self.archivos = set(archivos)
+        self.por_matricula = {}
+        for archivo in self.archivos:
+            self.indexar(archivo)
+
+    def indexar(self, archivo):
+        """Agregar un PDF al índice por cada matrícula que aparezca en su nombre"""
+        if not archivo.lower().endswith('.pdf'):
+            return
+        for matricula in set(PATRON_MATRICULA_ARCHIVO.findall(archivo)):
+            self.por_matricula.setdefault(matricula, set()).add(archivo)
+
+    def archivos_de(self, matricula):
+        """PDF cuyo nombre contiene la matrícula seguida de '_'"""
+        if PATRON_MATRICULA_ARCHIVO.fullmatch(matricula + '_'):
+            return sorted(self.por_matricula.get(matricula, ()))
+        # Matrícula con formato no estándar: búsqueda lineal
+        return sorted(a for a in self.archivos if a.lower().endswith('.pdf') and matricula + '_' in a)
+
+    def existe(self, archivo):
+        """Verificar si un archivo está en el índice"""
+        return archivo in self.archivos
+
+def construir_indice_archivos(directorio):
+    """Construir el índice de un directorio remoto con un solo listado; None si no hay conexión"""
+    cargador = CargadorRemoto()
+    if not cargador.conectar(mostrar_errores=False):
+        return None
+    try:
+        return IndiceArchivos(cargador.sftp.listdir(directorio))
+    except FileNotFoundError:
+        return IndiceArchivos([])
+    finally:
+        cargador.desconectar()
+
+class PoolSFTP:
+    def __init__(self, almacenamiento, canales):
+        """Abrir varios canales sobre un mismo almacenamiento (en SFTP, sobre una misma conexión SSH)"""
+        self.canales = queue.Queue()
+        self.abiertos = []
+        for _ in range(max(1, canales)):
+            sftp = almacenamiento.abrir_canal()
+            self.abiertos.append(sftp)
+            self.canales.put(sftp)
+
+    def tomar(self):
+        return self.canales.get()
+
+    def devolver(self, sftp):
+        self.canales.put(sftp)
+
+    def cerrar(self):
+        for sftp in self.abiertos:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+
+class MotorRenombrado:
+    def __init__(self, canales=8):
+        self.canales = canales
+
+    def renombrar_uno(self, pool, ruta_vieja, ruta_nueva):
+        """Renombrar un archivo con un canal del pool; devuelve (estado, detalle)"""
+        sftp = pool.tomar()
+        try:
+            sftp.rename(ruta_vieja, ruta_nueva)
+            return 'renombrado', ""
+        except IOError as e:
+            # Renombrado en una ejecución anterior: el origen ya no existe y el destino sí
+            try:
+                sftp.stat(ruta_nueva)
+                try:
+                    sftp.stat(ruta_vieja)
+                except FileNotFoundError:
+                    return 'omitido', "Ya renombrado"
+                return 'error', "El archivo destino ya existe"
+            except FileNotFoundError:
+                return 'error', str(e)
+        finally:
+            pool.devolver(sftp)
+
+    def ejecutar(self, almacenamiento, renombres):
+        """Renombrar en paralelo una lista de (ruta_vieja, ruta_nueva)
+
+        Devuelve un reporte {'renombrados', 'omitidos', 'errores', 'duracion'}
+        con listas de (archivo, nuevo_nombre[, detalle]).
+        """
+        inicio = time.time()
+        reporte = {'renombrados': [], 'omitidos': [], 'errores': [], 'duracion': 0.0}
+        if not renombres:
+            return reporte
+
+        pool = PoolSFTP(almacenamiento, min(self.canales, len(renombres)))
+        try:
+            with ThreadPoolExecutor(max_workers=len(pool.abiertos)) as ejecutor:
+                futuros = {
+                    ejecutor.submit(self.renombrar_uno, pool, ruta_vieja, ruta_nueva): (ruta_vieja, ruta_nueva)
+                    for ruta_vieja, ruta_nueva in renombres
+                }
+                for futuro in as_completed(futuros):
+                    ruta_vieja, ruta_nueva = futuros[futuro]
+                    archivo, nuevo_nombre = os.path.basename(ruta_vieja), os.path.basename(ruta_nueva)
+                    try:
+                        estado, detalle = futuro.result()
+                    except Exception as e:
+                        estado, detalle = 'error', str(e)
+                    if estado == 'renombrado':
+                        reporte['renombrados'].append((archivo, nuevo_nombre))
+                    elif estado == 'omitido':
+                        reporte['omitidos'].append((archivo, nuevo_nombre, detalle))
+                    else:
+                        reporte['errores'].append((archivo, nuevo_nombre, detalle))
+        finally:
+            pool.cerrar()
+
+        reporte['duracion'] = round(time.time() - inicio, 3)
+        return reporte
+
+# Instancia del motor de renombrado
+motor_renombrado = MotorRenombrado()
+
+# =============================================================================
+# DIARIO DE MIGRACIONES (WRITE-AHEAD JOURNAL REMOTO)
+# =============================================================================
+#
+# Una migración confirma sus cambios en tres pasos:
+#   1. Se escribe el diario (estado PLANIFICADO) y se suben los CSV nuevos a
+#      archivos temporales junto a los definitivos.
+#   2. Se marca el diario como PREPARADO: a partir de aquí la migración se
+#      considera confirmada.
+#   3. Se renombran los PDF, se reemplazan los CSV por sus temporales y se
+#      borra el diario.
+# Si el proceso se interrumpe, al cargar los datos se revierten los diarios
+# PLANIFICADOS (se borran los temporales) y se reanudan los PREPARADOS.
+# Solo se recuperan los diarios (y las tareas pendientes del motor) sin
+# escribir desde hace más de `vigencia` segundos: los más recientes pueden
+# pertenecer a una sesión que sigue trabajando. La sesión dueña vuelve a verificar su diario antes del punto
+# de confirmación.
+
+class DiarioMigraciones:
+    def __init__(self, vigencia=15 * 60):
+        self.directorio = os.path.join(st.secrets["remote_dir"], "datos", "journal")
+        self.vigencia = vigencia
+
+    def antiguedad(self, entrada):
+        """Segundos desde la última escritura de un diario (o desde su creación)"""
+        if 'actualizado' in entrada:
+            return time.time() - entrada['actualizado']
+        try:
+            return time.time() - datetime.strptime(entrada.get('creado', ''), '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            return float('inf')
+
+    def abandonado(self, entrada):
+        """True si el diario lleva más de `vigencia` segundos sin escribirse"""
+        return self.antiguedad(entrada) > self.vigencia
+
+    def ruta_diario(self, id_diario):
+        """Ruta remota del archivo de diario de una migración"""
+        return os.path.join(self.directorio, f"{id_diario}.json")
+
+    def escribir_diario(self, sftp, entrada):
+        """Escribir el diario de forma atómica (temporal + renombrado)"""
+        ruta = self.ruta_diario(entrada['id'])
+        entrada['actualizado'] = time.time()
+        with sftp.file(ruta + '.tmp', 'w') as archivo:
+            archivo.write(json.dumps(entrada, ensure_ascii=False, indent=2))
+        self.reemplazar(sftp, ruta + '.tmp', ruta)
+
+    def reemplazar(self, sftp, origen, destino):
+        """Renombrar sobrescribiendo el destino (posix-rename si el servidor lo soporta)"""
+        try:
+            sftp.posix_rename(origen, destino)
+        except IOError:
+            try:
+                sftp.remove(destino)
+            except FileNotFoundError:
+                pass
+            sftp.rename(origen, destino)
+
+    def existe(self, sftp, ruta):
+        """Verificar si existe una ruta remota"""
+        try:
+            sftp.stat(ruta)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def subir_temporal(self, df, ruta_temporal):
+        """Subir un CSV temporal con una conexión propia (apto para hilos)"""
+        cargador = CargadorRemoto()
+        try:
+            if not cargador.conectar(mostrar_errores=False):
+                return False, "No se pudo conectar al servidor remoto"
+            with cargador.sftp.file(ruta_temporal, 'w') as archivo_remoto:
+                archivo_remoto.write(df.to_csv(index=False, encoding='utf-8'))
+            return True, ""
+        except Exception as e:
+            return False, str(e)
+        finally:
+            cargador.desconectar()
+
+    def confirmar(self, archivos, renombres, descripcion="", opcionales=(), versiones=None):
+        """Confirmar una migración completa a través del diario
+
+        archivos: {nombre_dataset: (DataFrame, ruta_remota)}
+        renombres: lista de (ruta_vieja, ruta_nueva) de archivos PDF
+        opcionales: datasets cuyo fallo de subida no cancela la migración
+        versiones: {nombre_dataset: versión remota con la que se fusionó}; si
+        algún CSV cambió antes del punto de confirmación no se aplica nada
+
+        Devuelve un diccionario con 'exito', 'datasets' ({nombre: (exito, error)}),
+        'renombrados', 'errores_renombrado', 'reporte_renombrado' y 'cambiados'
+        (datasets cuya versión remota ya no coincidía).
+        """
+        resultado = {'exito': False, 'datasets': {}, 'renombrados': 0, 'errores_renombrado': [],
+                     'reporte_renombrado': None, 'cambiados': []}
+        cargador = CargadorRemoto()
+        if not cargador.conectar(mostrar_errores=False):
+            resultado['datasets'] = {nombre: (False, "No se pudo conectar al servidor remoto") for nombre in archivos}
+            return resultado
+
+        try:
+            sftp = cargador.sftp
+            if not self.existe(sftp, self.directorio):
+                sftp.mkdir(self.directorio)
+
+            id_diario = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}"
+            entrada = {
+                'id': id_diario,
+                'creado': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'descripcion': descripcion,
+                'estado': 'PLANIFICADO',
+                'archivos': [
+                    {'nombre': nombre, 'temporal': f"{ruta}.{id_diario}.tmp", 'final': ruta}
+                    for nombre, (df, ruta) in archivos.items()
+                ],
+                'renombres': [list(par) for par in renombres]
+            }
+
+            # 1. Registrar el plan y subir los CSV temporales en paralelo
+            self.escribir_diario(sftp, entrada)
+            if entrada['archivos']:
+                with ThreadPoolExecutor(max_workers=len(entrada['archivos'])) as ejecutor:
+                    futuros = {
+                        ejecutor.submit(self.subir_temporal, archivos[item['nombre']][0], item['temporal']): item['nombre']
+                        for item in entrada['archivos']
+                    }
+                    for futuro in as_completed(futuros):
+                        resultado['datasets'][futuros[futuro]] = futuro.result()
+
+            fallidos = [n for n, (exito, _) in resultado['datasets'].items() if not exito]
+            if any(nombre not in opcionales for nombre in fallidos):
+                # Revertir: nada definitivo se ha modificado todavía
+                self.descartar(sftp, entrada)
+                return resultado
+
+            # Los opcionales fallidos simplemente quedan fuera de la migración
+            for item in [i for i in entrada['archivos'] if i['nombre'] in fallidos]:
+                self.borrar_si_existe(sftp, item['temporal'])
+            entrada['archivos'] = [i for i in entrada['archivos'] if i['nombre'] not in fallidos]
+
+            # 2. Punto de confirmación (si otra sesión descartó el diario, la migración no se aplica)
+            if not self.existe(sftp, self.ruta_diario(id_diario)) or not all(
+                self.existe(sftp, item['temporal']) for item in entrada['archivos']
+            ):
+                resultado['datasets'] = {
+                    nombre: (False, "El diario de la migración fue descartado antes de confirmarse")
+                    for nombre in archivos
+                }
+                self.descartar(sftp, entrada)
+                return resultado
+            # Versión de cada CSV final al confirmar: una reanudación solo lo reemplaza si sigue igual
+            for item in entrada['archivos']:
+                item['version_base'] = concurrencia40.version_contenido(sftp.leer(item['final']))
+            resultado['cambiados'] = [
+                item['nombre'] for item in entrada['archivos']
+                if item['nombre'] in (versiones or {}) and item['version_base'] != versiones[item['nombre']]
+            ]
+            if resultado['cambiados']:
+                resultado['datasets'] = {
+                    nombre: (False, "El archivo cambió en el servidor durante la migración")
+                    for nombre in resultado['cambiados']
+                }
+                self.descartar(sftp, entrada)
+                return resultado
+            entrada['estado'] = 'PREPARADO'
+            self.escribir_diario(sftp, entrada)
+
+            # 3. Aplicar renombrados y reemplazos
+            reporte = self.aplicar(cargador, entrada)
+            resultado.update(
+                exito=True,
+                renombrados=len(reporte['renombrados']) + len(reporte['omitidos']),
+                errores_renombrado=[(archivo, detalle) for archivo, _, detalle in reporte['errores']],
+                reporte_renombrado=reporte
+            )
+            return resultado
+        finally:
+            cargador.desconectar()
+
+    def confirmar_en_motor(self, motor, dataframes, renombres, descripcion=""):
+        """Confirmar una migración con el motor SQLite
+
+        Los cambios de los datasets y la lista de renombrados se escriben en
+        una sola transacción; después se renombran los PDF y se cierra la
+        tarea. Si el renombrado se interrumpe, recuperar_pendientes lo
+        reanuda. Devuelve el mismo resultado que confirmar().
+        """
+        resultado = {'exito': False, 'datasets': {}, 'renombrados': 0, 'errores_renombrado': [], 'reporte_renombrado': None}
+        pendiente = {
+            'id': f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(4).hex()}",
+            'creado': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'descripcion': descripcion,
+            'renombres': [list(par) for par in renombres]
+        }
+        try:
+            motor.guardar_varios(dataframes, pendiente=pendiente if renombres else None)
+        except Exception as e:
+            resultado['datasets'] = {nombre: (False, str(e)) for nombre in dataframes}
+            return resultado
+        resultado.update(exito=True, datasets={nombre: (True, "") for nombre in dataframes})
+        if not renombres:
+            return resultado
+
+        cargador = CargadorRemoto()
+        if not cargador.conectar(mostrar_errores=False):
+            resultado['errores_renombrado'] = [("PDF", "No se pudo conectar; el renombrado se reanudará al recargar los datos")]
+            return resultado
+        try:
+            reporte = motor_renombrado.ejecutar(cargador.sftp, [tuple(par) for par in renombres])
+            obtener_registro_documentos().renombrar(renombres)
+            motor.cerrar_pendiente(pendiente['id'])
+            resultado.update(
+                renombrados=len(reporte['renombrados']) + len(reporte['omitidos']),
+                errores_renombrado=[(archivo, detalle) for archivo, _, detalle in reporte['errores']],
+                reporte_renombrado=reporte
+            )
+            return resultado
+        finally:
+            cargador.desconectar()
+
+    def aplicar(self, cargador, entrada, verificar=False):
+        """Aplicar un diario PREPARADO; es idempotente para poder reanudarlo
+
+        Con verificar (al reanudar el diario de otra sesión) cada CSV se
+        reemplaza bajo su candado y solo si sigue en la versión con la que se
+        confirmó; si otra sesión lo guardó después, su temporal se descarta.
+        Devuelve el reporte del motor de renombrado con 'descartados' (datasets
+        no reemplazados por haber cambiado).
+        """
+        sftp = cargador.sftp
+        reporte = motor_renombrado.ejecutar(cargador.sftp, [tuple(par) for par in entrada.get('renombres', [])])
+        # El registro de documentos sigue a los archivos (idempotente: los nombres viejos ya no aparecen)
+        obtener_registro_documentos().renombrar(entrada.get('renombres', []))
+
+        reporte['descartados'] = []
+        for item in entrada.get('archivos', []):
+            if not self.existe(sftp, item['temporal']):
+                continue
+            if not verificar or 'version_base' not in item:
+                self.reemplazar(sftp, item['temporal'], item['final'])
+                continue
+            ruta_candado = item['final'] + '.lock'
+            latido = secuencias40.tomar_candado(sftp, ruta_candado)
+            try:
+                if concurrencia40.version_contenido(sftp.leer(item['final'])) == item['version_base']:
+                    latido.comprobar()
+                    self.reemplazar(sftp, item['temporal'], item['final'])
+                else:
+                    self.borrar_si_existe(sftp, item['temporal'])
+                    reporte['descartados'].append(item['nombre'])
+            finally:
+                secuencias40.soltar_candado(sftp, ruta_candado, latido)
+
+        self.borrar_si_existe(sftp, self.ruta_diario(entrada['id']))
+        return reporte
+
+    def descartar(self, sftp, entrada):
+        """Revertir un diario no confirmado borrando sus temporales"""
+        for item in entrada.get('archivos', []):
+            self.borrar_si_existe(sftp, item['temporal'])
+        self.borrar_si_existe(sftp, self.ruta_diario(entrada['id']))
+
+    def borrar_si_existe(self, sftp, ruta):
+        """Borrar un archivo remoto ignorando si no existe"""
+        try:
+            sftp.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    def recuperar_pendientes(self):
+        """Reanudar o revertir las migraciones interrumpidas
+
+        Devuelve {'reanudadas': n, 'revertidas': n, 'descartados': [datasets]}
+        o None si no hay conexión. 'descartados' son los CSV de migraciones
+        reanudadas que no se reemplazaron porque cambiaron después de confirmarse.
+        """
+        cargador = CargadorRemoto()
+        if not cargador.conectar(mostrar_errores=False):
+            return None
+
+        resumen = {'reanudadas': 0, 'revertidas': 0, 'descartados': []}
+        try:
+            # Renombrados de migraciones ya confirmadas en el motor SQLite
+            motor = obtener_motor_datasets()
+            if motor is not None:
+                for pendiente in motor.pendientes():
+                    if not self.abandonado(pendiente):
+                        continue  # su sesión puede estar renombrando todavía
+                    motor_renombrado.ejecutar(cargador.sftp, [tuple(par) for par in pendiente['renombres']])
+                    obtener_registro_documentos().renombrar(pendiente['renombres'])
+                    motor.cerrar_pendiente(pendiente['id'])
+                    resumen['reanudadas'] += 1
+
+            sftp = cargador.sftp
+            try:
+                archivos = sftp.listdir(self.directorio)
+            except FileNotFoundError:
+                return resumen
+
+            for archivo in sorted(archivos):
+                ruta = os.path.join(self.directorio, archivo)
+                if archivo.endswith('.json.tmp'):
+                    # Diario que no llegó a escribirse por completo (el id empieza con su fecha)
+                    try:
+                        creado = datetime.strptime(archivo[:15], '%Y%m%d_%H%M%S')
+                    except ValueError:
+                        continue
+                    if time.time() - creado.timestamp() > self.vigencia:
+                        self.borrar_si_existe(sftp, ruta)
+                    continue
+                if not archivo.endswith('.json'):
+                    continue
+
+                try:
+                    with sftp.file(ruta, 'r') as f:
+                        entrada = json.loads(f.read())
+                except FileNotFoundError:
+                    continue  # su sesión lo terminó mientras tanto
+                if not self.abandonado(entrada):
+                    continue  # otra sesión puede estar trabajando con él
+
+                if entrada.get('estado') == 'PREPARADO':
+                    try:
+                        reporte = self.aplicar(cargador, entrada, verificar=True)
+                    except secuencias40.CandadoOcupado:
+                        continue  # un CSV está en uso; se reanuda en la siguiente carga
+                    resumen['descartados'].extend(reporte['descartados'])
+                    resumen['reanudadas'] += 1
+                else:
+                    self.descartar(sftp, entrada)
+                    resumen['revertidas'] += 1
+            return resumen
+        finally:
+            cargador.desconectar()
+
+# Instancia del diario de migraciones (se crea en iniciar_aplicacion)
+diario_migraciones = None
+
 # =============================================================================
 # CARGA DE TODOS LOS DATOS DESDE EL SERVIDOR REMOTO
 # =============================================================================
@@ -123,6 +629,15 @@ cargador_remoto = CargadorRemoto()
 def cargar_datos_completos():
     """Cargar todos los datos desde el servidor remoto"""
     with st.spinner("🌐 Conectando al servidor remoto..."):
+        # Completar o revertir migraciones interrumpidas antes de leer los datos
+        recuperacion = diario_migraciones.recuperar_pendientes()
+        if recuperacion and (recuperacion['reanudadas'] or recuperacion['revertidas']):
+            st.warning(f"♻️ Migraciones interrumpidas: {recuperacion['reanudadas']} completadas, "
+                       f"{recuperacion['revertidas']} revertidas")
+        if recuperacion and recuperacion['descartados']:
+            st.warning(f"⚠️ No se aplicaron los cambios de migración de {', '.join(recuperacion['descartados'])}: "
+                       "el archivo se modificó después de confirmarse la migración")
+        
         datos = cargador_remoto.cargar_todos_los_datos()
         
         # Mostrar estado de carga
@@ -136,16 +651,101 @@ def cargar_datos_completos():
             
         return datos
 
-# Cargar todos los datos al inicio
-datos = cargar_datos_completos()
+@st.cache_data(ttl=300)  # Cache por 5 minutos
+def cargar_archivos_uploads():
+    """Listar los archivos de uploads/ para planificar migraciones sin volver al servidor"""
+    if not cargador_remoto.conectar(mostrar_errores=False):
+        return []
+    try:
+        return cargador_remoto.sftp.listdir(os.path.join(st.secrets["remote_dir"], "uploads"))
+    except FileNotFoundError:
+        return []
+    finally:
+        cargador_remoto.desconectar()
 
-# Asignar a variables globales
-df_inscritos = datos.get('inscritos', pd.DataFrame())
-df_estudiantes = datos.get('estudiantes', pd.DataFrame())
-df_egresados = datos.get('egresados', pd.DataFrame())
-df_contratados = datos.get('contratados', pd.DataFrame())
-df_usuarios = datos.get('usuarios', pd.DataFrame())
-df_bitacora = datos.get('bitacora', pd.DataFrame())
+# Variables globales vacías hasta que iniciar_aplicacion cargue los datos
+datos = {}
+archivos_uploads = []
+df_inscritos = pd.DataFrame()
+df_estudiantes = pd.DataFrame()
+df_egresados = pd.DataFrame()
+df_contratados = pd.DataFrame()
+df_usuarios = pd.DataFrame()
+df_bitacora = pd.DataFrame()
+
+# =============================================================================
+# REGISTRO DE CAMBIOS PENDIENTES (DATASETS MODIFICADOS EN MEMORIA)
+# =============================================================================
+
+# Orden en que se reportan y guardan los datasets
+ORDEN_DATASETS = ['usuarios', 'inscritos', 'estudiantes', 'egresados', 'contratados', 'bitacora']
+
+# Datasets cuyo fallo al guardar no invalida la migración
+DATASETS_OPCIONALES = {'bitacora'}
+
+class RegistroCambios:
+    def __init__(self):
+        self.modificados = set()
+        self.renombres = []
+
+    def marcar(self, *nombres):
+        """Marcar uno o más datasets como modificados en memoria"""
+        self.modificados.update(nombres)
+
+    def pendientes(self):
+        """Obtener los datasets modificados que aún no se han guardado"""
+        return [nombre for nombre in ORDEN_DATASETS if nombre in self.modificados]
+
+    def limpiar(self, nombres):
+        """Quitar de pendientes los datasets ya guardados"""
+        self.modificados.difference_update(nombres)
+
+    def agregar_renombres(self, renombres):
+        """Registrar renombrados de PDF (ruta_vieja, ruta_nueva) que se aplicarán al guardar"""
+        self.renombres.extend(renombres)
+
+    def limpiar_renombres(self):
+        """Olvidar los renombrados ya aplicados"""
+        self.renombres = []
+
+# Instancia del registro de cambios
+cambios_pendientes = RegistroCambios()
+
+def obtener_dataframes_actuales():
+    """Obtener los DataFrames globales vigentes indexados por nombre de dataset"""
+    return {
+        'usuarios': df_usuarios,
+        'inscritos': df_inscritos,
+        'estudiantes': df_estudiantes,
+        'egresados': df_egresados,
+        'contratados': df_contratados,
+        'bitacora': df_bitacora
+    }
+
+def asignar_dataframe(nombre, df):
+    """Reemplazar el DataFrame global de un dataset por una nueva versión"""
+    global df_inscritos, df_estudiantes, df_egresados, df_contratados, df_usuarios, df_bitacora
+    if nombre == 'inscritos':
+        df_inscritos = df
+    elif nombre == 'estudiantes':
+        df_estudiantes = df
+    elif nombre == 'egresados':
+        df_egresados = df
+    elif nombre == 'contratados':
+        df_contratados = df
+    elif nombre == 'usuarios':
+        df_usuarios = df
+    elif nombre == 'bitacora':
+        df_bitacora = df
+
+def restaurar_datos_cargados():
+    """Descartar los cambios en memoria y volver a los datasets tal como se cargaron"""
+    global datos
+    datos = cargar_datos_completos()  # copia de la última carga (st.cache_data)
+    for nombre in ORDEN_DATASETS:
+        asignar_dataframe(nombre, datos.get(nombre, pd.DataFrame()))
+    cambios_pendientes.limpiar(ORDEN_DATASETS)
+    cambios_pendientes.limpiar_renombres()
 
 # =============================================================================
 # SISTEMA DE EDICIÓN Y GUARDADO REMOTO - MEJORADO
@@ -168,50 +768,9 @@ class EditorRemoto:
             'bitacora': os.path.join(BASE_DIR_REMOTO, "datos", "bitacora.csv")
         }
         return rutas.get(tipo_datos, "")
-    
-    def guardar_dataframe_remoto(self, df, ruta_remota):
-        """Guardar DataFrame en el servidor remoto - MEJORADO"""
-        try:
-            if self.cargador.conectar():
-                # Crear directorio si no existe
-                directorio = os.path.dirname(ruta_remota)
-                try:
-                    self.cargador.sftp.stat(directorio)
-                except FileNotFoundError:
-                    # Crear directorio recursivamente
-                    partes = directorio.split('/')
-                    path_actual = ''
-                    for parte in partes:
-                        if parte:
-                            path_actual += '/' + parte
-                            try:
-                                self.cargador.sftp.stat(path_actual)
-                            except FileNotFoundError:
-                                self.cargador.sftp.mkdir(path_actual)
-                
-                # Guardar DataFrame en un buffer en memoria
-                buffer = StringIO()
-                df.to_csv(buffer, index=False, encoding='utf-8')
-                buffer.seek(0)
-                contenido = buffer.getvalue()
-                
-                # Subir al servidor remoto
-                with self.cargador.sftp.file(ruta_remota, 'w') as archivo_remoto:
-                    archivo_remoto.write(contenido)
-                
-                self.cargador.desconectar()
-                st.success(f"✅ Archivo guardado exitosamente: {os.path.basename(ruta_remota)}")
-                return True
-            else:
-                st.error(f"❌ No se pudo conectar para guardar {os.path.basename(ruta_remota)}")
-                return False
-                
-        except Exception as e:
-            st.error(f"❌ Error guardando archivo remoto {os.path.basename(ruta_remota)}: {e}")
-            return False
 
-# Instancia del editor remoto
-editor = EditorRemoto()
+# Instancia del editor remoto (se crea en iniciar_aplicacion)
+editor = None
 
 # =============================================================================
 # SISTEMA DE AUTENTICACIÓN
@@ -329,10 +888,34 @@ class SistemaAutenticacion:
                 df_bitacora = pd.DataFrame([nueva_entrada])
             else:
                 df_bitacora = pd.concat([df_bitacora, pd.DataFrame([nueva_entrada])], ignore_index=True)
+            cambios_pendientes.marcar('bitacora')
                 
         except Exception as e:
             st.error(f"❌ Error registrando en bitácora: {e}")
     
+    def registrar_bitacora_varias(self, entradas):
+        """Registrar varias actividades en bitácora con una sola concatenación"""
+        try:
+            if not entradas:
+                return
+            
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            usuario = self.usuario_actual.get('usuario', 'Sistema') if self.usuario_actual else 'Sistema'
+            nuevas_entradas = pd.DataFrame([
+                {'timestamp': timestamp, 'usuario': usuario, 'accion': accion, 'detalles': detalles, 'ip': 'localhost'}
+                for accion, detalles in entradas
+            ])
+            
+            global df_bitacora
+            if df_bitacora.empty:
+                df_bitacora = nuevas_entradas
+            else:
+                df_bitacora = pd.concat([df_bitacora, nuevas_entradas], ignore_index=True)
+            cambios_pendientes.marcar('bitacora')
+            
+        except Exception as e:
+            st.error(f"❌ Error registrando en bitácora: {e}")
+    
     def cerrar_sesion(self):
         """Cerrar sesión del usuario"""
         try:
@@ -349,21 +932,29 @@ class SistemaAutenticacion:
         except Exception as e:
             st.error(f"❌ Error cerrando sesión: {e}")
 
-# Instancia global del sistema de autenticación
-auth = SistemaAutenticacion()
+# Instancia global del sistema de autenticación (se crea en iniciar_aplicacion)
+auth = None
 
 # =============================================================================
 # SISTEMA DE MIGRACIÓN DE ROLES - COMPLETAMENTE CORREGIDO
 # =============================================================================
 
 class SistemaMigracion:
-    def __init__(self):
-        self.inscritos = df_inscritos
-        self.estudiantes = df_estudiantes
-        self.egresados = df_egresados
-        self.contratados = df_contratados
-        self.usuarios = df_usuarios
-        self.directorio_uploads = os.path.join(st.secrets["remote_dir"], "uploads")
+    def __init__(self, dataframes=None, directorio_uploads=None):
+        """
+        dataframes: {dataset: DataFrame}; por omisión, los DataFrames globales cargados.
+        directorio_uploads: por omisión, uploads/ bajo remote_dir de secrets.toml.
+        """
+        if dataframes is None:
+            dataframes = obtener_dataframes_actuales()
+        self.inscritos = dataframes.get('inscritos', pd.DataFrame())
+        self.estudiantes = dataframes.get('estudiantes', pd.DataFrame())
+        self.egresados = dataframes.get('egresados', pd.DataFrame())
+        self.contratados = dataframes.get('contratados', pd.DataFrame())
+        self.usuarios = dataframes.get('usuarios', pd.DataFrame())
+        self.directorio_uploads = directorio_uploads or os.path.join(st.secrets["remote_dir"], "uploads")
+        self.nombres_pdf_planificados = {}
+        self.ultimo_resultado = None
     
     def obtener_prefijo_rol(self, rol):
         """Obtener prefijo de matrícula según el rol"""
@@ -436,6 +1027,7 @@ class SistemaMigracion:
             
             # Actualizar usuario (matrícula)
             self.usuarios.loc[usuario_idx, 'usuario'] = nueva_matricula
+            cambios_pendientes.marcar('usuarios')
             
             st.success(f"✅ Usuario actualizado exitosamente: {usuario_actual} -> {nueva_matricula} ({nuevo_rol})")
             return True
@@ -444,112 +1036,54 @@ class SistemaMigracion:
             st.error(f"❌ Error actualizando usuario: {e}")
             return False
     
-    def renombrar_archivos_pdf(self, matricula_vieja, matricula_nueva):
-        """Renombrar archivos PDF en el servidor remoto - COMPLETAMENTE CORREGIDA"""
-        try:
-            if not cargador_remoto.conectar():
-                st.error("❌ No se pudo conectar al servidor para renombrar archivos")
-                return 0
-            
-            archivos_renombrados = 0
-            directorio_uploads = os.path.join(st.secrets["remote_dir"], "uploads")
-            
-            try:
-                archivos = cargador_remoto.sftp.listdir(directorio_uploads)
-                st.info(f"📁 Buscando archivos de {matricula_vieja} en {directorio_uploads}")
-                st.info(f"📋 Total de archivos en directorio: {len(archivos)}")
-                
-                for archivo in archivos:
-                    # CORRECCIÓN CRÍTICA: Buscar archivos que contengan EXACTAMENTE la matrícula vieja
-                    # y sean archivos PDF. Usamos una verificación más estricta para evitar 
-                    # que MAT-EGR coincida con MAT-INS accidentalmente
-                    if archivo.lower().endswith('.pdf') and matricula_vieja in archivo:
-                        # VERIFICACIÓN ADICIONAL: Asegurarnos de que es el archivo correcto
-                        # Buscando el patrón donde la matrícula es parte del nombre pero no necesariamente al inicio
-                        # pero evitando falsos positivos
-                        partes_nombre = archivo.split('_')
-                        
-                        # Si la matrícula está al inicio (caso ideal)
-                        if archivo.startswith(matricula_vieja + '_'):
-                            nuevo_nombre = archivo.replace(matricula_vieja, matricula_nueva)
-                            es_valido = True
-                        # Si la matrícula está en medio del nombre (caso menos común)
-                        elif matricula_vieja + '_' in archivo:
-                            nuevo_nombre = archivo.replace(matricula_vieja, matricula_nueva)
-                            es_valido = True
-                        else:
-                            # Si no coincide claramente, saltar este archivo
-                            es_valido = False
-                            st.warning(f"⚠️ Saltando archivo '{archivo}' - patrón de matrícula no claro")
-                        
-                        if es_valido:
-                            ruta_vieja = os.path.join(directorio_uploads, archivo)
-                            ruta_nueva = os.path.join(directorio_uploads, nuevo_nombre)
-                            
-                            st.info(f"🔄 Confirmando renombrado: {archivo} -> {nuevo_nombre}")
-                            
-                            try:
-                                # Verificar que el archivo origen existe
-                                cargador_remoto.sftp.stat(ruta_vieja)
-                                
-                                # Verificar que el archivo destino no existe (para evitar sobreescribir)
-                                try:
-                                    cargador_remoto.sftp.stat(ruta_nueva)
-                                    st.error(f"❌ El archivo destino ya existe: {ruta_nueva}")
-                                    continue
-                                except FileNotFoundError:
-                                    # El archivo destino no existe, proceder con el renombrado
-                                    pass
-                                
-                                # Renombrar archivo
-                                cargador_remoto.sftp.rename(ruta_vieja, ruta_nueva)
-                                archivos_renombrados += 1
-                                st.success(f"✅ Renombrado exitosamente: {archivo} -> {nuevo_nombre}")
-                                
-                            except FileNotFoundError:
-                                st.error(f"❌ Archivo origen no encontrado: {ruta_vieja}")
-                            except Exception as rename_error:
-                                st.error(f"❌ Error renombrando {archivo}: {rename_error}")
-                
-                if archivos_renombrados == 0:
-                    st.warning(f"⚠️ No se encontraron archivos PDF para renombrar con la matrícula: {matricula_vieja}")
-                    
-                    # DEBUG: Mostrar archivos que podrían coincidir
-                    archivos_pdf = [a for a in archivos if a.lower().endswith('.pdf')]
-                    st.info(f"🔍 Archivos PDF en el directorio: {len(archivos_pdf)}")
-                    
-                    archivos_coincidentes = [a for a in archivos_pdf if matricula_vieja in a]
-                    st.info(f"🔍 Archivos PDF que contienen '{matricula_vieja}': {len(archivos_coincidentes)}")
-                    for archivo in archivos_coincidentes:
-                        st.info(f"   - {archivo}")
-                    
-                    # También mostrar archivos con diferentes prefijos para debug
-                    st.info("🔍 Archivos con diferentes prefijos para referencia:")
-                    prefijos = ['MAT-INS', 'MAT-EST', 'MAT-EGR', 'MAT-CON']
-                    for prefijo in prefijos:
-                        archivos_prefijo = [a for a in archivos_pdf if a.startswith(prefijo)]
-                        if archivos_prefijo:
-                            st.info(f"   {prefijo}: {len(archivos_prefijo)} archivos")
-                    
-            except FileNotFoundError:
-                st.warning(f"📁 Directorio de uploads no encontrado: {directorio_uploads}")
-            except Exception as list_error:
-                st.error(f"❌ Error listando archivos: {list_error}")
-            
-            cargador_remoto.desconectar()
-            
-            if archivos_renombrados > 0:
-                st.success(f"🎉 Se renombraron {archivos_renombrados} archivos PDF correctamente")
+    def calcular_renombres(self, indice, matricula_vieja, matricula_nueva):
+        """Calcular los PDF a renombrar para una matrícula sin tocar el servidor
+
+        Usa el índice de archivos: la matrícula vieja debe aparecer seguida de '_'.
+        Devuelve (renombres, conflictos), donde conflictos son los renombrados
+        cuyo nombre destino ya existe.
+        """
+        renombres = []
+        conflictos = []
+        for archivo in indice.archivos_de(matricula_vieja):
+            nuevo_nombre = archivo.replace(matricula_vieja, matricula_nueva)
+            if indice.existe(nuevo_nombre):
+                conflictos.append((archivo, nuevo_nombre))
             else:
-                st.warning("📝 No se renombraron archivos PDF")
-                
-            return archivos_renombrados
-            
-        except Exception as e:
-            st.error(f"❌ Error renombrando archivos: {e}")
-            import traceback
-            st.error(f"Detalles del error: {traceback.format_exc()}")
+                renombres.append((archivo, nuevo_nombre))
+        return renombres, conflictos
+
+    def nombres_pdf_finales(self, indice, renombres, matricula_nueva):
+        """Nombres de los PDF de una persona tal como quedarán tras renombrar"""
+        nombres = sorted({nuevo for _, nuevo in renombres} | set(indice.archivos_de(matricula_nueva)))
+        return ", ".join(nombres) if nombres else "Identificación Oficial"
+
+    def rutas_renombres(self, renombres):
+        """Convertir renombrados (archivo, nuevo_nombre) a rutas completas en uploads/"""
+        return [
+            (os.path.join(self.directorio_uploads, archivo), os.path.join(self.directorio_uploads, nuevo_nombre))
+            for archivo, nuevo_nombre in renombres
+        ]
+
+    def planificar_renombres(self, matricula_vieja, matricula_nueva):
+        """Registrar los PDF a renombrar; se aplican en guardar_cambios junto con los CSV"""
+        indice = construir_indice_archivos(self.directorio_uploads)
+        if indice is None:
+            st.error("❌ No se pudo conectar al servidor para listar archivos")
             return 0
+        
+        renombres, conflictos = self.calcular_renombres(indice, matricula_vieja, matricula_nueva)
+        for archivo, nuevo_nombre in conflictos:
+            st.warning(f"⚠️ El archivo destino ya existe, no se renombrará: {nuevo_nombre}")
+        
+        cambios_pendientes.agregar_renombres(self.rutas_renombres(renombres))
+        self.nombres_pdf_planificados[matricula_nueva] = self.nombres_pdf_finales(indice, renombres, matricula_nueva)
+        
+        if renombres:
+            st.info(f"📁 {len(renombres)} archivos PDF se renombrarán al guardar")
+        else:
+            st.warning(f"⚠️ No se encontraron archivos PDF para renombrar con la matrícula: {matricula_vieja}")
+        return len(renombres)
 
     def obtener_nombres_archivos_pdf(self, matricula):
         """Obtener los nombres de los archivos PDF renombrados para una matrícula - CORREGIDA"""
@@ -598,6 +1132,65 @@ class SistemaMigracion:
             st.error(f"❌ Error obteniendo nombres de archivos PDF: {e}")
             return "Identificación Oficial"
 
+    def construir_registro_estudiante(self, inscrito_data, datos_form):
+        """Construir el registro de estudiante proyectando el inscrito al esquema de estudiantes"""
+        matricula_inscrito = inscrito_data.get('matricula', '')
+        matricula_estudiante = datos_form['matricula_estudiante']
+        
+        valores = {
+            'matricula': matricula_estudiante,
+            'programa': datos_form['programa'],
+            'fecha_nacimiento': datos_form['fecha_nacimiento'],
+            'genero': datos_form['genero'],
+            'fecha_inscripcion': datetime.now(),
+            'estatus': datos_form['estatus'],
+            'documentos_subidos': datos_form['documentos_subidos'],
+            'fecha_registro': datos_form['fecha_registro'],
+            'programa_interes': datos_form['programa_interes'],
+            'folio': datos_form['folio'],
+            'como_se_entero': datos_form['como_se_entero'],
+            'fecha_ingreso': datos_form['fecha_ingreso'],
+            'usuario': matricula_estudiante
+        }
+        
+        # Actualizar documentos_guardados con nueva matrícula
+        documentos_guardados = inscrito_data.get('documentos_guardados')
+        if documentos_guardados is not None and pd.notna(documentos_guardados) and documentos_guardados:
+            valores['documentos_guardados'] = str(documentos_guardados).replace(matricula_inscrito, matricula_estudiante)
+        
+        return esquemas40.proyectar(pd.DataFrame([inscrito_data]), 'inscritos', 'estudiantes', valores).iloc[0].to_dict()
+
+    def construir_registro_egresado(self, estudiante_data, datos_form, nombres_archivos_pdf):
+        """Construir el registro de egresado proyectando el estudiante al esquema de egresados"""
+        valores = {
+            'matricula': datos_form['matricula_egresado'],
+            'programa_original': datos_form['programa_original'],
+            'fecha_graduacion': datos_form['fecha_graduacion'],
+            'nivel_academico': datos_form['nivel_academico'],
+            'email': datos_form['email'],
+            'telefono': datos_form['telefono'],
+            'estado_laboral': datos_form['estado_laboral'],
+            'fecha_actualizacion': datetime.now(),
+            'documentos_subidos': nombres_archivos_pdf  # USAR NOMBRES REALES DE ARCHIVOS PDF
+        }
+        return esquemas40.proyectar(pd.DataFrame([estudiante_data]), 'estudiantes', 'egresados', valores).iloc[0].to_dict()
+
+    def construir_registro_contratado(self, egresado_data, datos_form, nombres_archivos_pdf):
+        """Construir el registro de contratado proyectando el egresado al esquema de contratados"""
+        valores = {
+            'matricula': datos_form['matricula_contratado'],
+            'fecha_contratacion': datos_form['fecha_contratacion'],
+            'puesto': datos_form['puesto'],
+            'departamento': datos_form['departamento'],
+            'estatus': datos_form['estatus'],
+            'salario': datos_form['salario'],
+            'tipo_contrato': datos_form['tipo_contrato'],
+            'fecha_inicio': datos_form['fecha_inicio'],
+            'fecha_fin': datos_form['fecha_fin'],
+            'documentos_subidos': nombres_archivos_pdf  # USAR NOMBRES REALES DE ARCHIVOS PDF
+        }
+        return esquemas40.proyectar(pd.DataFrame([egresado_data]), 'egresados', 'contratados', valores).iloc[0].to_dict()
+
     def eliminar_inscrito_y_crear_estudiante(self, inscrito_data, datos_form):
         """Eliminar inscrito y crear estudiante - COMPLETAMENTE CORREGIDO"""
         try:
@@ -637,63 +1230,16 @@ class SistemaMigracion:
             global df_estudiantes
             
             # Preparar datos del nuevo estudiante - MÁS COMPLETO
-            nuevo_estudiante = {
-                'matricula': matricula_estudiante,
-                'nombre_completo': inscrito_data.get('nombre_completo', ''),
-                'programa': datos_form['programa'],
-                'email': inscrito_data.get('email', ''),
-                'telefono': inscrito_data.get('telefono', ''),
-                'fecha_nacimiento': datos_form['fecha_nacimiento'].strftime('%Y-%m-%d'),
-                'genero': datos_form['genero'],
-                'fecha_inscripcion': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'estatus': datos_form['estatus'],
-                'documentos_subidos': datos_form['documentos_subidos'],
-                'fecha_registro': datos_form['fecha_registro'].strftime('%Y-%m-%d %H:%M:%S'),
-                'programa_interes': datos_form['programa_interes'],
-                'folio': datos_form['folio'],
-                'como_se_entero': datos_form['como_se_entero'],
-                'fecha_ingreso': datos_form['fecha_ingreso'].strftime('%Y-%m-%d'),
-                'usuario': matricula_estudiante
-            }
-            
-            # Mantener otros datos del inscrito que puedan existir
-            campos_adicionales = [
-                'curp', 'direccion', 'ciudad', 'estado', 'codigo_postal', 
-                'nacionalidad', 'documentos_guardados'
-            ]
-            
-            for campo in campos_adicionales:
-                if campo in inscrito_data and pd.notna(inscrito_data[campo]):
-                    nuevo_estudiante[campo] = inscrito_data[campo]
-            
-            # CORREGIR: Actualizar documentos_guardados con nueva matrícula
-            if 'documentos_guardados' in nuevo_estudiante and nuevo_estudiante['documentos_guardados']:
-                documentos_actualizados = str(nuevo_estudiante['documentos_guardados']).replace(
-                    matricula_inscrito, matricula_estudiante
-                )
-                nuevo_estudiante['documentos_guardados'] = documentos_actualizados
+            nuevo_estudiante = self.construir_registro_estudiante(inscrito_data, datos_form)
             
             # Crear DataFrame para el nuevo estudiante
             nuevo_estudiante_df = pd.DataFrame([nuevo_estudiante])
             
-            if df_estudiantes.empty:
-                # Si no hay estudiantes, crear el DataFrame
-                df_estudiantes = nuevo_estudiante_df
-                st.success(f"✅ Registro creado en estudiantes.csv: {matricula_estudiante}")
-            else:
-                # Si ya hay estudiantes, concatenar
-                # Asegurarse de que todas las columnas existan en ambos DataFrames
-                for columna in nuevo_estudiante_df.columns:
-                    if columna not in df_estudiantes.columns:
-                        df_estudiantes[columna] = None
-                
-                for columna in df_estudiantes.columns:
-                    if columna not in nuevo_estudiante_df.columns:
-                        nuevo_estudiante_df[columna] = None
-                
-                # Concatenar el nuevo registro
-                df_estudiantes = pd.concat([df_estudiantes, nuevo_estudiante_df], ignore_index=True)
-                st.success(f"✅ Registro creado en estudiantes.csv: {matricula_estudiante}")
+            # Agregar el registro alineado al esquema de estudiantes (sin reconciliar columnas a mano)
+            df_estudiantes = esquemas40.agregar_registros(df_estudiantes, nuevo_estudiante_df, 'estudiantes')
+            st.success(f"✅ Registro creado en estudiantes.csv: {matricula_estudiante}")
+            
+            cambios_pendientes.marcar('inscritos', 'estudiantes')
             
             # Mostrar confirmación
             st.info(f"📊 Estudiantes antes: {len(df_estudiantes)-1}, después: {len(df_estudiantes)}")
@@ -741,43 +1287,19 @@ class SistemaMigracion:
             global df_egresados
             
             # Obtener los nombres reales de los archivos PDF renombrados
-            nombres_archivos_pdf = self.obtener_nombres_archivos_pdf(matricula_egresado)
+            nombres_archivos_pdf = self.nombres_pdf_planificados.get(matricula_egresado) or self.obtener_nombres_archivos_pdf(matricula_egresado)
             
             # Preparar datos del nuevo egresado según el layout
-            nuevo_egresado = {
-                'matricula': matricula_egresado,
-                'nombre_completo': estudiante_data.get('nombre_completo', ''),
-                'programa_original': datos_form['programa_original'],
-                'fecha_graduacion': datos_form['fecha_graduacion'].strftime('%Y-%m-%d'),
-                'nivel_academico': datos_form['nivel_academico'],
-                'email': datos_form['email'],
-                'telefono': datos_form['telefono'],
-                'estado_laboral': datos_form['estado_laboral'],
-                'fecha_actualizacion': datetime.now().strftime('%Y-%m-%d'),
-                'documentos_subidos': nombres_archivos_pdf  # USAR NOMBRES REALES DE ARCHIVOS PDF
-            }
+            nuevo_egresado = self.construir_registro_egresado(estudiante_data, datos_form, nombres_archivos_pdf)
             
             # Crear DataFrame para el nuevo egresado
             nuevo_egresado_df = pd.DataFrame([nuevo_egresado])
             
-            if df_egresados.empty:
-                # Si no hay egresados, crear el DataFrame
-                df_egresados = nuevo_egresado_df
-                st.success(f"✅ Registro creado en egresados.csv: {matricula_egresado}")
-            else:
-                # Si ya hay egresados, concatenar
-                # Asegurarse de que todas las columnas existan en ambos DataFrames
-                for columna in nuevo_egresado_df.columns:
-                    if columna not in df_egresados.columns:
-                        df_egresados[columna] = None
-                
-                for columna in df_egresados.columns:
-                    if columna not in nuevo_egresado_df.columns:
-                        nuevo_egresado_df[columna] = None
-                
-                # Concatenar el nuevo registro
-                df_egresados = pd.concat([df_egresados, nuevo_egresado_df], ignore_index=True)
-                st.success(f"✅ Registro creado en egresados.csv: {matricula_egresado}")
+            # Agregar el registro alineado al esquema de egresados (sin reconciliar columnas a mano)
+            df_egresados = esquemas40.agregar_registros(df_egresados, nuevo_egresado_df, 'egresados')
+            st.success(f"✅ Registro creado en egresados.csv: {matricula_egresado}")
+            
+            cambios_pendientes.marcar('estudiantes', 'egresados')
             
             # Mostrar confirmación
             st.info(f"📊 Egresados antes: {len(df_egresados)-1}, después: {len(df_egresados)}")
@@ -826,43 +1348,19 @@ class SistemaMigracion:
             global df_contratados
             
             # Obtener los nombres reales de los archivos PDF renombrados
-            nombres_archivos_pdf = self.obtener_nombres_archivos_pdf(matricula_contratado)
+            nombres_archivos_pdf = self.nombres_pdf_planificados.get(matricula_contratado) or self.obtener_nombres_archivos_pdf(matricula_contratado)
             
             # Preparar datos del nuevo contratado según el layout
-            nuevo_contratado = {
-                'matricula': matricula_contratado,
-                'fecha_contratacion': datos_form['fecha_contratacion'].strftime('%Y-%m-%d'),
-                'puesto': datos_form['puesto'],
-                'departamento': datos_form['departamento'],
-                'estatus': datos_form['estatus'],
-                'salario': datos_form['salario'],
-                'tipo_contrato': datos_form['tipo_contrato'],
-                'fecha_inicio': datos_form['fecha_inicio'].strftime('%Y-%m-%d'),
-                'fecha_fin': datos_form['fecha_fin'].strftime('%Y-%m-%d'),
-                'documentos_subidos': nombres_archivos_pdf  # USAR NOMBRES REALES DE ARCHIVOS PDF
-            }
+            nuevo_contratado = self.construir_registro_contratado(egresado_data, datos_form, nombres_archivos_pdf)
             
             # Crear DataFrame para el nuevo contratado
             nuevo_contratado_df = pd.DataFrame([nuevo_contratado])
             
-            if df_contratados.empty:
-                # Si no hay contratados, crear el DataFrame
-                df_contratados = nuevo_contratado_df
-                st.success(f"✅ Registro creado en contratados.csv: {matricula_contratado}")
-            else:
-                # Si ya hay contratados, concatenar
-                # Asegurarse de que todas las columnas existan en ambos DataFrames
-                for columna in nuevo_contratado_df.columns:
-                    if columna not in df_contratados.columns:
-                        df_contratados[columna] = None
-                
-                for columna in df_contratados.columns:
-                    if columna not in nuevo_contratado_df.columns:
-                        nuevo_contratado_df[columna] = None
-                
-                # Concatenar el nuevo registro
-                df_contratados = pd.concat([df_contratados, nuevo_contratado_df], ignore_index=True)
-                st.success(f"✅ Registro creado en contratados.csv: {matricula_contratado}")
+            # Agregar el registro alineado al esquema de contratados (sin reconciliar columnas a mano)
+            df_contratados = esquemas40.agregar_registros(df_contratados, nuevo_contratado_df, 'contratados')
+            st.success(f"✅ Registro creado en contratados.csv: {matricula_contratado}")
+            
+            cambios_pendientes.marcar('egresados', 'contratados')
             
             # Mostrar confirmación
             st.info(f"📊 Contratados antes: {len(df_contratados)-1}, después: {len(df_contratados)}")
@@ -1320,13 +1818,9 @@ class SistemaMigracion:
                 st.error("❌ Error actualizando usuario en la base de datos")
                 return False
             
-            # 2. Renombrar archivos PDF
-            st.subheader("📁 Renombrando archivos PDF en uploads/...")
-            archivos_renombrados = self.renombrar_archivos_pdf(matricula_inscrito, matricula_estudiante)
-            if archivos_renombrados > 0:
-                st.success(f"✅ {archivos_renombrados} archivos PDF renombrados")
-            else:
-                st.warning("⚠️ No se renombraron archivos PDF")
+            # 2. Planificar renombrado de archivos PDF (se aplica al guardar, vía diario)
+            st.subheader("📁 Preparando renombrado de archivos PDF en uploads/...")
+            archivos_renombrados = self.planificar_renombres(matricula_inscrito, matricula_estudiante)
             
             # 3. Eliminar inscrito y crear estudiante
             if not self.eliminar_inscrito_y_crear_estudiante(inscrito_data, datos_form):
@@ -1392,13 +1886,9 @@ class SistemaMigracion:
                 st.error("❌ Error actualizando usuario en la base de datos")
                 return False
             
-            # 2. Renombrar archivos PDF
-            st.subheader("📁 Renombrando archivos PDF en uploads/...")
-            archivos_renombrados = self.renombrar_archivos_pdf(matricula_estudiante, matricula_egresado)
-            if archivos_renombrados > 0:
-                st.success(f"✅ {archivos_renombrados} archivos PDF renombrados")
-            else:
-                st.warning("⚠️ No se renombraron archivos PDF")
+            # 2. Planificar renombrado de archivos PDF (se aplica al guardar, vía diario)
+            st.subheader("📁 Preparando renombrado de archivos PDF en uploads/...")
+            archivos_renombrados = self.planificar_renombres(matricula_estudiante, matricula_egresado)
             
             # 3. Eliminar estudiante y crear egresado
             if not self.eliminar_estudiante_y_crear_egresado(estudiante_data, datos_form):
@@ -1464,13 +1954,9 @@ class SistemaMigracion:
                 st.error("❌ Error actualizando usuario en la base de datos")
                 return False
             
-            # 2. Renombrar archivos PDF
-            st.subheader("📁 Renombrando archivos PDF en uploads/...")
-            archivos_renombrados = self.renombrar_archivos_pdf(matricula_egresado, matricula_contratado)
-            if archivos_renombrados > 0:
-                st.success(f"✅ {archivos_renombrados} archivos PDF renombrados")
-            else:
-                st.warning("⚠️ No se renombraron archivos PDF")
+            # 2. Planificar renombrado de archivos PDF (se aplica al guardar, vía diario)
+            st.subheader("📁 Preparando renombrado de archivos PDF en uploads/...")
+            archivos_renombrados = self.planificar_renombres(matricula_egresado, matricula_contratado)
             
             # 3. Eliminar egresado y crear contratado
             if not self.eliminar_egresado_y_crear_contratado(egresado_data, datos_form):
@@ -1516,12 +2002,89 @@ class SistemaMigracion:
             st.error(f"Detalles del error: {traceback.format_exc()}")
             return False
 
+    def confirmar_en_archivos(self, dataframes, pendientes, renombres):
+        """Confirmar una migración sobre los CSV: altas pendientes, fusión por clave y diario
+
+        El candado de cada dataset se mantiene desde la fusión hasta el
+        reemplazo de su CSV, así que ningún guardado de otra sesión queda
+        entre ambos; si aun así la versión remota cambió, se vuelve a fusionar.
+        """
+        # inscritos/usuarios se reescriben bajo el candado del registro de altas,
+        # incorporando las altas llegadas después de cargar los datos
+        registro_altas = obtener_registro_altas()
+        reescritos = {nombre: dataframes[nombre] for nombre in pendientes if nombre in registro_altas.tablas}
+        sesion_altas = registro_altas.abrir_sesion() if reescritos else None
+        resultado = {'exito': False}
+        try:
+            if sesion_altas:
+                for nombre, df in registro_altas.consumir(sesion_altas, reescritos).items():
+                    dataframes[nombre] = df
+                    asignar_dataframe(nombre, df)
+            
+            guardado = obtener_guardado_optimista()
+            rutas = {nombre: editor.obtener_ruta_archivo(nombre) for nombre in pendientes}
+            locales = {nombre: dataframes[nombre] for nombre in pendientes}
+            cargador = CargadorRemoto()
+            if not cargador.conectar(mostrar_errores=False):
+                resultado['datasets'] = {nombre: (False, "No se pudo conectar al servidor remoto") for nombre in pendientes}
+                return resultado
+            latidos = {}
+            try:
+                # Candados en orden fijo (los mismos que toman los guardados de escuela40)
+                try:
+                    for nombre in sorted(n for n in pendientes if n in concurrencia40.CLAVES_DATASETS):
+                        latidos[nombre] = secuencias40.tomar_candado(
+                            cargador.sftp, rutas[nombre] + '.lock', guardado.espera_maxima
+                        )
+                except secuencias40.CandadoOcupado as e:
+                    resultado['datasets'] = {nombre: (False, str(e)) for nombre in pendientes}
+                    return resultado
+                
+                for _ in range(guardado.reintentos):
+                    # Fusionar los cambios que otras sesiones guardaron después de cargar los datos
+                    versiones = {}
+                    for nombre in latidos:
+                        fusionado, versiones[nombre], conflictos = guardado.preparar(
+                            cargador.sftp, rutas[nombre], locales[nombre],
+                            concurrencia40.CLAVES_DATASETS[nombre], esquemas40.tipos_lectura(nombre)
+                        )
+                        if fusionado is not dataframes[nombre]:
+                            dataframes[nombre] = fusionado
+                            asignar_dataframe(nombre, fusionado)
+                        if conflictos:
+                            st.warning(f"⚠️ {nombre}.csv cambió en el servidor; {conflictos} campo(s) en conflicto "
+                                       f"se guardarán con la versión de la migración")
+                    
+                    # Confirmar datasets modificados y renombrados de PDF a través del diario
+                    for latido in latidos.values():
+                        latido.comprobar()
+                    resultado = diario_migraciones.confirmar(
+                        {nombre: (dataframes[nombre], rutas[nombre]) for nombre in pendientes},
+                        renombres,
+                        descripcion=f"Datasets: {', '.join(pendientes)} | PDF a renombrar: {len(renombres)}",
+                        opcionales=DATASETS_OPCIONALES,
+                        versiones=versiones
+                    )
+                    if not resultado['cambiados']:
+                        break
+            finally:
+                try:
+                    for nombre, latido in latidos.items():
+                        try:
+                            secuencias40.soltar_candado(cargador.sftp, rutas[nombre] + '.lock', latido)
+                        except secuencias40.CandadoPerdido as e:
+                            st.warning(f"⚠️ {e}")
+                finally:
+                    cargador.desconectar()
+        finally:
+            if sesion_altas:
+                registro_altas.cerrar_sesion(sesion_altas, resultado['exito'])
+        return resultado
+
     def guardar_cambios(self):
-        """Guardar todos los cambios en el servidor remoto - MEJORADO"""
+        """Guardar los datasets modificados y renombrar los PDF pendientes como una sola transacción"""
         try:
             with st.spinner("💾 Guardando cambios en el servidor remoto..."):
-                cambios_realizados = 0
-                
                 # Actualizar referencias globales
                 global df_inscritos, df_estudiantes, df_egresados, df_contratados, df_usuarios, df_bitacora
                 self.inscritos = df_inscritos
@@ -1530,59 +2093,475 @@ class SistemaMigracion:
                 self.contratados = df_contratados
                 self.usuarios = df_usuarios
                 
-                # Guardar usuarios
-                if editor.guardar_dataframe_remoto(self.usuarios, editor.obtener_ruta_archivo('usuarios')):
-                    cambios_realizados += 1
-                    st.success("✅ usuarios.csv guardado")
-                else:
-                    st.error("❌ Error guardando usuarios.csv")
+                pendientes = cambios_pendientes.pendientes()
+                renombres = list(cambios_pendientes.renombres)
+                if not pendientes and not renombres:
+                    st.info("ℹ️ No hay cambios pendientes por guardar")
+                    return True
                 
-                # Guardar inscritos
-                if editor.guardar_dataframe_remoto(self.inscritos, editor.obtener_ruta_archivo('inscritos')):
-                    cambios_realizados += 1
-                    st.success("✅ inscritos.csv guardado")
-                else:
-                    st.error("❌ Error guardando inscritos.csv")
+                dataframes = obtener_dataframes_actuales()
+                motor = obtener_motor_datasets()
                 
-                # Guardar estudiantes
-                if editor.guardar_dataframe_remoto(self.estudiantes, editor.obtener_ruta_archivo('estudiantes')):
-                    cambios_realizados += 1
-                    st.success("✅ estudiantes.csv guardado")
+                if motor is not None:
+                    # El motor solo escribe las diferencias: no hace falta fusionar ni pasar por las altas
+                    resultado = diario_migraciones.confirmar_en_motor(
+                        motor, {nombre: dataframes[nombre] for nombre in pendientes}, renombres,
+                        descripcion=f"Datasets: {', '.join(pendientes)} | PDF a renombrar: {len(renombres)}"
+                    )
                 else:
-                    st.error("❌ Error guardando estudiantes.csv")
+                    resultado = self.confirmar_en_archivos(dataframes, pendientes, renombres)
+                self.ultimo_resultado = resultado
+                
+                guardados = []
+                for nombre in pendientes:
+                    exito, error = resultado['datasets'].get(nombre, (False, "Sin resultado"))
+                    if exito and resultado['exito']:
+                        guardados.append(nombre)
+                        st.success(f"✅ {nombre}.csv guardado")
+                    elif nombre in DATASETS_OPCIONALES and resultado['exito']:
+                        st.warning(f"⚠️ No se pudo guardar {nombre}.csv: {error}")
+                    elif not exito:
+                        st.error(f"❌ Error guardando {nombre}.csv: {error}")
+                
+                if not resultado['exito']:
+                    st.error("❌ No se pudieron guardar los cambios en el servidor; la migración se revirtió")
+                    restaurar_datos_cargados()
+                    self.inscritos = df_inscritos
+                    self.estudiantes = df_estudiantes
+                    self.egresados = df_egresados
+                    self.contratados = df_contratados
+                    self.usuarios = df_usuarios
+                    return False
                 
-                # Guardar egresados
-                if editor.guardar_dataframe_remoto(self.egresados, editor.obtener_ruta_archivo('egresados')):
-                    cambios_realizados += 1
-                    st.success("✅ egresados.csv guardado")
-                else:
-                    st.error("❌ Error guardando egresados.csv")
+                cambios_pendientes.limpiar(guardados)
+                cambios_pendientes.limpiar_renombres()
+                if not obtener_estadisticas().reemplazar({nombre: dataframes[nombre] for nombre in guardados}):
+                    st.warning("⚠️ La migración se guardó, pero no se pudieron actualizar las estadísticas del dashboard")
                 
-                # Guardar contratados
-                if editor.guardar_dataframe_remoto(self.contratados, editor.obtener_ruta_archivo('contratados')):
-                    cambios_realizados += 1
-                    st.success("✅ contratados.csv guardado")
-                else:
-                    st.error("❌ Error guardando contratados.csv")
+                if renombres:
+                    st.success(f"✅ {resultado['renombrados']} de {len(renombres)} archivos PDF renombrados")
+                for archivo, error in resultado['errores_renombrado']:
+                    st.warning(f"⚠️ No se pudo renombrar {archivo}: {error}")
                 
-                # Guardar bitácora
-                if editor.guardar_dataframe_remoto(df_bitacora, editor.obtener_ruta_archivo('bitacora')):
-                    cambios_realizados += 1
-                    st.success("✅ bitacora.csv guardado")
-                
-                if cambios_realizados >= 5:  # Al menos usuarios, inscritos, estudiantes, egresados y contratados
-                    st.success("✅ Todos los cambios guardados exitosamente en el servidor")
-                    return True
-                else:
-                    st.error("❌ No se pudieron guardar todos los cambios en el servidor")
-                    return False
+                st.success(f"✅ Cambios guardados exitosamente en el servidor ({len(guardados)} de {len(ORDEN_DATASETS)} archivos)")
+                return True
                 
         except Exception as e:
             st.error(f"❌ Error guardando cambios: {e}")
             return False
 
-# Instancia del sistema de migración
-migrador = SistemaMigracion()
+# Instancia del sistema de migración (se crea en iniciar_aplicacion)
+migrador = None
+
+# =============================================================================
+# SISTEMA DE MIGRACIÓN POR LOTES (COHORTES)
+# =============================================================================
+
+# Transiciones disponibles para la migración por lotes
+TRANSICIONES_MIGRACION = {
+    'inscrito_estudiante': {
+        'etiqueta': "📝 Inscrito → Estudiante",
+        'origen': 'inscritos',
+        'destino': 'estudiantes',
+        'rol_origen': 'inscrito',
+        'rol_destino': 'estudiante',
+        'campo_programa': 'programa_interes',
+        'campo_cohorte': 'fecha_registro',
+        'accion_bitacora': 'MIGRACION_INSCRITO_ESTUDIANTE',
+        # Datos de cada persona que una ejecución sin interfaz debe indicar (no hay valor por defecto)
+        'datos_requeridos': ['genero']
+    },
+    'estudiante_egresado': {
+        'etiqueta': "🎓 Estudiante → Egresado",
+        'origen': 'estudiantes',
+        'destino': 'egresados',
+        'rol_origen': 'estudiante',
+        'rol_destino': 'egresado',
+        'campo_programa': 'programa',
+        'campo_cohorte': 'fecha_inscripcion',
+        'accion_bitacora': 'MIGRACION_ESTUDIANTE_EGRESADO',
+        # Datos de cada persona que una ejecución sin interfaz debe indicar (no hay valor por defecto)
+        'datos_requeridos': ['nivel_academico', 'estado_laboral']
+    },
+    'egresado_contratado': {
+        'etiqueta': "💼 Egresado → Contratado",
+        'origen': 'egresados',
+        'destino': 'contratados',
+        'rol_origen': 'egresado',
+        'rol_destino': 'contratado',
+        'campo_programa': 'programa_original',
+        'campo_cohorte': 'fecha_graduacion',
+        'accion_bitacora': 'MIGRACION_EGRESADO_CONTRATADO',
+        # Datos de cada persona que una ejecución sin interfaz debe indicar (no hay valor por defecto)
+        'datos_requeridos': ['puesto', 'departamento', 'salario', 'tipo_contrato', 'fecha_fin']
+    }
+}
+
+class MigracionPorLotes:
+    def __init__(self, migrador):
+        self.migrador = migrador
+        self.directorio_uploads = migrador.directorio_uploads
+
+    def obtener_origen(self, tipo):
+        """Obtener el DataFrame de origen de una transición"""
+        return obtener_dataframes_actuales()[TRANSICIONES_MIGRACION[tipo]['origen']]
+
+    def calcular_cohortes(self, df, tipo):
+        """Obtener el año de cohorte de cada registro (vectorizado)"""
+        campo = TRANSICIONES_MIGRACION[tipo]['campo_cohorte']
+        if campo not in df.columns:
+            return pd.Series('', index=df.index)
+        return df[campo].astype(str).str.extract(r'(\d{4})', expand=False).fillna('')
+
+    def obtener_cohortes(self, tipo):
+        """Listar las cohortes disponibles en el dataset de origen"""
+        df = self.obtener_origen(tipo)
+        if df.empty:
+            return []
+        return sorted(c for c in self.calcular_cohortes(df, tipo).unique() if c)
+
+    def seleccionar(self, tipo, programas=None, cohortes=None, estatus=None, matriculas=None):
+        """Seleccionar personas del dataset de origen por programa, cohorte, estatus o matrícula"""
+        config = TRANSICIONES_MIGRACION[tipo]
+        df = self.obtener_origen(tipo)
+        if df.empty or 'matricula' not in df.columns:
+            return df
+        
+        mascara = pd.Series(True, index=df.index)
+        if programas and config['campo_programa'] in df.columns:
+            mascara &= df[config['campo_programa']].astype(str).isin(programas)
+        if cohortes:
+            mascara &= self.calcular_cohortes(df, tipo).isin([str(c) for c in cohortes])
+        if estatus and 'estatus' in df.columns:
+            mascara &= df['estatus'].astype(str).isin(estatus)
+        if matriculas:
+            mascara &= df['matricula'].astype(str).str.strip().isin([str(m).strip() for m in matriculas])
+        
+        return df[mascara]
+
+    def valor(self, registro, campo, defecto=''):
+        """Leer un campo del registro tratando vacíos y NaN como ausentes"""
+        valor = registro.get(campo, defecto)
+        if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+            return defecto
+        return valor
+
+    def datos_comunes_por_defecto(self, tipo):
+        """Datos comunes por defecto de cada transición para ejecuciones sin interfaz
+
+        Solo incluye valores neutros (fechas de hoy y estatus inicial); los
+        de TRANSICIONES_MIGRACION[tipo]['datos_requeridos'] deben indicarse.
+        """
+        if tipo == 'inscrito_estudiante':
+            return {'estatus': "ACTIVO", 'fecha_ingreso': datetime.now()}
+        elif tipo == 'estudiante_egresado':
+            return {'fecha_graduacion': datetime.now()}
+        else:
+            return {
+                'fecha_contratacion': datetime.now(),
+                'estatus': "Activo",
+                'fecha_inicio': datetime.now()
+            }
+
+    def proyectar_lote(self, tipo, filas, items, datos_comunes):
+        """Construir los registros destino del lote como una proyección de columnas del esquema"""
+        config = TRANSICIONES_MIGRACION[tipo]
+        nuevas = [item['matricula_nueva'] for item in items]
+        ahora = datetime.now()
+        
+        if tipo == 'inscrito_estudiante':
+            valores = {
+                'matricula': nuevas,
+                'usuario': nuevas,
+                'genero': datos_comunes['genero'],
+                'estatus': datos_comunes['estatus'],
+                'fecha_ingreso': datos_comunes['fecha_ingreso'],
+                'fecha_inscripcion': ahora
+            }
+            if 'documentos_guardados' in filas.columns:
+                # Los nombres de documentos guardados llevan la matrícula anterior
+                valores['documentos_guardados'] = [
+                    str(documentos).replace(item['matricula_anterior'], item['matricula_nueva']) if pd.notna(documentos) else documentos
+                    for documentos, item in zip(filas['documentos_guardados'], items)
+                ]
+        elif tipo == 'estudiante_egresado':
+            valores = {
+                'matricula': nuevas,
+                'fecha_graduacion': datos_comunes['fecha_graduacion'],
+                'nivel_academico': datos_comunes['nivel_academico'],
+                'estado_laboral': datos_comunes['estado_laboral'],
+                'fecha_actualizacion': ahora,
+                'documentos_subidos': [item['nombres_pdf'] for item in items]
+            }
+        else:
+            valores = {columna: datos_comunes[columna] for columna in [
+                'fecha_contratacion', 'puesto', 'departamento', 'estatus',
+                'salario', 'tipo_contrato', 'fecha_inicio', 'fecha_fin'
+            ]}
+            valores.update(matricula=nuevas, documentos_subidos=[item['nombres_pdf'] for item in items])
+        
+        return esquemas40.proyectar(filas, config['origen'], config['destino'], valores)
+
+    def planificar(self, tipo, seleccion, indice, progreso=None):
+        """Calcular matrículas nuevas, usuarios y renombrados de todo el lote
+
+        No modifica datos ni archivos: devuelve una lista con un elemento por persona.
+        """
+        config = TRANSICIONES_MIGRACION[tipo]
+        dataframes = obtener_dataframes_actuales()
+        destino = dataframes[config['destino']]
+        usuarios = dataframes['usuarios']
+        
+        # Índice usuario -> posición, construido una sola vez para todo el lote
+        indice_usuarios = {}
+        if not usuarios.empty and 'usuario' in usuarios.columns:
+            claves = usuarios['usuario'].astype(str).str.strip()
+            unicas = claves[~claves.duplicated()]
+            indice_usuarios = dict(zip(unicas.values, unicas.index))
+        
+        matriculas_ocupadas = set()
+        if not destino.empty and 'matricula' in destino.columns:
+            matriculas_ocupadas = set(destino['matricula'].astype(str).str.strip())
+        
+        plan = []
+        vistas = set()
+        registros = seleccion.to_dict('records')
+        
+        for posicion, (origen_idx, registro) in enumerate(zip(seleccion.index, registros), 1):
+            matricula_vieja = str(self.valor(registro, 'matricula')).strip()
+            item = {
+                'matricula_anterior': matricula_vieja,
+                'matricula_nueva': '',
+                'nombre_completo': self.valor(registro, 'nombre_completo'),
+                'estado': 'PLANIFICADO',
+                'mensaje': '',
+                'archivos_renombrados': 0,
+                'usuario_idx': None,
+                'origen_idx': origen_idx,
+                'nombres_pdf': '',
+                'renombres': []
+            }
+            
+            if not matricula_vieja:
+                item.update(estado='OMITIDO', mensaje="Registro sin matrícula")
+            elif matricula_vieja in vistas:
+                item.update(estado='OMITIDO', mensaje="Matrícula repetida en la selección")
+            else:
+                vistas.add(matricula_vieja)
+                matricula_nueva = self.migrador.generar_nueva_matricula(matricula_vieja, config['rol_destino'])
+                usuario_idx = indice_usuarios.get(matricula_vieja)
+                item['matricula_nueva'] = matricula_nueva
+                
+                if usuario_idx is None:
+                    item.update(estado='OMITIDO', mensaje="Usuario no encontrado en usuarios.csv")
+                elif matricula_nueva in matriculas_ocupadas:
+                    item.update(estado='ERROR', mensaje=f"La matrícula {matricula_nueva} ya existe en {config['destino']}.csv")
+                else:
+                    matriculas_ocupadas.add(matricula_nueva)
+                    renombres, conflictos = self.migrador.calcular_renombres(indice, matricula_vieja, matricula_nueva)
+                    item.update(
+                        usuario_idx=usuario_idx,
+                        nombres_pdf=self.migrador.nombres_pdf_finales(indice, renombres, matricula_nueva),
+                        renombres=renombres
+                    )
+                    if conflictos:
+                        item['mensaje'] = f"{len(conflictos)} archivo(s) ya existen con la nueva matrícula y no se renombrarán"
+            
+            plan.append(item)
+            if progreso:
+                progreso(0.3 * posicion / len(registros), f"Planificando {posicion}/{len(registros)}: {matricula_vieja}")
+        
+        return plan
+
+    def aplicar_en_memoria(self, tipo, items, datos_comunes):
+        """Aplicar el lote a los DataFrames en memoria con operaciones vectorizadas"""
+        config = TRANSICIONES_MIGRACION[tipo]
+        
+        dataframes = obtener_dataframes_actuales()
+        
+        # 1. Usuarios: rol y matrícula nuevos para todo el lote
+        usuarios = dataframes['usuarios']
+        indices = [item['usuario_idx'] for item in items]
+        usuarios.loc[indices, 'rol'] = config['rol_destino']
+        usuarios.loc[indices, 'usuario'] = [item['matricula_nueva'] for item in items]
+        self.migrador.usuarios = usuarios
+        
+        # 2. Destino: proyección de las filas origen al esquema destino y una sola concatenación
+        origen = dataframes[config['origen']]
+        nuevos = self.proyectar_lote(tipo, origen.loc[[item['origen_idx'] for item in items]], items, datos_comunes)
+        destino = esquemas40.agregar_registros(dataframes[config['destino']], nuevos, config['destino'])
+        
+        # 3. Origen: eliminar todas las matrículas migradas de una vez
+        matriculas_viejas = [item['matricula_anterior'] for item in items]
+        origen = origen[~origen['matricula'].astype(str).str.strip().isin(matriculas_viejas)]
+        
+        asignar_dataframe(config['origen'], origen)
+        asignar_dataframe(config['destino'], destino)
+        cambios_pendientes.marcar('usuarios', config['origen'], config['destino'])
+        
+        # 4. PDF: se renombran en la misma transacción del diario que los CSV
+        cambios_pendientes.agregar_renombres(
+            self.migrador.rutas_renombres([par for item in items for par in item['renombres']])
+        )
+
+    def ejecutar(self, tipo, seleccion, datos_comunes, progreso=None):
+        """Migrar un lote completo: planificar, aplicar en memoria y guardar una vez por dataset"""
+        config = TRANSICIONES_MIGRACION[tipo]
+        
+        if progreso:
+            progreso(0.0, "Listando archivos del servidor...")
+        indice = construir_indice_archivos(self.directorio_uploads)
+        if indice is None:
+            return [{
+                'matricula_anterior': str(m), 'matricula_nueva': '', 'nombre_completo': '',
+                'estado': 'ERROR', 'mensaje': "No se pudo conectar al servidor remoto",
+                'archivos_renombrados': 0
+            } for m in seleccion.get('matricula', [])]
+        
+        plan = self.planificar(tipo, seleccion, indice, progreso)
+        items = [item for item in plan if item['estado'] == 'PLANIFICADO']
+        
+        if items:
+            self.aplicar_en_memoria(tipo, items, datos_comunes)
+            
+            auth.registrar_bitacora_varias([
+                (config['accion_bitacora'],
+                 f"Usuario {item['matricula_nueva']} migrado de {config['rol_origen']} a {config['rol_destino']} (lote). "
+                 f"Matrícula: {item['matricula_anterior']} -> {item['matricula_nueva']}")
+                for item in items
+            ])
+            
+            if progreso:
+                progreso(0.85, "Guardando cambios en el servidor...")
+            guardado = self.migrador.guardar_cambios()
+            
+            errores_renombrado = set()
+            if guardado and self.migrador.ultimo_resultado:
+                errores_renombrado = {archivo for archivo, _ in self.migrador.ultimo_resultado['errores_renombrado']}
+            
+            for item in items:
+                if guardado:
+                    item['estado'] = 'OK'
+                    fallidos = sum(1 for archivo, _ in item['renombres'] if archivo in errores_renombrado)
+                    item['archivos_renombrados'] = len(item['renombres']) - fallidos
+                    if fallidos:
+                        item['mensaje'] = f"{fallidos} archivo(s) no se pudieron renombrar"
+                else:
+                    item['estado'] = 'ERROR'
+                    item['mensaje'] = "No se pudieron guardar los cambios en el servidor"
+        
+        if progreso:
+            progreso(1.0, "Migración por lotes finalizada")
+        
+        return self.resumir_resultados(plan)
+
+    def simular(self, tipo, seleccion, datos_comunes):
+        """Planificar un lote sin E/S remota y devolver (plan, cambios)
+
+        Usa los datos en memoria y el listado de uploads/ ya cargado; no
+        modifica DataFrames, archivos ni el registro de cambios pendientes.
+        """
+        plan = self.planificar(tipo, seleccion, IndiceArchivos(archivos_uploads))
+        return plan, self.calcular_cambios(tipo, plan, datos_comunes)
+
+    def calcular_cambios(self, tipo, plan, datos_comunes):
+        """Calcular el conjunto de cambios de un plan: filas, columnas, usuarios, archivos y validación"""
+        config = TRANSICIONES_MIGRACION[tipo]
+        dataframes = obtener_dataframes_actuales()
+        origen = dataframes[config['origen']]
+        destino = dataframes[config['destino']]
+        items = [item for item in plan if item['estado'] == 'PLANIFICADO']
+        
+        nuevos = self.proyectar_lote(tipo, origen.loc[[item['origen_idx'] for item in items]], items, datos_comunes)
+        columnas_nuevas = [columna for columna in nuevos.columns if columna not in destino.columns]
+        validacion = esquemas40.validar(nuevos, config['destino']) if items else []
+        
+        return {
+            'tipo': tipo,
+            'origen': config['origen'],
+            'destino': config['destino'],
+            'filas_origen': (len(origen), len(origen) - len(items)),
+            'filas_destino': (len(destino), len(destino) + len(items)),
+            'columnas_nuevas': columnas_nuevas if len(destino.columns) else [],
+            'personas': [
+                {
+                    'matricula_anterior': item['matricula_anterior'],
+                    'matricula_nueva': item['matricula_nueva'],
+                    'nombre_completo': item['nombre_completo'],
+                    'usuario': (item['matricula_anterior'], item['matricula_nueva'], config['rol_origen'], config['rol_destino']),
+                    'renombres': item['renombres'],
+                    'aviso': item['mensaje']
+                }
+                for item in items
+            ],
+            'omitidos': [
+                (item['matricula_anterior'], item['estado'], item['mensaje'])
+                for item in plan if item['estado'] != 'PLANIFICADO'
+            ],
+            'total_renombres': sum(len(item['renombres']) for item in items),
+            'validacion': validacion
+        }
+
+    def formatear_diff(self, cambios):
+        """Representar el conjunto de cambios como un diff compacto de texto"""
+        config = TRANSICIONES_MIGRACION[cambios['tipo']]
+        lineas = [
+            f"# {config['etiqueta']}: {len(cambios['personas'])} a migrar, {len(cambios['omitidos'])} omitidos, "
+            f"{cambios['total_renombres']} PDF a renombrar",
+            f"# {cambios['origen']}.csv: {cambios['filas_origen'][0]} → {cambios['filas_origen'][1]} filas",
+            f"# {cambios['destino']}.csv: {cambios['filas_destino'][0]} → {cambios['filas_destino'][1]} filas"
+        ]
+        for columna in cambios['columnas_nuevas']:
+            lineas.append(f"+ columna {cambios['destino']}.{columna}")
+        for problema in cambios['validacion']:
+            lineas.append(f"! validación: {problema}")
+        
+        for persona in cambios['personas']:
+            vieja, nueva, rol_origen, rol_destino = persona['usuario']
+            lineas.append("")
+            lineas.append(f"- {cambios['origen']}: {vieja} ({persona['nombre_completo']})")
+            lineas.append(f"+ {cambios['destino']}: {nueva} ({persona['nombre_completo']})")
+            lineas.append(f"~ usuarios: {vieja} → {nueva} ({rol_origen} → {rol_destino})")
+            for archivo, nuevo_nombre in persona['renombres']:
+                lineas.append(f"> uploads: {archivo} → {nuevo_nombre}")
+            if persona['aviso']:
+                lineas.append(f"! {persona['aviso']}")
+        
+        if cambios['omitidos']:
+            lineas.append("")
+        for matricula, estado, mensaje in cambios['omitidos']:
+            lineas.append(f"! {estado} {matricula or '(sin matrícula)'}: {mensaje}")
+        
+        return "\n".join(lineas)
+
+    def resumir_resultados(self, plan):
+        """Reducir el plan a un resultado por persona apto para mostrar o exportar"""
+        columnas = ['matricula_anterior', 'matricula_nueva', 'nombre_completo', 'estado', 'archivos_renombrados', 'mensaje']
+        return [{columna: item.get(columna, '') for columna in columnas} for item in plan]
+
+# Instancia del sistema de migración por lotes (se crea en iniciar_aplicacion)
+migrador_lotes = None
+
+# =============================================================================
+# ARRANQUE DE LA APLICACIÓN
+# =============================================================================
+
+def iniciar_aplicacion():
+    """Configurar la página, cargar los datos y crear los servicios de la ejecución
+
+    Importar el módulo no abre conexiones: todo el trabajo de red ocurre aquí.
+    """
+    global diario_migraciones, datos, archivos_uploads, editor, auth, migrador, migrador_lotes
+    configurar_pagina()
+    diario_migraciones = DiarioMigraciones()
+    datos = cargar_datos_completos()
+    archivos_uploads = cargar_archivos_uploads()
+    for nombre in ORDEN_DATASETS:
+        asignar_dataframe(nombre, datos.get(nombre, pd.DataFrame()))
+    editor = EditorRemoto()
+    auth = SistemaAutenticacion()
+    migrador = SistemaMigracion()
+    migrador_lotes = MigracionPorLotes(migrador)
 
 # =============================================================================
 # INTERFAZ PRINCIPAL DEL MIGRADOR
@@ -1667,7 +2646,8 @@ def mostrar_interfaz_migrador():
         [
             "📝 Inscrito → Estudiante",
             "🎓 Estudiante → Egresado", 
-            "💼 Egresado → Contratado"
+            "💼 Egresado → Contratado",
+            "📦 Migración por Lotes"
         ],
         horizontal=True
     )
@@ -1681,6 +2661,8 @@ def mostrar_interfaz_migrador():
         mostrar_migracion_estudiantes()
     elif tipo_migracion == "💼 Egresado → Contratado":
         mostrar_migracion_egresados()
+    elif tipo_migracion == "📦 Migración por Lotes":
+        mostrar_migracion_por_lotes()
 
 def mostrar_migracion_inscritos():
     """Interfaz para migración de inscritos a estudiantes - CORREGIDA"""
@@ -1954,6 +2936,151 @@ def mostrar_migracion_egresados():
 # EJECUCIÓN PRINCIPAL
 # =============================================================================
 
+def mostrar_migracion_por_lotes():
+    """Interfaz para migrar cohortes completas en una sola operación"""
+    st.header("📦 Migración por Lotes")
+    
+    # Mostrar resultados de la última ejecución si existen
+    if st.session_state.get('resultados_lote'):
+        mostrar_resultados_lote(st.session_state.resultados_lote)
+        return
+    
+    tipo = st.selectbox(
+        "Tipo de migración:",
+        list(TRANSICIONES_MIGRACION.keys()),
+        format_func=lambda clave: TRANSICIONES_MIGRACION[clave]['etiqueta'],
+        key="tipo_migracion_lote"
+    )
+    config = TRANSICIONES_MIGRACION[tipo]
+    df_origen = migrador_lotes.obtener_origen(tipo)
+    
+    if df_origen.empty:
+        st.warning(f"📭 No hay registros en {config['origen']} para migrar")
+        return
+    
+    # Filtros de selección
+    st.subheader("🎯 Seleccionar Cohorte")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        programas_disponibles = []
+        if config['campo_programa'] in df_origen.columns:
+            programas_disponibles = sorted(df_origen[config['campo_programa']].dropna().astype(str).unique())
+        programas = st.multiselect("Programa:", programas_disponibles, key="lote_programas")
+    
+    with col2:
+        cohortes = st.multiselect("Cohorte (año):", migrador_lotes.obtener_cohortes(tipo), key="lote_cohortes")
+    
+    with col3:
+        estatus_disponibles = []
+        if 'estatus' in df_origen.columns:
+            estatus_disponibles = sorted(df_origen['estatus'].dropna().astype(str).unique())
+        estatus = st.multiselect("Estatus:", estatus_disponibles, key="lote_estatus")
+    
+    texto_matriculas = st.text_area(
+        "Matrículas específicas (opcional, una por línea):",
+        key="lote_matriculas"
+    )
+    matriculas = [m.strip() for m in texto_matriculas.replace(',', '\n').splitlines() if m.strip()]
+    
+    seleccion = migrador_lotes.seleccionar(tipo, programas, cohortes, estatus, matriculas)
+    
+    st.info(f"👥 Personas seleccionadas: {len(seleccion)} de {len(df_origen)}")
+    if seleccion.empty:
+        return
+    
+    columnas_vista = [c for c in ['matricula', 'nombre_completo', 'email', config['campo_programa'], config['campo_cohorte'], 'estatus'] if c in seleccion.columns]
+    st.dataframe(seleccion[columnas_vista], width='stretch')
+    
+    # Datos comunes para todo el lote
+    st.subheader("📝 Datos Comunes del Lote")
+    datos_comunes = {}
+    col1, col2 = st.columns(2)
+    
+    if tipo == 'inscrito_estudiante':
+        with col1:
+            datos_comunes['genero'] = st.selectbox("Género*", ["Masculino", "Femenino", "Otro", "Prefiero no decir"], key="lote_genero")
+            datos_comunes['fecha_ingreso'] = st.date_input("Fecha de Ingreso*", value=datetime.now(), key="lote_fecha_ingreso")
+        with col2:
+            datos_comunes['estatus'] = st.selectbox("Estatus*", ["ACTIVO", "INACTIVO", "PENDIENTE"], index=0, key="lote_estatus_nuevo")
+    elif tipo == 'estudiante_egresado':
+        with col1:
+            datos_comunes['fecha_graduacion'] = st.date_input("Fecha de Graduación*", value=datetime.now(), key="lote_fecha_graduacion")
+            datos_comunes['nivel_academico'] = st.selectbox("Nivel Académico*", ["Especialidad", "Maestría", "Doctorado", "Diplomado"], index=0, key="lote_nivel")
+        with col2:
+            datos_comunes['estado_laboral'] = st.selectbox("Estado Laboral*", ["Contratada", "Buscando empleo", "Empleado independiente", "Estudiando", "Otro"], index=0, key="lote_estado_laboral")
+    else:
+        with col1:
+            datos_comunes['fecha_contratacion'] = st.date_input("Fecha de Contratación*", value=datetime.now(), key="lote_fecha_contratacion")
+            datos_comunes['puesto'] = st.text_input("Puesto*", value="Enfermera Especialista en Cardiología", key="lote_puesto")
+            datos_comunes['departamento'] = st.text_input("Departamento*", value="Terapia Intensiva Cardiovascular", key="lote_departamento")
+            datos_comunes['estatus'] = st.selectbox("Estatus*", ["Activo", "Inactivo", "Licencia", "Baja"], index=0, key="lote_estatus_contrato")
+        with col2:
+            datos_comunes['salario'] = st.text_input("Salario*", value="25000 MXN", key="lote_salario")
+            datos_comunes['tipo_contrato'] = st.selectbox("Tipo de Contrato*", ["Tiempo completo", "Medio tiempo", "Por honorarios", "Temporal"], index=0, key="lote_tipo_contrato")
+            datos_comunes['fecha_inicio'] = st.date_input("Fecha Inicio*", value=datetime.now(), key="lote_fecha_inicio")
+            datos_comunes['fecha_fin'] = st.date_input("Fecha Fin*", value=datetime.now() + timedelta(days=365), key="lote_fecha_fin")
+    
+    st.markdown("---")
+    
+    # Vista previa sin tocar el servidor
+    if st.button("🔍 Vista Previa de Cambios (simulación)", key="simular_lote"):
+        plan, cambios = migrador_lotes.simular(tipo, seleccion, datos_comunes)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("👥 A migrar", len(cambios['personas']))
+        with col2:
+            st.metric("⏭️ Omitidos", len(cambios['omitidos']))
+        with col3:
+            st.metric("📁 PDF a renombrar", cambios['total_renombres'])
+        with col4:
+            st.metric("➕ Columnas nuevas", len(cambios['columnas_nuevas']))
+        st.code(migrador_lotes.formatear_diff(cambios), language="diff")
+        st.caption("La vista previa usa el listado de archivos cargado con los datos; no se modificó nada en el servidor.")
+    
+    confirmado = st.checkbox(
+        f"Confirmo la migración de {len(seleccion)} persona(s): {config['etiqueta']}",
+        key="lote_confirmado"
+    )
+    
+    if st.button("🚀 Ejecutar Migración por Lotes", type="primary", disabled=not confirmado, key="ejecutar_lote"):
+        barra = st.progress(0.0, text="Iniciando migración por lotes...")
+        
+        def progreso(fraccion, mensaje):
+            barra.progress(min(max(fraccion, 0.0), 1.0), text=mensaje)
+        
+        resultados = migrador_lotes.ejecutar(tipo, seleccion, datos_comunes, progreso)
+        st.session_state.resultados_lote = resultados
+        cargar_datos_completos.clear()
+        st.rerun()
+
+def mostrar_resultados_lote(resultados):
+    """Mostrar el resultado por persona de la última migración por lotes"""
+    df_resultados = pd.DataFrame(resultados)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("✅ Migrados", int((df_resultados['estado'] == 'OK').sum()))
+    with col2:
+        st.metric("⏭️ Omitidos", int((df_resultados['estado'] == 'OMITIDO').sum()))
+    with col3:
+        st.metric("❌ Errores", int((df_resultados['estado'] == 'ERROR').sum()))
+    
+    st.dataframe(df_resultados, width='stretch')
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "📥 Descargar Resultados (CSV)",
+            data=df_resultados.to_csv(index=False).encode('utf-8'),
+            file_name=f"migracion_lote_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+    with col2:
+        if st.button("🔄 Nueva Migración por Lotes"):
+            del st.session_state.resultados_lote
+            st.rerun()
+
 def main():
     # Inicializar estado de sesión
     if 'login_exitoso' not in st.session_state:
@@ -1986,4 +3113,5 @@ def main():
         mostrar_interfaz_migrador()
 
 if __name__ == "__main__":
+    iniciar_aplicacion()
     main()
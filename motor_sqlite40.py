@@ -0,0 +1,513 @@
+"""Motor SQLite opcional para los datasets académicos
+
+Cada dataset es una tabla con una columna por campo (valores como texto),
+un índice único sobre su clave (matricula, usuario o archivo) e índices
+sobre matricula, usuario, email, rol y tipo cuando existen. Las consultas y cambios
+por registro usan esos índices (O(log n)) en lugar de recorrer y
+reescribir el CSV completo.
+
+Escritura:
+- API por registro: obtener, buscar, insertar, insertar_varios,
+  actualizar, eliminar.
+- guardar / guardar_varios: reciben el DataFrame editado y escriben solo
+  las diferencias contra el DataFrame leído (registros nuevos, borrados y
+  celdas modificadas), dentro de una transacción. Los cambios que otras
+  sesiones hicieron en otros registros o celdas se conservan.
+
+Se activa con datasets_db en secrets.toml (ruta local de la base de
+datos). Importar y exportar los CSV:
+
+    python motor_sqlite40.py importar escuela.db --base /srv/escuela
+    python motor_sqlite40.py exportar escuela.db --base /srv/escuela
+    python motor_sqlite40.py importar escuela.db --secrets .streamlit/secrets.toml
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+# Dataset -> columna clave (None: los registros se identifican por su posición)
+DATASETS_MOTOR = {
+    'inscritos': 'matricula',
+    'estudiantes': 'matricula',
+    'egresados': 'matricula',
+    'contratados': 'matricula',
+    'usuarios': 'usuario',
+    'certificaciones': None,
+    'bitacora': None,
+    'documentos': 'archivo'
+}
+
+# Archivo CSV de cada dataset relativo al directorio base del servidor
+RUTAS_CSV = {
+    'inscritos': os.path.join("datos", "inscritos.csv"),
+    'estudiantes': os.path.join("datos", "estudiantes.csv"),
+    'egresados': os.path.join("datos", "egresados.csv"),
+    'contratados': os.path.join("datos", "contratados.csv"),
+    'usuarios': os.path.join("config", "usuarios.csv"),
+    'certificaciones': os.path.join("datos", "certificaciones.csv"),
+    'bitacora': os.path.join("datos", "bitacora.csv"),
+    'documentos': os.path.join("datos", "documentos.csv")
+}
+
+COLUMNAS_INDICE = ['matricula', 'usuario', 'email', 'rol', 'tipo']
+
+
+def texto_celdas(df):
+    """Valores como texto ('' para vacíos), igual que al escribir el CSV"""
+    return df.astype(object).where(df.notna(), '').astype(str)
+
+def llaves_filas(texto):
+    """Contenido de cada fila de texto más su número de repetición (para comparar multiconjuntos)"""
+    if len(texto.columns) == 0:
+        return pd.Series('', index=texto.index)
+    fila = texto.iloc[:, 0]
+    for columna in texto.columns[1:]:
+        fila = fila + '\x1f' + texto[columna]
+    return fila + '\x1e' + fila.groupby(fila).cumcount().astype(str)
+
+def identificador(nombre):
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+def valor_sql(valor):
+    """Valor de una celda como texto (None para vacíos)"""
+    if isinstance(valor, (list, dict)):
+        return json.dumps(valor, ensure_ascii=False)
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)) or str(valor) == '':
+        return None
+    return str(valor)
+
+
+class MotorDatasets:
+    def __init__(self, ruta_db, max_bases=32, timeout=30):
+        self.ruta_db = ruta_db
+        self.timeout = timeout
+        self.max_bases = max_bases
+        self.bases = OrderedDict()  # token -> (dataset, DataFrame de texto leído, {etiqueta: _fila})
+        self.candado_bases = threading.Lock()
+        self.local = threading.local()
+        with self.transaccion() as conexion:
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS _pendientes (id TEXT PRIMARY KEY, creado REAL NOT NULL, contenido TEXT NOT NULL)"
+            )
+
+    # -------------------------------------------------------------------------
+    # Conexión y esquema
+    # -------------------------------------------------------------------------
+
+    def conexion(self):
+        """Conexión del hilo actual (una por hilo, en modo WAL)"""
+        conexion = getattr(self.local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta_db, timeout=self.timeout, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self.local.conexion = conexion
+        return conexion
+
+    @contextmanager
+    def transaccion(self):
+        """Transacción de escritura (se revierte si hay una excepción)"""
+        conexion = self.conexion()
+        if conexion.in_transaction:
+            yield conexion
+            return
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            yield conexion
+            conexion.execute("COMMIT")
+        except BaseException:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def columnas(self, dataset):
+        """Columnas de la tabla (sin _fila); lista vacía si no existe"""
+        filas = self.conexion().execute(f"PRAGMA table_info({identificador(dataset)})").fetchall()
+        return [fila[1] for fila in filas if fila[1] != '_fila']
+
+    def existe(self, dataset):
+        return bool(self.columnas(dataset))
+
+    def asegurar_tabla(self, conexion, dataset, columnas):
+        """Crear la tabla y sus índices, o agregar las columnas que falten"""
+        if dataset not in DATASETS_MOTOR:
+            raise ValueError(f"Dataset no soportado por el motor: {dataset}")
+        actuales = self.columnas(dataset)
+        tabla = identificador(dataset)
+        if not actuales:
+            definicion = ", ".join(f"{identificador(c)} TEXT" for c in columnas)
+            conexion.execute(f"CREATE TABLE {tabla} (_fila INTEGER PRIMARY KEY AUTOINCREMENT{', ' + definicion if definicion else ''})")
+        else:
+            for columna in columnas:
+                if columna not in actuales:
+                    conexion.execute(f"ALTER TABLE {tabla} ADD COLUMN {identificador(columna)} TEXT")
+        todas = actuales + [c for c in columnas if c not in actuales]
+
+        clave = DATASETS_MOTOR[dataset]
+        if clave and clave in todas:
+            conexion.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {identificador(f'{dataset}_clave')} ON {tabla} ({identificador(clave)})")
+        for columna in COLUMNAS_INDICE:
+            if columna in todas and columna != clave:
+                conexion.execute(f"CREATE INDEX IF NOT EXISTS {identificador(f'{dataset}_{columna}')} ON {tabla} ({identificador(columna)})")
+        return todas
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+
+    def leer_texto(self, dataset):
+        """Tabla completa como texto, con la columna _fila"""
+        if not self.existe(dataset):
+            return pd.DataFrame(columns=['_fila'])
+        return pd.read_sql_query(f"SELECT * FROM {identificador(dataset)} ORDER BY _fila", self.conexion(), dtype=str)
+
+    def leer(self, dataset, tipos=None):
+        """Dataset completo como DataFrame, con las mismas conversiones que la lectura del CSV
+
+        El resultado queda registrado como base para guardar() (df.attrs['base_motor']).
+        """
+        crudo = self.leer_texto(dataset)
+        filas = crudo.pop('_fila').astype(int).tolist()
+        df = self.convertir(crudo, tipos)
+        self.registrar_base(dataset, df, filas)
+        return df
+
+    @staticmethod
+    def convertir(crudo, tipos=None):
+        """Pasar por CSV en memoria para inferir los tipos exactamente como read_csv"""
+        if len(crudo.columns) == 0:
+            return pd.DataFrame()
+        return pd.read_csv(StringIO(crudo.to_csv(index=False)), dtype=tipos)
+
+    def registrar_base(self, dataset, df, filas):
+        token = uuid.uuid4().hex
+        with self.candado_bases:
+            self.bases[token] = (dataset, texto_celdas(df), dict(zip(df.index, filas)))
+            while len(self.bases) > self.max_bases:
+                self.bases.popitem(last=False)
+        df.attrs['base_motor'] = token
+
+    def obtener(self, dataset, clave):
+        """Registro por clave (dict) o None"""
+        columna = DATASETS_MOTOR.get(dataset)
+        if not columna or not self.existe(dataset):
+            return None
+        cursor = self.conexion().execute(
+            f"SELECT * FROM {identificador(dataset)} WHERE {identificador(columna)} = ?", (str(clave),)
+        )
+        fila = cursor.fetchone()
+        if fila is None:
+            return None
+        nombres = [d[0] for d in cursor.description]
+        return {n: v for n, v in zip(nombres, fila) if n != '_fila'}
+
+    def buscar(self, dataset, **filtros):
+        """Registros cuyo valor coincide en todas las columnas dadas (usa los índices)"""
+        columnas = self.columnas(dataset)
+        if not columnas or any(c not in columnas for c in filtros):
+            return pd.DataFrame(columns=columnas)
+        condiciones = " AND ".join(f"{identificador(c)} = ?" for c in filtros) or "1"
+        df = pd.read_sql_query(
+            f"SELECT * FROM {identificador(dataset)} WHERE {condiciones} ORDER BY _fila",
+            self.conexion(), params=[str(v) for v in filtros.values()], dtype=str
+        )
+        return df.drop(columns=['_fila'])
+
+    def contar(self, dataset):
+        if not self.existe(dataset):
+            return 0
+        return self.conexion().execute(f"SELECT COUNT(*) FROM {identificador(dataset)}").fetchone()[0]
+
+    def contar_por(self, dataset, columna):
+        """Registros por valor de una columna ({valor: n}, sin vacíos); usa su índice si existe"""
+        if columna not in self.columnas(dataset):
+            return {}
+        cursor = self.conexion().execute(
+            f"SELECT {identificador(columna)}, COUNT(*) FROM {identificador(dataset)} "
+            f"WHERE {identificador(columna)} IS NOT NULL AND {identificador(columna)} != '' GROUP BY {identificador(columna)}"
+        )
+        return dict(cursor.fetchall())
+
+    # -------------------------------------------------------------------------
+    # Escritura por registro
+    # -------------------------------------------------------------------------
+
+    def insertar_en(self, conexion, dataset, registro, reemplazar=False):
+        columnas = [c for c in registro if c != '_fila']
+        self.asegurar_tabla(conexion, dataset, columnas)
+        sql = (f"INSERT INTO {identificador(dataset)} ({', '.join(identificador(c) for c in columnas)}) "
+               f"VALUES ({', '.join('?' for _ in columnas)})")
+        clave = DATASETS_MOTOR[dataset]
+        if reemplazar and clave in columnas:
+            asignaciones = ", ".join(f"{identificador(c)} = excluded.{identificador(c)}" for c in columnas if c != clave)
+            sql += f" ON CONFLICT ({identificador(clave)}) DO " + (f"UPDATE SET {asignaciones}" if asignaciones else "NOTHING")
+        conexion.execute(sql, [valor_sql(registro.get(c)) for c in columnas])
+
+    def insertar(self, dataset, registro, reemplazar=False):
+        """Insertar un registro; sin reemplazar, lanza sqlite3.IntegrityError si la clave ya existe"""
+        with self.transaccion() as conexion:
+            self.insertar_en(conexion, dataset, registro, reemplazar)
+
+    def insertar_varios(self, registros, reemplazar=False):
+        """Insertar un registro por dataset ({dataset: dict}) en una sola transacción"""
+        with self.transaccion() as conexion:
+            for dataset, registro in registros.items():
+                self.insertar_en(conexion, dataset, registro, reemplazar)
+
+    def actualizar(self, dataset, clave, cambios):
+        """Actualizar columnas de un registro por clave; True si existía"""
+        columna = DATASETS_MOTOR.get(dataset)
+        if not columna:
+            raise ValueError(f"{dataset} no tiene columna clave")
+        with self.transaccion() as conexion:
+            self.asegurar_tabla(conexion, dataset, list(cambios))
+            asignaciones = ", ".join(f"{identificador(c)} = ?" for c in cambios)
+            cursor = conexion.execute(
+                f"UPDATE {identificador(dataset)} SET {asignaciones} WHERE {identificador(columna)} = ?",
+                [valor_sql(v) for v in cambios.values()] + [str(clave)]
+            )
+            return cursor.rowcount > 0
+
+    def eliminar(self, dataset, clave):
+        """Eliminar un registro por clave; True si existía"""
+        columna = DATASETS_MOTOR.get(dataset)
+        if not columna:
+            raise ValueError(f"{dataset} no tiene columna clave")
+        if not self.existe(dataset):
+            return False
+        with self.transaccion() as conexion:
+            cursor = conexion.execute(f"DELETE FROM {identificador(dataset)} WHERE {identificador(columna)} = ?", (str(clave),))
+            return cursor.rowcount > 0
+
+    # -------------------------------------------------------------------------
+    # Guardado de DataFrames editados (solo diferencias)
+    # -------------------------------------------------------------------------
+
+    def base_de(self, dataset, df):
+        """Base (texto, {etiqueta: _fila}) de la lectura marcada en df; (None, None) si no se conoce
+
+        No se usa la de otra lectura: podría incluir registros que df nunca
+        vio y que se borrarían al compararlos.
+        """
+        with self.candado_bases:
+            base = self.bases.get(df.attrs.get('base_motor'))
+        if base and base[0] == dataset:
+            return base[1], base[2]
+        return None, None
+
+    def tabla_actual(self, dataset):
+        """Tabla actual como (texto, {etiqueta: _fila})"""
+        crudo = self.leer_texto(dataset)
+        filas = crudo.pop('_fila').astype(int)
+        return texto_celdas(self.convertir(crudo)), dict(zip(crudo.index, filas))
+
+    def guardar_en(self, conexion, dataset, df):
+        """Escribir las diferencias de df contra su base; devuelve los conteos
+
+        Sin base conocida no se borra ningún registro: se comparan contra la
+        tabla actual y solo se insertan las claves nuevas y se actualizan las
+        celdas distintas (sin clave, solo se agregan las filas que faltan).
+        """
+        conteo = {'insertados': 0, 'actualizados': 0, 'eliminados': 0}
+        base, filas_base = self.base_de(dataset, df)
+        conocida = base is not None
+        clave = DATASETS_MOTOR[dataset]
+        tabla = identificador(dataset)
+        nuevo = texto_celdas(df)
+        columnas = list(nuevo.columns)
+        self.asegurar_tabla(conexion, dataset, columnas)
+
+        if not conocida:
+            base, filas_base = self.tabla_actual(dataset)
+            if not clave or clave not in nuevo.columns:
+                # Filas que no se pueden emparejar: se agregan las que la tabla no tiene
+                actuales = llaves_filas(base.reindex(columns=columnas, fill_value=''))
+                nuevo = nuevo[~llaves_filas(nuevo).isin(actuales).values]
+                base, filas_base = nuevo.iloc[0:0], {}
+        elif not clave and not nuevo.index.is_unique:
+            # Registros sin clave que no se pueden emparejar: se reemplaza la tabla
+            conteo['eliminados'] = conexion.execute(f"DELETE FROM {tabla}").rowcount
+            base, filas_base = nuevo.iloc[0:0], {}
+
+        if clave and clave in nuevo.columns:
+            nuevo = nuevo[nuevo[clave] != ''].drop_duplicates(subset=[clave], keep='last').set_index(clave, drop=False)
+            base = base[base[clave] != ''].drop_duplicates(subset=[clave], keep='last').set_index(clave, drop=False) \
+                if clave in base.columns else base.iloc[0:0]
+            condicion = f"{identificador(clave)} = ?"
+            identificar = lambda etiqueta: etiqueta
+        else:
+            condicion = "_fila = ?"
+            identificar = lambda etiqueta: filas_base[etiqueta]
+            # Sin clave, solo las filas leídas de la tabla se pueden emparejar
+            base = base.loc[[e for e in base.index if e in filas_base]]
+
+        borradas = base.index.difference(nuevo.index) if conocida else base.index[0:0]
+        agregadas = nuevo.index.difference(base.index)
+        comunes = nuevo.index.intersection(base.index)
+
+        for etiqueta in borradas:
+            conteo['eliminados'] += conexion.execute(f"DELETE FROM {tabla} WHERE {condicion}", (identificar(etiqueta),)).rowcount
+
+        if len(comunes):
+            columnas_base = [c for c in columnas if c in base.columns]
+            actual = nuevo.loc[comunes, columnas]
+            anterior = base.loc[comunes].reindex(columns=columnas, fill_value='')
+            cambiadas = (actual.values != anterior.values)
+            for posicion in cambiadas.any(axis=1).nonzero()[0]:
+                etiqueta = comunes[posicion]
+                modificadas = [c for c, cambio in zip(columnas, cambiadas[posicion]) if cambio or c not in columnas_base]
+                asignaciones = ", ".join(f"{identificador(c)} = ?" for c in modificadas)
+                conteo['actualizados'] += conexion.execute(
+                    f"UPDATE {tabla} SET {asignaciones} WHERE {condicion}",
+                    [valor or None for valor in actual.loc[etiqueta, modificadas]] + [identificar(etiqueta)]
+                ).rowcount
+
+        if len(agregadas):
+            nombres = ", ".join(identificador(c) for c in columnas)
+            marcas = ", ".join('?' for _ in columnas)
+            if clave and clave in columnas:
+                # Si otra sesión ya agregó la misma clave, se actualiza
+                asignaciones = ", ".join(f"{identificador(c)} = excluded.{identificador(c)}" for c in columnas if c != clave)
+                sql = f"INSERT INTO {tabla} ({nombres}) VALUES ({marcas}) ON CONFLICT ({identificador(clave)}) DO " + \
+                      (f"UPDATE SET {asignaciones}" if asignaciones else "NOTHING")
+            else:
+                sql = f"INSERT INTO {tabla} ({nombres}) VALUES ({marcas})"
+            filas = nuevo.loc[agregadas, columnas].values.tolist()
+            conexion.executemany(sql, [[valor or None for valor in fila] for fila in filas])
+            conteo['insertados'] += len(filas)
+        return conteo
+
+    def guardar(self, dataset, df):
+        """Guardar un DataFrame editado escribiendo solo sus diferencias"""
+        return self.guardar_varios({dataset: df})[dataset]
+
+    def guardar_varios(self, dataframes, pendiente=None):
+        """Guardar varios DataFrames en una sola transacción: {dataset: conteos}
+
+        pendiente: dict opcional (por ejemplo, renombrados de PDF) que se
+        registra en la misma transacción y se recupera con pendientes().
+        """
+        conteos = {}
+        with self.transaccion() as conexion:
+            for dataset, df in dataframes.items():
+                conteos[dataset] = self.guardar_en(conexion, dataset, df)
+            if pendiente is not None:
+                conexion.execute("INSERT INTO _pendientes (id, creado, contenido) VALUES (?, ?, ?)",
+                                 (pendiente['id'], time.time(), json.dumps(pendiente, ensure_ascii=False, default=str)))
+        # Lo guardado pasa a ser la base de las siguientes ediciones de estos DataFrames
+        for dataset, df in dataframes.items():
+            if DATASETS_MOTOR[dataset]:
+                self.registrar_base(dataset, df, [])
+            else:
+                df.attrs.pop('base_motor', None)
+        return conteos
+
+    def pendientes(self):
+        """Tareas registradas con guardar_varios que aún no se cierran"""
+        filas = self.conexion().execute("SELECT contenido FROM _pendientes ORDER BY creado").fetchall()
+        return [json.loads(fila[0]) for fila in filas]
+
+    def cerrar_pendiente(self, id_pendiente):
+        with self.transaccion() as conexion:
+            conexion.execute("DELETE FROM _pendientes WHERE id = ?", (id_pendiente,))
+
+    # -------------------------------------------------------------------------
+    # Importación y exportación de CSV
+    # -------------------------------------------------------------------------
+
+    def importar_csv(self, dataset, contenido):
+        """Reemplazar una tabla con el contenido de un CSV (bytes); devuelve los registros importados"""
+        try:
+            df = pd.read_csv(BytesIO(contenido), dtype=str, encoding='utf-8')
+        except UnicodeDecodeError:
+            df = pd.read_csv(BytesIO(contenido), dtype=str, encoding='latin-1')
+        clave = DATASETS_MOTOR[dataset]
+        if clave and clave in df.columns:
+            df = df.dropna(subset=[clave]).drop_duplicates(subset=[clave], keep='last')
+
+        with self.transaccion() as conexion:
+            conexion.execute(f"DROP TABLE IF EXISTS {identificador(dataset)}")
+            columnas = list(df.columns)
+            self.asegurar_tabla(conexion, dataset, columnas)
+            if columnas and not df.empty:
+                conexion.executemany(
+                    f"INSERT INTO {identificador(dataset)} ({', '.join(identificador(c) for c in columnas)}) "
+                    f"VALUES ({', '.join('?' for _ in columnas)})",
+                    df.astype(object).where(df.notna(), None).values.tolist()
+                )
+        return len(df)
+
+    def exportar_csv(self, dataset):
+        """Contenido CSV (bytes) de una tabla"""
+        df = self.leer_texto(dataset).drop(columns=['_fila'])
+        return df.to_csv(index=False).encode('utf-8')
+
+    def cerrar(self):
+        conexion = getattr(self.local, 'conexion', None)
+        if conexion is not None:
+            conexion.close()
+            self.local.conexion = None
+
+
+# =============================================================================
+# HERRAMIENTA DE LÍNEA DE COMANDOS (IMPORTAR / EXPORTAR CSV)
+# =============================================================================
+
+def abrir_origen(args):
+    """Almacenamiento y directorio base: local (--base) o el configurado en secrets.toml"""
+    import almacenamiento40
+
+    if args.secrets:
+        import tomllib
+        with open(args.secrets, 'rb') as archivo:
+            config = tomllib.load(archivo)
+        return almacenamiento40.abrir_almacenamiento(config), args.base or config['remote_dir']
+    return almacenamiento40.AlmacenamientoLocal('/'), os.path.abspath(args.base)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importar o exportar los CSV de los datasets al motor SQLite")
+    parser.add_argument('accion', choices=['importar', 'exportar'])
+    parser.add_argument('db', help="Archivo de la base de datos SQLite")
+    parser.add_argument('--base', help="Directorio base con datos/ y config/ (por omisión remote_dir de --secrets)")
+    parser.add_argument('--secrets', help="secrets.toml para leer/escribir con el almacenamiento configurado")
+    parser.add_argument('--dataset', action='append', choices=list(DATASETS_MOTOR), help="Limitar a estos datasets")
+    args = parser.parse_args(argv)
+    if not args.base and not args.secrets:
+        parser.error("Indique --base o --secrets")
+
+    motor = MotorDatasets(args.db)
+    almacenamiento, base = abrir_origen(args)
+    try:
+        for dataset in args.dataset or list(DATASETS_MOTOR):
+            ruta = os.path.join(base, RUTAS_CSV[dataset])
+            if args.accion == 'importar':
+                contenido = almacenamiento.leer(ruta)
+                if contenido is None:
+                    print(f"- {dataset}: {ruta} no existe")
+                    continue
+                print(f"✓ {dataset}: {motor.importar_csv(dataset, contenido)} registros importados")
+            else:
+                if not motor.existe(dataset):
+                    print(f"- {dataset}: sin tabla")
+                    continue
+                almacenamiento.escribir(ruta, motor.exportar_csv(dataset))
+                print(f"✓ {dataset}: {motor.contar(dataset)} registros exportados a {ruta}")
+    finally:
+        almacenamiento.close()
+        motor.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Asignador de secuencias remotas (matrículas y folios)
+
+Cada secuencia se guarda en el servidor como <directorio>/<nombre>.json
+({"siguiente": N}). Para reservar números se toma un candado atómico
+(mkdir de <nombre>.lock, que falla si ya existe, con una ficha del dueño
+adentro), se lee el valor, se escribe el nuevo y se libera el candado.
+Cada proceso reserva bloques de números y los entrega desde memoria, por
+lo que la mayoría de las asignaciones no tocan el servidor y dos
+instancias nunca reciben el mismo número.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class CandadoOcupado(Exception):
+    """No se pudo obtener el candado remoto de una secuencia a tiempo"""
+
+
+class CandadoPerdido(Exception):
+    """Otro proceso retiró el candado (por caducado) mientras se tenía"""
+
+
+class AsignadorSecuencias:
+    def __init__(self, crear_cargador, directorio, tamano_bloque=20,
+                 espera_maxima=15, candado_caducado=120):
+        """
+        crear_cargador: función que devuelve un cargador con conectar(),
+        desconectar() y atributo sftp (por ejemplo, la clase CargadorRemoto).
+        """
+        self.crear_cargador = crear_cargador
+        self.directorio = directorio
+        self.tamano_bloque = tamano_bloque
+        self.espera_maxima = espera_maxima
+        self.candado_caducado = candado_caducado
+        self.bloques = {}  # nombre -> [siguiente, limite)
+        self.candado_local = threading.Lock()
+
+    def siguiente(self, nombre, inicial=1):
+        """Entregar el siguiente número de una secuencia
+
+        inicial: valor (o función sin argumentos que lo calcula) con el que se
+        crea la secuencia si todavía no existe en el servidor.
+        """
+        with self.candado_local:
+            bloque = self.bloques.get(nombre)
+            if not bloque or bloque[0] >= bloque[1]:
+                bloque = list(self.reservar_bloque(nombre, inicial))
+                self.bloques[nombre] = bloque
+            numero = bloque[0]
+            bloque[0] += 1
+            return numero
+
+    def reservar_bloque(self, nombre, inicial):
+        """Reservar en el servidor un bloque de números; devuelve (desde, hasta)"""
+        cargador = self.crear_cargador()
+        if not cargador.conectar():
+            raise ConnectionError("No se pudo conectar al servidor para reservar la secuencia")
+
+        try:
+            sftp = cargador.sftp
+            self.crear_directorio(sftp)
+            ruta_candado = os.path.join(self.directorio, f"{nombre}.lock")
+            latido = self.tomar_candado(sftp, ruta_candado)
+            try:
+                ruta = os.path.join(self.directorio, f"{nombre}.json")
+                desde = self.leer_siguiente(sftp, ruta)
+                if desde is None:
+                    desde = inicial() if callable(inicial) else inicial
+                hasta = desde + self.tamano_bloque
+                latido.comprobar()
+
+                with sftp.file(ruta + '.tmp', 'w') as archivo:
+                    archivo.write(json.dumps({'siguiente': hasta}))
+                try:
+                    sftp.posix_rename(ruta + '.tmp', ruta)
+                except IOError:
+                    try:
+                        sftp.remove(ruta)
+                    except FileNotFoundError:
+                        pass
+                    sftp.rename(ruta + '.tmp', ruta)
+                return desde, hasta
+            finally:
+                soltar_candado(sftp, ruta_candado, latido)
+        finally:
+            cargador.desconectar()
+
+    def crear_directorio(self, sftp):
+        """Crear el directorio de secuencias si no existe"""
+        try:
+            sftp.stat(self.directorio)
+        except FileNotFoundError:
+            sftp.mkdir(self.directorio)
+
+    def leer_siguiente(self, sftp, ruta):
+        """Leer el siguiente número libre; None si la secuencia no existe"""
+        try:
+            with sftp.file(ruta, 'r') as archivo:
+                return int(json.loads(archivo.read())['siguiente'])
+        except FileNotFoundError:
+            return None
+
+    def tomar_candado(self, sftp, ruta_candado):
+        """Tomar el candado remoto de la secuencia (devuelve su Latido)"""
+        return tomar_candado(sftp, ruta_candado, self.espera_maxima, self.candado_caducado)
+
+
+def tomar_candado(sftp, ruta_candado, espera_maxima=15, caducado=120):
+    """Tomar un candado remoto (mkdir atómico), esperando si otro proceso lo tiene
+
+    Devuelve el Latido que mantiene vigente el candado; se libera con
+    soltar_candado(sftp, ruta_candado, latido). Dentro del directorio se
+    escribe una ficha con un identificador único del dueño, que el latido y
+    la liberación comprueban. Un candado sin renovar en más de `caducado`
+    segundos se considera abandonado: se mueve a una lápida con nombre
+    único (solo un proceso gana el rename) y ese proceso la retira.
+    """
+    dueno = os.urandom(8).hex()
+    ficha = os.path.join(ruta_candado, f"dueno.{dueno}")
+    limite = time.time() + espera_maxima
+    espera = 0.05
+    while True:
+        try:
+            sftp.mkdir(ruta_candado)
+        except IOError:
+            # Retirar candados abandonados por procesos interrumpidos
+            try:
+                if time.time() - sftp.stat(ruta_candado).st_mtime > caducado:
+                    lapida = f"{ruta_candado}.{dueno}.caducado"
+                    sftp.rename(ruta_candado, lapida)
+                    retirar_directorio(sftp, lapida)
+                    continue
+            except IOError:
+                # Otro proceso ganó el rename (o ya no existe)
+                pass
+        else:
+            try:
+                with sftp.file(ficha, 'w') as archivo:
+                    archivo.write(f"{os.getpid()} {time.time()}")
+                # Solo la ficha propia: nadie retiró el directorio entre el mkdir y la ficha
+                if sftp.listdir(ruta_candado) == [os.path.basename(ficha)]:
+                    return Latido(sftp, ruta_candado, ficha, caducado).iniciar()
+            except IOError:
+                pass
+            try:
+                sftp.remove(ficha)
+            except IOError:
+                pass
+
+        if time.time() > limite:
+            raise CandadoOcupado(f"El recurso está bloqueado: {ruta_candado}")
+        time.sleep(espera)
+        espera = min(espera * 2, 1.0)
+
+
+def retirar_directorio(sftp, ruta):
+    """Borrar un directorio de candado con sus fichas"""
+    for nombre in sftp.listdir(ruta):
+        try:
+            sftp.remove(os.path.join(ruta, nombre))
+        except FileNotFoundError:
+            pass
+    sftp.rmdir(ruta)
+
+
+def soltar_candado(sftp, ruta_candado, latido):
+    """Detener la renovación y liberar un candado tomado con tomar_candado
+
+    Lanza CandadoPerdido si el candado ya no tiene la ficha de este dueño
+    (otro proceso lo retiró por caducado); en ese caso no se toca.
+    """
+    latido.detener()
+    try:
+        sftp.remove(latido.ficha)
+    except FileNotFoundError:
+        raise CandadoPerdido(f"El candado se perdió antes de liberarlo: {ruta_candado}")
+    sftp.rmdir(ruta_candado)
+
+
+class Latido:
+    """Renovar la fecha de modificación de un candado mientras se tiene
+
+    Así un candado tomado para una operación larga no parece abandonado.
+    La renovación corre en un hilo con su propio canal (abierto solo si el
+    candado dura más de un intervalo). Si la ficha del dueño desaparece, el
+    candado se perdió: se marca `perdido` y se deja de renovar.
+    """
+
+    def __init__(self, sftp, ruta_candado, ficha, caducado):
+        self.sftp = sftp
+        self.ruta_candado = ruta_candado
+        self.ficha = ficha
+        self.intervalo = max(caducado / 4, 0.5)
+        self.perdido = False
+        self.terminado = threading.Event()
+        self.hilo = threading.Thread(target=self.renovar, daemon=True)
+
+    def iniciar(self):
+        self.hilo.start()
+        return self
+
+    def renovar(self):
+        canal = None
+        try:
+            while not self.terminado.wait(self.intervalo):
+                if canal is None:
+                    canal = self.sftp.abrir_canal()
+                try:
+                    canal.stat(self.ficha)
+                    canal.utime(self.ruta_candado, None)
+                except FileNotFoundError:
+                    self.perdido = True
+                    return
+                except IOError:
+                    # Falla pasajera: se reintenta en el siguiente intervalo
+                    pass
+        finally:
+            if canal is not None and canal is not self.sftp:
+                canal.close()
+
+    def comprobar(self):
+        """Lanzar CandadoPerdido si el candado ya no es de este dueño"""
+        if not self.perdido:
+            try:
+                self.sftp.stat(self.ficha)
+                return
+            except FileNotFoundError:
+                self.perdido = True
+        raise CandadoPerdido(f"El candado ya no es de este proceso: {self.ruta_candado}")
+
+    def detener(self):
+        self.terminado.set()
+        if self.hilo is not threading.current_thread():
+            self.hilo.join()
@@ -0,0 +1,137 @@
+"""Vinculación de usuarios con sus registros académicos
+
+Cada usuario con rol académico debe corresponder a un registro del dataset
+de su rol, buscando su nombre de usuario en las columnas matricula, usuario
+o id (en ese orden de prioridad). En lugar de recorrer usuario por usuario,
+los campos de cada dataset se apilan en una tabla larga (valor, campo,
+registro) y se cruzan con los usuarios en un solo merge:
+
+- Vinculado: un solo registro coincide en el campo de mayor prioridad.
+- Ambiguo: varios registros distintos coinciden en ese campo.
+- Sin vínculo: ningún registro coincide.
+- No aplica: roles sin dataset (administrador, etc.).
+
+Los registros que ningún usuario de su rol reclama son huérfanos.
+"""
+
+import pandas as pd
+
+# Rol del usuario -> dataset con sus registros
+DATASETS_ROL = {
+    'inscrito': 'inscritos',
+    'estudiante': 'estudiantes',
+    'egresado': 'egresados',
+    'contratado': 'contratados'
+}
+
+CAMPOS_VINCULO = ['matricula', 'usuario', 'id']
+
+ESTADOS_VINCULO = ['Vinculado', 'Ambiguo', 'Sin vínculo', 'No aplica']
+
+
+def texto(serie):
+    """Valores comparables: texto sin espacios, vacío en lugar de NaN"""
+    return serie.astype(object).where(serie.notna(), '').astype(str).str.strip()
+
+def nombre_registro(df):
+    """Columna con el nombre de la persona (o Series vacía)"""
+    for columna in ['nombre_completo', 'nombre']:
+        if columna in df.columns:
+            return texto(df[columna])
+    return pd.Series('', index=df.index)
+
+def valores_vinculo(datos):
+    """Tabla larga dataset/registro/campo/prioridad/valor de todos los datasets de rol"""
+    partes = []
+    for rol, nombre in DATASETS_ROL.items():
+        df = datos.get(nombre)
+        if df is None or df.empty:
+            continue
+        for prioridad, campo in enumerate(CAMPOS_VINCULO):
+            if campo not in df.columns:
+                continue
+            partes.append(pd.DataFrame({
+                'rol': rol,
+                'dataset': nombre,
+                'registro': range(len(df)),  # posición del registro en su dataset
+                'campo': campo,
+                'prioridad': prioridad,
+                'valor': texto(df[campo]).values
+            }))
+    if not partes:
+        return pd.DataFrame(columns=['rol', 'dataset', 'registro', 'campo', 'prioridad', 'valor'])
+    valores = pd.concat(partes, ignore_index=True)
+    return valores[valores['valor'] != '']
+
+
+def calcular_vinculacion(usuarios, datos):
+    """Vinculación de todos los usuarios en una pasada
+
+    usuarios: DataFrame de usuarios; datos: {dataset: DataFrame}.
+    Devuelve {'usuarios': DataFrame por usuario (estado, dataset, campo,
+    matricula, nombre, coincidencias), 'coincidencias': todas las
+    coincidencias de mayor prioridad (para el detalle), 'huerfanos':
+    registros sin usuario, 'resumen': conteo rol × estado}.
+    """
+    base = pd.DataFrame({
+        'usuario': texto(usuarios['usuario']) if 'usuario' in usuarios.columns else '',
+        'rol': texto(usuarios['rol']).str.lower() if 'rol' in usuarios.columns else '',
+        'email': texto(usuarios['email']) if 'email' in usuarios.columns else '',
+        'estado': texto(usuarios['estado']) if 'estado' in usuarios.columns else ''
+    }).reset_index(drop=True)
+
+    valores = valores_vinculo(datos)
+    cruce = base.reset_index().merge(valores, left_on=['rol', 'usuario'], right_on=['rol', 'valor'])
+    # Solo cuenta el campo de mayor prioridad con coincidencias de cada usuario
+    cruce = cruce[cruce['prioridad'] == cruce.groupby('index')['prioridad'].transform('min')]
+    cruce = cruce.drop_duplicates(subset=['index', 'dataset', 'registro'])
+
+    registros = []
+    for nombre in cruce['dataset'].unique():
+        df = datos[nombre]
+        parte = cruce[cruce['dataset'] == nombre]
+        matriculas = texto(df['matricula']) if 'matricula' in df.columns else pd.Series('', index=df.index)
+        registros.append(parte.assign(
+            matricula=matriculas.iloc[parte['registro']].values,
+            nombre=nombre_registro(df).iloc[parte['registro']].values
+        ))
+    coincidencias = pd.concat(registros, ignore_index=True) if registros else cruce.assign(matricula='', nombre='')
+    coincidencias = coincidencias[['index', 'usuario', 'rol', 'dataset', 'campo', 'registro', 'matricula', 'nombre']]
+
+    conteo = coincidencias.groupby('index').size()
+    primera = coincidencias.drop_duplicates(subset=['index']).set_index('index')
+    resultado = base.assign(
+        coincidencias=conteo.reindex(base.index, fill_value=0).values,
+        dataset=primera['dataset'].reindex(base.index).values,
+        campo=primera['campo'].reindex(base.index).values,
+        matricula=primera['matricula'].reindex(base.index).values,
+        nombre=primera['nombre'].reindex(base.index).values
+    )
+    estado = pd.Series('Sin vínculo', index=base.index)
+    estado[resultado['coincidencias'] == 1] = 'Vinculado'
+    estado[resultado['coincidencias'] > 1] = 'Ambiguo'
+    estado[~resultado['rol'].isin(list(DATASETS_ROL))] = 'No aplica'
+    resultado.insert(2, 'vinculo', estado.values)
+
+    # Registros que ningún usuario de su rol reclama (por ninguno de los campos)
+    reclamados = valores.merge(base[['rol', 'usuario']].drop_duplicates(), left_on=['rol', 'valor'], right_on=['rol', 'usuario'])
+    huerfanos = []
+    for rol, nombre in DATASETS_ROL.items():
+        df = datos.get(nombre)
+        if df is None or df.empty:
+            continue
+        libres = ~pd.RangeIndex(len(df)).isin(reclamados.loc[reclamados['dataset'] == nombre, 'registro'])
+        huerfanos.append(pd.DataFrame({
+            'dataset': nombre,
+            'matricula': (texto(df['matricula']) if 'matricula' in df.columns else pd.Series('', index=df.index))[libres].values,
+            'nombre': nombre_registro(df)[libres].values
+        }))
+    huerfanos = pd.concat(huerfanos, ignore_index=True) if huerfanos else pd.DataFrame(columns=['dataset', 'matricula', 'nombre'])
+
+    resumen = pd.crosstab(resultado['rol'], resultado['vinculo']).reindex(columns=ESTADOS_VINCULO, fill_value=0)
+    return {
+        'usuarios': resultado,
+        'coincidencias': coincidencias.drop(columns=['index']),
+        'huerfanos': huerfanos,
+        'resumen': resumen
+    }